@@ -0,0 +1,531 @@
+"""
+Asyncio extraction engine built on BetaAnalyticsDataAsyncClient.
+
+Mirrors the threaded engine in ga4_report_pull.py, but properties, request
+windows and pages are all coroutines on a single thread. A run-wide semaphore
+(ASYNC_MAX_IN_FLIGHT) bounds the total number of in-flight requests, and the
+shared RateLimiter still enforces each property's own quota and concurrency.
+
+Select it with ``python ga4_report_pull.py --engine async``.
+"""
+
+import asyncio
+import time
+from collections import deque
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import (
+    Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Tuple, TypeVar,
+)
+
+import pandas as pd
+from google.analytics.data_v1beta import BetaAnalyticsDataAsyncClient
+from google.analytics.data_v1beta.types import (
+    BatchRunReportsRequest,
+    Dimension,
+    Metric,
+    RunReportRequest,
+)
+from google.api_core import exceptions
+
+from config import (
+    ASYNC_MAX_IN_FLIGHT,
+    DATE_RANGES,
+    PAGE_SIZE,
+    PIPELINE_MAX_PENDING_REQUESTS,
+    REQUEST_TIMEOUT_SECONDS,
+    USE_BATCH_REQUESTS,
+)
+from checkpoint import Page, PageCheckpoint, page_checkpoint
+from ga4_client import get_async_client
+from ga4_report_pull import (
+    DIMENSION_NAMES,
+    EVENT_METRIC_NAMES,
+    EVENT_REPORT_SPEC,
+    MAX_BATCH_REQUESTS,
+    REPORT_SPEC,
+    SESSION_DIMENSION_NAMES,
+    SESSION_METRIC_NAMES,
+    SESSION_REPORT_SPEC,
+    _checkpointed_keys,
+    _page_offsets,
+    _record_cache_hits,
+    _record_call,
+    _record_call_error,
+    _record_exhausted,
+    _window_request,
+    complete_extraction,
+    concat_frames,
+    merge_scopes,
+    page_decoder,
+    pending_date_ranges,
+    report_fetch_error,
+    session_index,
+    write_property_output,
+)
+from manifest import DayStats, Manifest
+from output_writers import OutputWriter
+from rate_limiter import RateLimiter
+from response_cache import get_response_cache
+from retry import get_retry_policy
+from request_planner import ReportWindow, plan_report_windows_async
+
+T = TypeVar('T')
+R = TypeVar('R')
+
+# Marks the end of the event-grain pages in the hand-off queue
+_DONE = object()
+
+
+async def _run_report_async(
+    client: BetaAnalyticsDataAsyncClient,
+    request: RunReportRequest,
+    limiter: RateLimiter,
+    in_flight: asyncio.Semaphore,
+) -> Any:
+    """Awaits a single RunReportRequest under the run-wide and per-property limits."""
+    cache = get_response_cache()
+    cached = await asyncio.to_thread(cache.get, request) if cache else None
+    if cached is not None:
+        _record_cache_hits(request.property, [request])
+        return cached
+
+    request.return_property_quota = True
+
+    async def send() -> Any:
+        # The run-wide slot is only taken once the property's own limiter lets the request go,
+        # so a throttled or quota-paused property never holds slots other properties could use
+        async with limiter.request_async(request.property):
+            async with in_flight:
+                started = time.perf_counter()
+                try:
+                    response = await client.run_report(request, timeout=REQUEST_TIMEOUT_SECONDS)
+                except Exception as e:
+                    _record_call_error(request.property, 'run_report', started, e)
+                    if isinstance(e, exceptions.ResourceExhausted):
+                        _record_exhausted(limiter, request.property)
+                    raise
+            _record_call(request.property, 'run_report', started, response, [response], [request])
+            return response
+
+    response = await get_retry_policy().call_async(send, request.property)
+    limiter.record_quota(request.property, response.property_quota)
+    if cache:
+        await asyncio.to_thread(cache.put, request, response)
+    return response
+
+
+async def _batch_run_reports_async(
+    client: BetaAnalyticsDataAsyncClient,
+    property_id: str,
+    requests: List[RunReportRequest],
+    limiter: RateLimiter,
+    in_flight: asyncio.Semaphore,
+) -> List[Any]:
+    """Awaits one BatchRunReports call; returns the reports in request order."""
+    cache = get_response_cache()
+    reports = await asyncio.to_thread(
+        lambda: [cache.get(request) if cache else None for request in requests]
+    )
+    missing = [index for index, report in enumerate(reports) if report is None]
+    _record_cache_hits(property_id, [request for request, report in zip(requests, reports) if report is not None])
+    if not missing:
+        return reports
+
+    for index in missing:
+        requests[index].return_property_quota = True
+    batch = BatchRunReportsRequest(property=property_id, requests=[requests[index] for index in missing])
+
+    async def send() -> Any:
+        async with limiter.request_async(property_id):
+            async with in_flight:
+                started = time.perf_counter()
+                try:
+                    response = await client.batch_run_reports(batch, timeout=REQUEST_TIMEOUT_SECONDS)
+                except Exception as e:
+                    _record_call_error(property_id, 'batch_run_reports', started, e)
+                    if isinstance(e, exceptions.ResourceExhausted):
+                        _record_exhausted(limiter, property_id)
+                    raise
+            _record_call(property_id, 'batch_run_reports', started, response, response.reports, batch.requests)
+            return response
+
+    response = await get_retry_policy().call_async(send, property_id)
+    for index, report in zip(missing, response.reports):
+        limiter.record_quota(property_id, report.property_quota)
+        reports[index] = report
+    if cache:
+        await asyncio.to_thread(lambda: [cache.put(requests[index], reports[index]) for index in missing])
+    return reports
+
+
+async def _bounded_map_async(
+    func: Callable[[T], Awaitable[R]], items: Iterable[T], max_pending: int
+) -> AsyncIterator[R]:
+    """
+    Coroutine counterpart of pipeline.bounded_map: runs func over items as
+    tasks, at most max_pending started and not yet consumed, so a slow
+    consumer holds back the fetching.
+
+    Yields:
+        Results in item order
+    """
+    items = iter(items)
+    pending: Deque[asyncio.Task] = deque()
+    try:
+        for item in items:
+            pending.append(asyncio.ensure_future(func(item)))
+            if len(pending) >= max(1, max_pending):
+                break
+        while pending:
+            result = await pending.popleft()
+            item = next(items, _DONE)
+            if item is not _DONE:
+                pending.append(asyncio.ensure_future(func(item)))
+            yield result
+    finally:
+        # The consumer stopped early (or failed): drop work that has not finished
+        for task in pending:
+            task.cancel()
+
+
+async def _fetch_pages_async(
+    client: BetaAnalyticsDataAsyncClient,
+    property_id: str,
+    window: ReportWindow,
+    dimensions: List[Dimension],
+    metrics: List[Metric],
+    limit: int,
+    limiter: RateLimiter,
+    in_flight: asyncio.Semaphore,
+    decode: Callable[[Any], pd.DataFrame],
+    name: str,
+    checkpoint: Optional[PageCheckpoint] = None,
+) -> AsyncIterator[pd.DataFrame]:
+    """
+    Fetches and decodes every page of one request window, in offset order.
+    Pages after the first run concurrently, at most
+    PIPELINE_MAX_PENDING_REQUESTS ahead of the consumer. Each page is decoded
+    off the event loop as soon as it arrives and its protobuf dropped.
+    Checkpointed pages are reused.
+    """
+    limit = window.page_limit(limit)
+
+    def decode_page(offset: int, response: Any) -> Page:
+        page = (response.row_count, decode(response) if response.rows else None)
+        if checkpoint:
+            checkpoint.save(window, offset, page)
+        return page
+
+    async def fetch_page(offset: int) -> Page:
+        saved = await asyncio.to_thread(checkpoint.load, window, offset) if checkpoint else None
+        if saved is not None:
+            return saved
+        request = _window_request(property_id, window, dimensions, metrics, limit, offset)
+        response = await _run_report_async(client, request, limiter, in_flight)
+        return await asyncio.to_thread(decode_page, offset, response)
+
+    row_count, first = await fetch_page(0)
+    if first is None:
+        return
+
+    offsets = _page_offsets(row_count, limit)
+    print(f"   [{name}] > {window.label}: {row_count:,} rows in {len(offsets) + 1} page(s)")
+    yield first
+    del first
+    async for _, chunk in _bounded_map_async(fetch_page, offsets, PIPELINE_MAX_PENDING_REQUESTS):
+        if chunk is not None and not chunk.empty:
+            yield chunk
+
+
+async def _fetch_windows_batched_async(
+    client: BetaAnalyticsDataAsyncClient,
+    property_id: str,
+    windows: List[ReportWindow],
+    dimensions: List[Dimension],
+    metrics: List[Metric],
+    limit: int,
+    limiter: RateLimiter,
+    in_flight: asyncio.Semaphore,
+    decode: Callable[[Any], pd.DataFrame],
+    name: str,
+    checkpoint: Optional[PageCheckpoint] = None,
+) -> AsyncIterator[pd.DataFrame]:
+    """Coroutine version of ga4_report_pull._fetch_windows_batched."""
+    PageKey = Tuple[ReportWindow, int]
+    # Batches of MAX_BATCH_REQUESTS pages held ahead of the consumer for a window's remaining pages
+    max_pending_batches = max(1, PIPELINE_MAX_PENDING_REQUESTS // MAX_BATCH_REQUESTS)
+
+    def decode_reports(chunk: List[PageKey], reports: List[Any]) -> List[Tuple[PageKey, Page]]:
+        pages = []
+        for key, report in zip(chunk, reports):
+            page = (report.row_count, decode(report) if report.rows else None)
+            if checkpoint:
+                checkpoint.save(*key, page)
+            pages.append((key, page))
+        return pages
+
+    async def run_chunk(chunk: List[PageKey]) -> List[Tuple[PageKey, Page]]:
+        requests = [
+            _window_request(property_id, window, dimensions, metrics, window.page_limit(limit), offset)
+            for window, offset in chunk
+        ]
+        reports = await _batch_run_reports_async(client, property_id, requests, limiter, in_flight)
+        return await asyncio.to_thread(decode_reports, chunk, reports)
+
+    async def fetch_all(items: List[PageKey], max_pending: int) -> AsyncIterator[Tuple[PageKey, Page]]:
+        """Yields the pages of `items` in order; checkpointed pages are read back as they come up."""
+        saved = await asyncio.to_thread(_checkpointed_keys, checkpoint, items, name)
+        missing = [key for key in items if key not in saved]
+        chunks = [missing[i:i + MAX_BATCH_REQUESTS] for i in range(0, len(missing), MAX_BATCH_REQUESTS)]
+        fetched = (pair async for pairs in _bounded_map_async(run_chunk, chunks, max_pending) for pair in pairs)
+        for key in items:
+            if key not in saved:
+                yield await fetched.__anext__()
+                continue
+            page = await asyncio.to_thread(checkpoint.load, *key)
+            # Expired since it was listed: fetch it after all
+            yield (key, page) if page is not None else (await run_chunk([key]))[0]
+
+    print(f"   [{name}] Fetching {len(windows)} window(s) in batches of {MAX_BATCH_REQUESTS}...")
+    async for (window, _), (row_count, first) in fetch_all([(window, 0) for window in windows], 1):
+        if first is None:
+            continue
+        offsets = _page_offsets(row_count, window.page_limit(limit))
+        print(f"   [{name}] > {window.label}: {row_count:,} rows in {len(offsets) + 1} page(s)")
+        yield first
+        del first
+        async for _, (_, chunk) in fetch_all([(window, offset) for offset in offsets], max_pending_batches):
+            if chunk is not None:
+                yield chunk
+
+
+async def stream_report_async(
+    property_id: str,
+    property_details: Dict[str, str],
+    limiter: RateLimiter,
+    in_flight: asyncio.Semaphore,
+    consume: Callable[[Iterator[pd.DataFrame]], R],
+    consume_pool: Executor,
+    date_ranges: Optional[List[Dict[str, str]]] = None,
+    manifest: Optional[Manifest] = None,
+) -> R:
+    """
+    Coroutine counterpart of ga4_report_pull.iter_ga4_report: the session-grain
+    query is fetched first and indexed, then event-grain pages are handed
+    through a bounded queue to `consume`, which runs on `consume_pool` and
+    iterates the merged chunks in window/offset order (the sync pipeline's
+    merge and write steps). The queue holds at most
+    PIPELINE_MAX_PENDING_REQUESTS pages, so a slow writer holds back the
+    fetching and memory stays bounded however large the property is.
+
+    Errors while planning or indexing propagate to the caller; errors while
+    fetching event-grain pages are raised inside `consume`'s iteration.
+
+    Args:
+        property_id: GA4 property ID (e.g., 'properties/123456789')
+        property_details: Dictionary containing 'name' and 'hostname' for the property
+        limiter: Shared per-property rate limiter
+        in_flight: Run-wide semaphore bounding in-flight requests
+        consume: Called with the merged chunks, e.g. a writer or list
+        consume_pool: Runs `consume`; not the default executor, which decodes
+            the pages `consume` waits for
+        date_ranges: Ranges to extract (defaults to config.DATE_RANGES)
+        manifest: Extraction manifest holding recorded day probes; new probes are added to it
+
+    Returns:
+        Whatever `consume` returns
+    """
+    name = property_details['name']
+    client = get_async_client()
+    dimensions = [Dimension(name=d) for d in DIMENSION_NAMES]
+    session_dimensions = [Dimension(name=d) for d in SESSION_DIMENSION_NAMES]
+    session_metrics = [Metric(name=m) for m in SESSION_METRIC_NAMES]
+    event_metrics = [Metric(name=m) for m in EVENT_METRIC_NAMES]
+
+    async def run_report(request: RunReportRequest) -> Any:
+        return await _run_report_async(client, request, limiter, in_flight)
+
+    decode = page_decoder(property_id, property_details)
+
+    known_day_rows = await asyncio.to_thread(manifest.settled_probes, property_id, REPORT_SPEC) if manifest else None
+    windows, probed = await plan_report_windows_async(
+        date_ranges or DATE_RANGES, property_id, dimensions, event_metrics, run_report, name, known_day_rows
+    )
+    if manifest:
+        await asyncio.to_thread(manifest.record_probes, property_id, REPORT_SPEC, probed)
+
+    async def fetch(
+        query_dimensions: List[Dimension], query_metrics: List[Metric], spec: str
+    ) -> AsyncIterator[pd.DataFrame]:
+        checkpoint = page_checkpoint(property_id, spec, PAGE_SIZE)
+        if USE_BATCH_REQUESTS:
+            async for chunk in _fetch_windows_batched_async(
+                client, property_id, windows, query_dimensions, query_metrics, PAGE_SIZE, limiter, in_flight,
+                decode, name, checkpoint,
+            ):
+                yield chunk
+            return
+        for window in windows:
+            print(f"   [{name}] Fetching data for {window.label}...")
+            async for chunk in _fetch_pages_async(
+                client, property_id, window, query_dimensions, query_metrics, PAGE_SIZE, limiter, in_flight,
+                decode, name, checkpoint,
+            ):
+                yield chunk
+
+    print(f"   [{name}] Session-grain query...")
+    session_chunks = [chunk async for chunk in fetch(session_dimensions, session_metrics, SESSION_REPORT_SPEC)]
+    index = await asyncio.to_thread(session_index, property_id, session_chunks)
+    del session_chunks
+    print(f"   [{name}] Event-grain query ({len(index):,} session-grain rows indexed)...")
+
+    loop = asyncio.get_running_loop()
+    pages: asyncio.Queue = asyncio.Queue(maxsize=PIPELINE_MAX_PENDING_REQUESTS)
+
+    async def produce() -> None:
+        try:
+            async for chunk in fetch(dimensions, event_metrics, EVENT_REPORT_SPEC):
+                await pages.put(chunk)
+        except Exception as e:
+            await pages.put(e)
+        else:
+            await pages.put(_DONE)
+
+    def event_chunks() -> Iterator[pd.DataFrame]:
+        while True:
+            item = asyncio.run_coroutine_threadsafe(pages.get(), loop).result()
+            if item is _DONE:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+    producer = asyncio.ensure_future(produce())
+    try:
+        return await loop.run_in_executor(consume_pool, consume, merge_scopes(property_id, index, event_chunks()))
+    finally:
+        # The consumer stopped early (or failed): stop fetching pages nobody will read
+        producer.cancel()
+        await asyncio.gather(producer, return_exceptions=True)
+
+
+async def get_ga4_report_async(
+    property_id: str,
+    property_details: Dict[str, str],
+    limiter: RateLimiter,
+    in_flight: asyncio.Semaphore,
+    date_ranges: Optional[List[Dict[str, str]]] = None,
+) -> Optional[pd.DataFrame]:
+    """
+    Coroutine version of ga4_report_pull.get_ga4_report.
+
+    Returns:
+        DataFrame with all columns or None if error occurs
+    """
+    name = property_details['name']
+    consume_pool = ThreadPoolExecutor(max_workers=1)
+    try:
+        chunks = await stream_report_async(
+            property_id, property_details, limiter, in_flight, list, consume_pool, date_ranges
+        )
+        if not chunks:
+            return pd.DataFrame()
+
+        df = await asyncio.to_thread(concat_frames, chunks)
+        print(f"   [{name}] Total rows in DataFrame: {len(df):,} ({len(chunks)} page(s))")
+        return df
+
+    except Exception as e:
+        report_fetch_error(property_id, name, e)
+        return None
+    finally:
+        consume_pool.shutdown(wait=False)
+
+
+async def process_property_async(
+    idx: int,
+    total: int,
+    property_id: str,
+    details: Dict[str, str],
+    output_dir: str,
+    limiter: RateLimiter,
+    in_flight: asyncio.Semaphore,
+    manifest: Manifest,
+    writer: OutputWriter,
+    writer_pool: Executor,
+    refresh: bool = False,
+) -> Tuple[str, Optional[str]]:
+    """
+    Coroutine version of ga4_report_pull.process_property. The property's
+    output is written on `writer_pool`, which needs a thread per concurrent
+    property.
+    """
+    name = details['name']
+    print(f"[{idx}/{total}] Processing: {name} ({property_id})")
+
+    days, date_ranges = pending_date_ranges(property_id, details, manifest, refresh)
+    if days == []:
+        print(f"   [{name}] [SKIP] All configured days already extracted (manifest: {manifest.path})")
+        print(f"   [{name}] To re-extract, run again with --refresh.")
+        return 'skipped', None
+
+    def write(chunks: Iterator[pd.DataFrame]) -> Tuple[Tuple[str, Optional[str]], DayStats]:
+        return write_property_output(chunks, property_id, details, output_dir, writer, days)
+
+    started = time.monotonic()
+    try:
+        result, stats = await stream_report_async(
+            property_id, details, limiter, in_flight, write, writer_pool, date_ranges, manifest
+        )
+    except Exception as e:
+        report_fetch_error(property_id, name, e)
+        print(f"   [{name}] [ERROR] Failed to retrieve data")
+        result, stats = ('failed', None), DayStats()
+
+    await asyncio.to_thread(
+        complete_extraction, manifest, property_id, details, days, result, stats, time.monotonic() - started
+    )
+    return result
+
+
+async def run_properties_async(
+    properties: Dict[str, Dict[str, str]],
+    output_dir: str,
+    limiter: RateLimiter,
+    workers: int,
+    manifest: Manifest,
+    writer: OutputWriter,
+    refresh: bool = False,
+) -> List[Tuple[str, Optional[str]]]:
+    """
+    Async engine: extracts properties as coroutines, at most `workers` at a time.
+
+    Returns:
+        (status, saved file path) per property, in start order
+    """
+    in_flight = asyncio.Semaphore(ASYNC_MAX_IN_FLIGHT)
+    property_slots = asyncio.Semaphore(workers)
+    # Each running property's writer blocks a thread for its whole event-grain
+    # query; on the default executor they would starve the page decoding
+    writer_pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ga4-writer')
+    total = len(properties)
+
+    async def run_one(idx: int, property_id: str, details: Dict[str, str]) -> Tuple[str, Optional[str]]:
+        async with property_slots:
+            try:
+                return await process_property_async(
+                    idx, total, property_id, details, output_dir, limiter, in_flight, manifest, writer,
+                    writer_pool, refresh,
+                )
+            except Exception as e:
+                print(f"   [{details['name']}] [ERROR] Unexpected failure - {type(e).__name__}: {str(e)}")
+                return 'failed', None
+
+    try:
+        return list(await asyncio.gather(*(
+            run_one(idx, property_id, details)
+            for idx, (property_id, details) in enumerate(properties.items(), 1)
+        )))
+    finally:
+        # Writers have all returned unless the run was interrupted, which must not block the event loop
+        writer_pool.shutdown(wait=False)
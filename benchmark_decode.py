@@ -0,0 +1,125 @@
+"""
+Benchmark for GA4 response decoding (page_to_frame).
+
+Builds synthetic RunReportResponse pages with the pipeline's dimensions and
+metrics, then measures rows/sec and DataFrame memory of the previous row-wise decoder (nested list
+comprehensions + per-row .apply transforms) against the current columnar one.
+No API access or credentials are needed.
+
+Usage:
+    python benchmark_decode.py --rows 100000 --repeat 3
+"""
+
+import argparse
+import sys
+import time
+from typing import Any, Callable, Dict
+
+import pandas as pd
+from google.analytics.data_v1beta.types import MetricType, RunReportResponse
+
+from config import COLUMN_MAPPING, OUTPUT_COLUMN_ORDER
+from ga4_report_pull import DIMENSION_NAMES, METRIC_NAMES, NUMERIC_COLUMNS, page_to_frame
+
+PROPERTY_DETAILS = {'name': 'Benchmark Website', 'hostname': 'benchmark.example.com'}
+
+
+def build_response(rows: int) -> RunReportResponse:
+    """Builds a synthetic single-page response with realistic cardinalities."""
+    pb = RunReportResponse.pb()()
+    for name in DIMENSION_NAMES:
+        pb.dimension_headers.add(name=name)
+    for name in METRIC_NAMES:
+        metric_type = MetricType.TYPE_CURRENCY if name == 'totalRevenue' else MetricType.TYPE_INTEGER
+        pb.metric_headers.add(name=name, type_=metric_type)
+
+    for i in range(rows):
+        row = pb.rows.add()
+        for value in (
+            f"event_{i % 40}",
+            f"202511{i % 28 + 1:02d}",
+            f"https://www.benchmark.example.com/page/{i % 5000}?ref={i % 13}",
+            f"Country {i % 120}",
+            ('desktop', 'mobile', 'tablet')[i % 3],
+            f"Channel {i % 12}",
+            f"medium_{i % 25}",
+            f"source_{i % 300}",
+            f"campaign_{i % 80}",
+        ):
+            row.dimension_values.add(value=value)
+        for j in range(len(METRIC_NAMES) - 1):
+            row.metric_values.add(value=str((i + j) % 97))
+        row.metric_values.add(value=f"{(i % 50) * 1.25:.2f}")
+    pb.row_count = rows
+    return RunReportResponse.wrap(pb)
+
+
+def legacy_page_to_frame(response: Any, property_details: Dict[str, str]) -> pd.DataFrame:
+    """The row-wise decoder page_to_frame replaced, kept as the benchmark baseline."""
+    dimension_headers = [header.name for header in response.dimension_headers]
+    metric_headers = [header.name for header in response.metric_headers]
+    column_names = ['Website Name'] + dimension_headers + metric_headers
+
+    data = []
+    for row in response.rows:
+        row_values = [property_details['name']]
+        row_values.extend([dim_value.value for dim_value in row.dimension_values])
+        row_values.extend([metric_value.value for metric_value in row.metric_values])
+        data.append(row_values)
+
+    df = pd.DataFrame(data, columns=column_names)
+    df['FullURL'] = df['fullPageUrl'].apply(
+        lambda x: x.replace('https://', '').replace('http://', '') if x else ''
+    )
+    df = df.drop(columns=['fullPageUrl'])
+    df['date'] = df['date'].apply(
+        lambda x: f"{x[:4]}-{x[4:6]}-{x[6:8]}" if x and len(x) == 8 and x.isdigit() else x
+    )
+    df = df.rename(columns=COLUMN_MAPPING)
+    df = df[[col for col in OUTPUT_COLUMN_ORDER if col in df.columns]]
+    for col in NUMERIC_COLUMNS:
+        df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
+    return df
+
+
+def measure(decoder: Callable[[Any, Dict[str, str]], pd.DataFrame], response: Any, repeat: int) -> float:
+    """Returns the best rows/sec over `repeat` runs."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        decoder(response, PROPERTY_DETAILS)
+        best = min(best, time.perf_counter() - start)
+    return len(response.rows) / best
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark GA4 response decoding")
+    parser.add_argument('--rows', type=int, default=100000, help="Rows in the synthetic page (default: 100000)")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per decoder; best is reported (default: 3)")
+    args = parser.parse_args()
+
+    print(f"Building synthetic page with {args.rows:,} rows...")
+    response = build_response(args.rows)
+
+    expected = legacy_page_to_frame(response, PROPERTY_DETAILS)
+    actual = page_to_frame(response, PROPERTY_DETAILS)
+    pd.testing.assert_frame_equal(
+        expected.astype(str).reset_index(drop=True),
+        actual.astype(str).reset_index(drop=True),
+    )
+    print("Outputs match.")
+
+    before = measure(legacy_page_to_frame, response, args.repeat)
+    after = measure(page_to_frame, response, args.repeat)
+    print("=" * 50)
+    print(f"Row-wise decoder (before): {before:>12,.0f} rows/sec")
+    print(f"Columnar decoder (after):  {after:>12,.0f} rows/sec")
+    print(f"Speedup:                   {after / before:>12.1f}x")
+    print(f"Memory (before):           {expected.memory_usage(deep=True).sum() / 1e6:>12.1f} MB")
+    print(f"Memory (after):            {actual.memory_usage(deep=True).sum() / 1e6:>12.1f} MB")
+    print("=" * 50)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,243 @@
+"""
+End-to-end benchmark of the extraction pipeline against the fake GA4 Data API.
+
+Starts fake_ga4_server.py in-process and runs the real extraction code
+against it over gRPC: planning, fetching, decoding, scope merging and
+writing, exactly as in production but without credentials or quota. Each
+run happens in a fresh child process and working directory (empty manifest,
+no response cache or checkpoints), so runs are independent and their peak
+memory can be measured.
+
+Entries:
+    main    ga4_report_pull.main(): the full run, output files included
+    report  get_ga4_report() per property: the in-memory DataFrame path
+
+Scenarios are the combinations of --engine, --format and --decode-processes.
+For each, throughput (rows/sec), API calls, bytes served and the peak RSS of
+the extraction process and of its decode processes are reported; with
+--repeat the fastest run is kept. The fake server shares this machine's
+CPUs, so absolute numbers are lower than against Google; compare scenarios
+and commits with each other.
+
+Usage:
+    python benchmark_e2e.py --properties 4 --rows-per-day 50000 --latency 0.2
+    python benchmark_e2e.py --engine sync async --decode-processes 0 auto --repeat 3
+    python benchmark_e2e.py --entry report --cardinality fullPageUrl=20000 --json results.json
+"""
+
+import argparse
+import glob
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from itertools import product
+from typing import Any, Dict, List, Optional
+
+from fake_ga4_server import FakeGA4Server, add_settings_arguments, settings_from_args
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Synthetic properties are properties/1000001, properties/1000002, ...
+FIRST_PROPERTY_NUMBER = 1000001
+
+
+def build_properties(count: int) -> Dict[str, Dict[str, str]]:
+    """Builds `count` synthetic property configurations."""
+    return {
+        f"properties/{FIRST_PROPERTY_NUMBER + k}": {
+            'name': f"Benchmark Property {k + 1}",
+            'hostname': f"property{k + 1}.example.com",
+        }
+        for k in range(count)
+    }
+
+
+def _peak_rss_mb(children: bool = False) -> Optional[float]:
+    """Peak resident memory of this process (or of its largest finished child), in MB."""
+    try:
+        import resource
+    except ImportError:
+        # Not available on Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, kilobytes on Linux
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _count_written_rows() -> int:
+    """Sums the rows of successful properties from the run's metrics events."""
+    rows = 0
+    for path in glob.glob(os.path.join('output', '*', 'metrics_*.jsonl')):
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                event = json.loads(line)
+                if event['event'] == 'property' and event['status'] == 'success':
+                    rows += event['rows']
+    return rows
+
+
+def run_child(spec_path: str) -> int:
+    """Runs one scenario in this (child) process and writes its result next to the spec."""
+    with open(spec_path, encoding='utf-8') as f:
+        spec = json.load(f)
+
+    started = time.perf_counter()
+    if spec['entry'] == 'main':
+        from ga4_report_pull import main
+        main(spec['argv'], spec['properties'])
+        rows = _count_written_rows()
+    else:
+        from ga4_report_pull import RateLimiter, get_ga4_report
+        from pipeline import shutdown_decode_pool
+        limiter = RateLimiter()
+        rows = 0
+        try:
+            for property_id, details in spec['properties'].items():
+                df = get_ga4_report(property_id, details, limiter)
+                rows += 0 if df is None else len(df)
+        finally:
+            # Waits for the decode processes, so their peak memory is counted below
+            shutdown_decode_pool()
+    seconds = time.perf_counter() - started
+
+    result = {
+        'rows': rows,
+        'seconds': seconds,
+        'peak_rss_mb': _peak_rss_mb(),
+        # 0 (reported as n/a) when pages were decoded in-process
+        'decode_peak_rss_mb': _peak_rss_mb(children=True) or None,
+    }
+    with open(os.path.join(os.path.dirname(spec_path), 'result.json'), 'w', encoding='utf-8') as f:
+        json.dump(result, f)
+    return 0
+
+
+def run_scenario(
+    server: FakeGA4Server,
+    scenario: Dict[str, str],
+    entry: str,
+    properties: Dict[str, Dict[str, str]],
+    workers: Optional[int],
+    keep: bool,
+) -> Dict[str, Any]:
+    """Runs one scenario in a fresh child process and working directory."""
+    workdir = tempfile.mkdtemp(prefix='ga4_benchmark_')
+    argv = ['--engine', scenario['engine'], '--format', scenario['format']]
+    if workers is not None:
+        argv += ['--workers', str(workers)]
+    spec_path = os.path.join(workdir, 'spec.json')
+    with open(spec_path, 'w', encoding='utf-8') as f:
+        json.dump({'entry': entry, 'argv': argv, 'properties': properties}, f)
+
+    env = dict(
+        os.environ,
+        GA4_EMULATOR_HOST=server.address,
+        GA4_DECODE_PROCESSES=scenario['decode_processes'],
+        GA4_RESPONSE_CACHE='0',
+        GA4_CHECKPOINTS='0',
+        GA4_METRICS='1',
+        PYTHONPATH=os.pathsep.join(filter(None, [PROJECT_DIR, os.environ.get('PYTHONPATH')])),
+    )
+    before = dict(server.service.stats)
+    with open(os.path.join(workdir, 'run.log'), 'w', encoding='utf-8') as log:
+        completed = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--run-child', spec_path],
+            cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT,
+        )
+    served = {key: value - before[key] for key, value in server.service.stats.items()}
+
+    result_path = os.path.join(workdir, 'result.json')
+    if completed.returncode != 0 or not os.path.exists(result_path):
+        raise RuntimeError(f"Benchmark run failed (exit code {completed.returncode}); "
+                           f"see {os.path.join(workdir, 'run.log')}")
+    with open(result_path, encoding='utf-8') as f:
+        result = json.load(f)
+    result.update(scenario, calls=served['calls'], errors=served['errors'], mb_served=served['bytes'] / 1e6)
+    result['rows_per_second'] = result['rows'] / result['seconds'] if result['seconds'] else 0.0
+
+    if keep:
+        result['workdir'] = workdir
+    else:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return result
+
+
+def _format_mb(value: Optional[float]) -> str:
+    return 'n/a' if value is None else f"{value:,.0f}"
+
+
+def print_results(results: List[Dict[str, Any]]) -> None:
+    print("=" * 100)
+    print(f"{'Engine':<7}{'Format':<9}{'Decode':>7}{'Rows':>12}{'Seconds':>9}{'Rows/s':>11}"
+          f"{'Calls':>7}{'Errors':>7}{'MB served':>11}{'Peak MB':>9}{'Decode MB':>11}")
+    print("-" * 100)
+    for result in results:
+        print(f"{result['engine']:<7}{result['format']:<9}{result['decode_processes']:>7}{result['rows']:>12,}"
+              f"{result['seconds']:>9.2f}{result['rows_per_second']:>11,.0f}{result['calls']:>7}"
+              f"{result['errors']:>7}{result['mb_served']:>11,.1f}{_format_mb(result['peak_rss_mb']):>9}"
+              f"{_format_mb(result['decode_peak_rss_mb']):>11}")
+    print("=" * 100)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="End-to-end benchmark against the fake GA4 Data API")
+    parser.add_argument('--entry', choices=['main', 'report'], default='main',
+                        help="Code path to run: main() or get_ga4_report() per property (default: main)")
+    parser.add_argument('--properties', type=int, default=2, help="Synthetic properties (default: 2)")
+    parser.add_argument('--engine', nargs='+', choices=['sync', 'async'], default=['sync'],
+                        help="Engines to benchmark (default: sync)")
+    parser.add_argument('--format', nargs='+', default=['csv'],
+                        help="Output formats to benchmark (default: csv)")
+    parser.add_argument('--decode-processes', nargs='+', default=['auto'],
+                        help="GA4_DECODE_PROCESSES values to benchmark, e.g. 0 auto 4 (default: auto)")
+    parser.add_argument('--workers', type=int, help="Concurrent properties (default: config)")
+    parser.add_argument('--repeat', type=int, default=1, help="Runs per scenario; fastest is reported (default: 1)")
+    parser.add_argument('--no-warmup', action='store_true',
+                        help="Skip the unmeasured first run that fills the fake server's caches")
+    parser.add_argument('--keep', action='store_true', help="Keep each run's working directory and output")
+    parser.add_argument('--json', metavar='PATH', help="Also write the results as JSON")
+    parser.add_argument('--run-child', metavar='SPEC', help=argparse.SUPPRESS)
+    add_settings_arguments(parser)
+    args = parser.parse_args()
+
+    if args.run_child:
+        return run_child(args.run_child)
+
+    properties = build_properties(args.properties)
+    settings = settings_from_args(args)
+    scenarios = [
+        {'engine': engine, 'format': output_format, 'decode_processes': decode_processes}
+        for engine, output_format, decode_processes in product(args.engine, args.format, args.decode_processes)
+    ]
+
+    with FakeGA4Server(settings) as server:
+        print(f"Fake GA4 Data API on {server.address}: {len(properties)} properties, "
+              f"~{settings.rows_per_day:,} event rows per property and day, latency {settings.latency}s")
+        if not args.no_warmup:
+            print("Warm-up run...")
+            run_scenario(server, scenarios[0], args.entry, properties, args.workers, keep=False)
+
+        results = []
+        for scenario in scenarios:
+            runs = []
+            for attempt in range(max(1, args.repeat)):
+                result = run_scenario(server, scenario, args.entry, properties, args.workers, args.keep)
+                print(f"   {scenario['engine']}/{scenario['format']}/decode={scenario['decode_processes']} "
+                      f"run {attempt + 1}: {result['rows']:,} rows in {result['seconds']:.2f}s")
+                runs.append(result)
+            results.append(min(runs, key=lambda run: run['seconds']))
+
+    print_results(results)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.json}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -12,6 +12,7 @@ from google.analytics.data_v1beta import BetaAnalyticsDataClient
 from google.analytics.data_v1beta.types import DateRange, Dimension, Metric, RunReportRequest
 
 from config import KEY_FILE_PATH
+from ga4_client import get_client
 from properties import GA4_PROPERTIES
 
 
@@ -43,7 +44,7 @@ def main() -> int:
         return 1
 
     try:
-        client = BetaAnalyticsDataClient.from_service_account_json(KEY_FILE_PATH)
+        client = get_client()
     except Exception as e:
         print(f"[ERROR] Could not initialize GA4 client with key {KEY_FILE_PATH}: {e}")
         return 1
@@ -0,0 +1,105 @@
+"""
+Crash-safe page checkpoints for resuming interrupted extractions.
+
+Every decoded report page is written to disk as soon as it completes, keyed by
+(property, report spec, request window, page size, offset). If a property
+fails or the process dies, the next run reuses the completed pages and only
+requests the ones still missing. A property's checkpoints are deleted once its
+output has been saved.
+
+Checkpoints older than CHECKPOINT_MAX_AGE_HOURS are ignored, so pages of
+still-changing recent days are not combined with pages fetched much later.
+"""
+
+import hashlib
+import os
+import pickle
+import shutil
+import tempfile
+import time
+from typing import Optional, Tuple
+
+import pandas as pd
+
+from config import CHECKPOINT_DIR, CHECKPOINT_ENABLED, CHECKPOINT_MAX_AGE_HOURS
+from profiling import profile_stage
+from request_planner import ReportWindow
+
+# (row_count reported by GA4, decoded chunk or None if the page was empty)
+Page = Tuple[int, Optional[pd.DataFrame]]
+
+
+class PageCheckpoint:
+    """Completed pages of one property's extraction, stored one file per page."""
+
+    def __init__(
+        self,
+        property_id: str,
+        report_spec: str,
+        limit: int,
+        directory: str = CHECKPOINT_DIR,
+        max_age_hours: float = CHECKPOINT_MAX_AGE_HOURS,
+    ):
+        self.property_id = property_id
+        self.limit = limit
+        self.max_age_seconds = max_age_hours * 3600
+        property_number = property_id.split('/')[-1]
+        self.directory = os.path.join(directory, f"{property_number}_{report_spec}")
+
+    def _path(self, window: ReportWindow, offset: int) -> str:
+        key = (f"{window.start_date}|{window.end_date}|{window.split_dimension}|{window.split_value}|"
+               f"{window.page_limit(self.limit)}|{offset}")
+        if window.excluded_values:
+            key += '|' + ','.join(window.excluded_values)
+        return os.path.join(self.directory, hashlib.sha256(key.encode('utf-8')).hexdigest()[:32] + '.pkl')
+
+    def has(self, window: ReportWindow, offset: int) -> bool:
+        """Whether a page is checkpointed (and recent enough to be loaded)."""
+        with profile_stage(self.property_id, 'checkpoint'):
+            try:
+                return time.time() - os.path.getmtime(self._path(window, offset)) <= self.max_age_seconds
+            except OSError:
+                return False
+
+    def load(self, window: ReportWindow, offset: int) -> Optional[Page]:
+        """Returns a completed page, or None if it was not checkpointed (or is too old)."""
+        with profile_stage(self.property_id, 'checkpoint'):
+            path = self._path(window, offset)
+            try:
+                if time.time() - os.path.getmtime(path) > self.max_age_seconds:
+                    return None
+                with open(path, 'rb') as f:
+                    return pickle.load(f)
+            except (OSError, pickle.UnpicklingError, EOFError):
+                return None
+
+    def save(self, window: ReportWindow, offset: int, page: Page) -> None:
+        """Atomically persists a completed page."""
+        with profile_stage(self.property_id, 'checkpoint'):
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+                with os.fdopen(fd, 'wb') as f:
+                    pickle.dump(page, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp_path, self._path(window, offset))
+            except OSError as e:
+                # Losing a checkpoint only costs a refetch on resume
+                print(f"   [CHECKPOINT] Could not save page: {e}")
+
+    def page_count(self) -> int:
+        """Number of pages currently checkpointed."""
+        try:
+            return sum(1 for f in os.listdir(self.directory) if f.endswith('.pkl'))
+        except OSError:
+            return 0
+
+    def clear(self) -> None:
+        """Deletes all of the property's checkpoints."""
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def page_checkpoint(property_id: str, report_spec: str, limit: int) -> Optional[PageCheckpoint]:
+    """Returns the property's page checkpoint, or None if checkpointing is disabled."""
+    if not CHECKPOINT_ENABLED:
+        return None
+    return PageCheckpoint(property_id, report_spec, limit)
@@ -13,6 +13,20 @@ load_dotenv()
 # Can be overridden with SERVICE_ACCOUNT_KEY_PATH environment variable
 KEY_FILE_PATH = os.getenv('SERVICE_ACCOUNT_KEY_PATH', 'service-account-key.json')
 
+# --- API Client ---
+# Number of gRPC channels shared by all workers (clients are handed out round-robin)
+CLIENT_CHANNEL_POOL_SIZE = int(os.getenv('GA4_CLIENT_CHANNEL_POOL_SIZE', '4'))
+
+# gRPC transport compression: 'gzip' or 'none'
+GRPC_COMPRESSION = os.getenv('GA4_GRPC_COMPRESSION', 'none').lower()
+
+# On-disk cache of the OAuth access token, reused across runs until expiry
+TOKEN_CACHE_PATH = os.getenv('GA4_TOKEN_CACHE_PATH', '.ga4_token_cache.json')
+
+# host:port of a local stand-in for the Data API (e.g. fake_ga4_server.py), used without TLS
+# or credentials; empty connects to Google
+EMULATOR_HOST = os.getenv('GA4_EMULATOR_HOST', '')
+
 # Date range configuration for reports
 # Options: 'today', 'yesterday', '7daysAgo', '30daysAgo', 'YYYY-MM-DD'
 # Default is yesterday's data for daily automation
@@ -72,3 +86,172 @@ OUTPUT_COLUMN_ORDER = [
     'Total revenue',
 ]
 
+# Output columns holding metric values: int64, except FLOAT_METRIC_COLUMNS (currency) as float64.
+# Every chunk and output file uses these types (see dataset.output_schema).
+NUMERIC_COLUMNS = [
+    'Sessions', 'Engaged sessions', 'Views',
+    'Active users', 'New users', 'Total users', 'Total revenue'
+]
+FLOAT_METRIC_COLUMNS = ['Total revenue']
+METRIC_DTYPES = {col: 'float64' if col in FLOAT_METRIC_COLUMNS else 'int64' for col in NUMERIC_COLUMNS}
+
+# Low-cardinality output columns kept as pandas 'category' (dictionary-encoded)
+# from decoding through to the writer
+CATEGORICAL_COLUMNS = [
+    'Website Name', 'Event name', 'Date', 'Country', 'Device category',
+    'Session default channel grouping', 'Session medium', 'Session source', 'Session campaign'
+]
+
+
+# --- Concurrency & Rate Limiting ---
+# Number of properties extracted at the same time.
+# GA4 quotas are per property, so properties do not compete for the same tokens.
+MAX_CONCURRENT_PROPERTIES = int(os.getenv('GA4_MAX_CONCURRENT_PROPERTIES', '8'))
+
+# Extraction engine: 'sync' (worker threads) or 'async' (asyncio coroutines on one thread)
+EXTRACTION_ENGINE = os.getenv('GA4_ENGINE', 'sync')
+
+# Async engine only: maximum in-flight requests across all properties
+ASYNC_MAX_IN_FLIGHT = int(os.getenv('GA4_ASYNC_MAX_IN_FLIGHT', '200'))
+
+# Maximum in-flight requests against a single property (GA4 standard quota: 10)
+MAX_CONCURRENT_REQUESTS_PER_PROPERTY = int(os.getenv('GA4_MAX_CONCURRENT_REQUESTS_PER_PROPERTY', '10'))
+
+# Minimum spacing between two requests to the same property, in seconds.
+# Actual spacing adapts to the quota GA4 reports back and is never below this floor.
+MIN_REQUEST_INTERVAL_SECONDS = float(os.getenv('GA4_MIN_REQUEST_INTERVAL_SECONDS', '0.05'))
+
+# Tokens left untouched per property so dashboards sharing the property keep working
+# (GA4 standard properties get 40,000 tokens/hour and 200,000 tokens/day)
+QUOTA_RESERVE_TOKENS_PER_HOUR = int(os.getenv('GA4_QUOTA_RESERVE_TOKENS_PER_HOUR', '1000'))
+QUOTA_RESERVE_TOKENS_PER_DAY = int(os.getenv('GA4_QUOTA_RESERVE_TOKENS_PER_DAY', '5000'))
+
+# Initial pause after a ResourceExhausted error; doubles on consecutive errors
+QUOTA_EXHAUSTED_BACKOFF_SECONDS = float(os.getenv('GA4_QUOTA_EXHAUSTED_BACKOFF_SECONDS', '30'))
+
+# --- Scheduling ---
+# Property start order: 'longest-first' (estimated from the manifest's past
+# runs, so the largest properties never start last) or 'config' (properties.py order)
+SCHEDULING = os.getenv('GA4_SCHEDULING', 'longest-first').lower()
+
+# Most recent runs per property used to estimate its extraction speed
+SCHEDULER_HISTORY_RUNS = int(os.getenv('GA4_SCHEDULER_HISTORY_RUNS', '5'))
+
+# --- Request Batching ---
+# Group single-day requests for the same property into BatchRunReports calls
+# (up to 5 reports per round trip). Set GA4_USE_BATCH_REQUESTS=0 to send one
+# RunReport call per day and page instead.
+USE_BATCH_REQUESTS = os.getenv('GA4_USE_BATCH_REQUESTS', '1').lower() not in ('0', 'false', 'no')
+
+# --- Pagination ---
+# Most rows the GA4 API returns in one page
+MAX_PAGE_SIZE = 250000
+
+# Rows per report page (up to MAX_PAGE_SIZE). Remaining pages are fetched
+# concurrently once the first page reports the total row count. A window the
+# planner expects to be a little larger than one page is fetched as a single
+# page sized to its estimate instead (up to MAX_PAGE_SIZE).
+PAGE_SIZE = min(int(os.getenv('GA4_PAGE_SIZE', '100000')), MAX_PAGE_SIZE)
+
+# --- Pipeline ---
+# Worker processes decoding response pages in parallel with fetching:
+# 'auto' uses one per CPU core beyond the first; 0 decodes in the fetch threads
+_decode_processes = os.getenv('GA4_DECODE_PROCESSES', 'auto').lower()
+DECODE_PROCESSES = max(0, (os.cpu_count() or 1) - 1) if _decode_processes == 'auto' else int(_decode_processes)
+
+# Requests per property that may be in flight or fetched but not yet written.
+# Fetching pauses while this many are waiting, which bounds memory per property.
+PIPELINE_MAX_PENDING_REQUESTS = int(os.getenv(
+    'GA4_PIPELINE_MAX_PENDING_REQUESTS', str(2 * MAX_CONCURRENT_REQUESTS_PER_PROPERTY)
+))
+
+# --- Request Planning ---
+# Consecutive days are coalesced into one request window while the window's
+# expected row count stays below this (defaults to one page)
+WINDOW_TARGET_ROWS = int(os.getenv('GA4_WINDOW_TARGET_ROWS', str(PAGE_SIZE)))
+
+# A single day expected to return more rows than this is split into one
+# request per value of SPLIT_DIMENSION
+MAX_ROWS_PER_WINDOW = int(os.getenv('GA4_MAX_ROWS_PER_WINDOW', '1000000'))
+SPLIT_DIMENSION = os.getenv('GA4_SPLIT_DIMENSION', 'deviceCategory')
+
+# --- Incremental Extraction ---
+# SQLite manifest of extracted (property, date, report spec) units. Runs only
+# request days missing from it (use --refresh to re-extract everything).
+MANIFEST_PATH = os.getenv('GA4_MANIFEST_PATH', 'ga4_manifest.sqlite')
+
+# Days extracted before they were this many days old are fetched again, since
+# GA4 may still be processing them
+MANIFEST_FRESHNESS_DAYS = int(os.getenv('GA4_MANIFEST_FRESHNESS_DAYS', '3'))
+
+# --- Response Cache ---
+# On-disk cache of report responses keyed by a hash of the request.
+# Set GA4_RESPONSE_CACHE=0 to always call the API.
+RESPONSE_CACHE_ENABLED = os.getenv('GA4_RESPONSE_CACHE', '1').lower() not in ('0', 'false', 'no')
+RESPONSE_CACHE_DIR = os.getenv('GA4_RESPONSE_CACHE_DIR', '.ga4_response_cache')
+
+# Maximum cache size in megabytes; least recently used responses are evicted first
+RESPONSE_CACHE_MAX_MB = float(os.getenv('GA4_RESPONSE_CACHE_MAX_MB', '2048'))
+
+# Responses for days at least this old are final and never expire
+RESPONSE_CACHE_FRESHNESS_DAYS = int(os.getenv('GA4_RESPONSE_CACHE_FRESHNESS_DAYS', '3'))
+
+# Responses touching more recent days are reused for this many seconds
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv('GA4_RESPONSE_CACHE_TTL_SECONDS', '3600'))
+
+# --- Checkpointing ---
+# Completed report pages are saved here so an interrupted run resumes from the
+# last finished page. Set GA4_CHECKPOINTS=0 to disable.
+CHECKPOINT_ENABLED = os.getenv('GA4_CHECKPOINTS', '1').lower() not in ('0', 'false', 'no')
+CHECKPOINT_DIR = os.getenv('GA4_CHECKPOINT_DIR', '.ga4_checkpoints')
+
+# Checkpointed pages older than this are fetched again
+CHECKPOINT_MAX_AGE_HOURS = float(os.getenv('GA4_CHECKPOINT_MAX_AGE_HOURS', '24'))
+
+# --- Retries ---
+# Timeout of a single API call, in seconds
+REQUEST_TIMEOUT_SECONDS = float(os.getenv('GA4_REQUEST_TIMEOUT_SECONDS', '120'))
+
+# Transient errors (Unavailable, DeadlineExceeded, ResourceExhausted, ...) are
+# retried with exponential backoff and jitter; PermissionDenied, InvalidArgument
+# and other fatal errors fail the property right away
+RETRY_MAX_ATTEMPTS = int(os.getenv('GA4_RETRY_MAX_ATTEMPTS', '5'))
+RETRY_BASE_DELAY_SECONDS = float(os.getenv('GA4_RETRY_BASE_DELAY_SECONDS', '1'))
+RETRY_MAX_DELAY_SECONDS = float(os.getenv('GA4_RETRY_MAX_DELAY_SECONDS', '60'))
+
+# A request is not retried once this long has passed since its first attempt
+RETRY_DEADLINE_SECONDS = float(os.getenv('GA4_RETRY_DEADLINE_SECONDS', '1800'))
+
+# Maximum retries across the whole run
+RETRY_BUDGET = int(os.getenv('GA4_RETRY_BUDGET', '200'))
+
+# --- Output ---
+# Output format: 'csv' (one file per property), 'parquet' (per-run dataset
+# partitioned by property and date) or 'dataset' (one unified dataset that
+# re-extracted days are upserted into). Parquet formats require pyarrow.
+# Overridden by --format.
+OUTPUT_FORMAT = os.getenv('GA4_OUTPUT_FORMAT', 'csv').lower()
+
+# Parquet compression codec: 'zstd', 'snappy', 'gzip' or 'none'
+PARQUET_COMPRESSION = os.getenv('GA4_PARQUET_COMPRESSION', 'zstd').lower()
+
+# CSV compression: 'none', 'gzip' or 'zstd' (zstd requires zstandard)
+CSV_COMPRESSION = os.getenv('GA4_CSV_COMPRESSION', 'none').lower()
+
+# Directory of the unified cross-property dataset (--format dataset)
+DATASET_DIR = os.getenv('GA4_DATASET_DIR', os.path.join('output', 'dataset'))
+
+# --- Metrics ---
+# Every API call (latency, rows, response bytes, offsets, quota tokens), stage
+# timing and property result is appended to metrics_<timestamp>.jsonl in the
+# run's output directory. Set GA4_METRICS=0 to disable.
+METRICS_ENABLED = os.getenv('GA4_METRICS', '1').lower() not in ('0', 'false', 'no')
+
+# Prometheus textfile with the run totals, rewritten at the end of every run
+# (default: ga4_export.prom in the run's output directory). Point it into
+# node_exporter's --collector.textfile.directory to scrape it.
+PROMETHEUS_TEXTFILE = os.getenv('GA4_PROMETHEUS_TEXTFILE', '')
+
+# --- Profiling ---
+# Functions (by cumulative time) and allocators listed per stage in --profile reports
+PROFILE_TOP = int(os.getenv('GA4_PROFILE_TOP', '25'))
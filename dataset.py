@@ -0,0 +1,219 @@
+"""
+Unified cross-property Parquet dataset.
+
+With ``--format dataset`` every run upserts into one dataset under DATASET_DIR
+instead of writing new per-run files:
+
+    dataset/
+    └── property=<id>/
+        └── month=YYYY-MM/
+            ├── day-YYYY-MM-DD.parquet   # one file per extracted day
+            └── compacted.parquet        # days merged by compaction
+
+Re-extracting a (property, date) replaces only that day's rows: its day file is
+atomically replaced and the day is removed from the month's compacted file if
+compaction already merged it. A re-extracted day that no longer has any rows
+loses its old day file and compacted rows, so the dataset matches the
+extraction manifest. Other days and properties are not rewritten, so
+overlapping date ranges across runs never produce duplicates.
+
+Compaction merges the day files of settled months into one file per month for
+faster scans:
+
+    python dataset.py compact          # months older than MANIFEST_FRESHNESS_DAYS
+    python dataset.py compact --all    # every month, including the current one
+
+The whole dataset reads as one table, e.g.
+``pyarrow.dataset.dataset('output/dataset', partitioning='hive')``.
+"""
+
+import argparse
+import glob
+import os
+import re
+import sys
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from config import (
+    CATEGORICAL_COLUMNS,
+    DATASET_DIR,
+    MANIFEST_FRESHNESS_DAYS,
+    METRIC_DTYPES,
+    OUTPUT_COLUMN_ORDER,
+    PARQUET_COMPRESSION,
+)
+
+COMPACTED_FILE = 'compacted.parquet'
+
+_DAY_FILE = re.compile(r'^day-(\d{4}-\d{2}-\d{2})\.parquet$')
+_MONTH_DIR = re.compile(r'^month=(\d{4})-(\d{2})$')
+
+
+def output_schema():
+    """
+    Arrow schema of every Parquet output file: the output columns in order,
+    categorical columns as dictionary-encoded strings and metric columns with
+    their fixed METRIC_DTYPES, whatever the types of an individual chunk.
+    """
+    import pyarrow as pa
+
+    fields = []
+    for col in OUTPUT_COLUMN_ORDER:
+        if col in METRIC_DTYPES:
+            field_type = pa.from_numpy_dtype(METRIC_DTYPES[col])
+        elif col in CATEGORICAL_COLUMNS:
+            field_type = pa.dictionary(pa.int32(), pa.string())
+        else:
+            field_type = pa.string()
+        fields.append(pa.field(col, field_type))
+    return pa.schema(fields)
+
+
+def property_dir(root: str, property_id: str) -> str:
+    """Directory of one property's partitions."""
+    return os.path.join(root, f"property={property_id.split('/')[-1]}")
+
+
+def day_path(property_root: str, day: str) -> str:
+    """Path of a day's file (day as YYYY-MM-DD) inside a property directory."""
+    return os.path.join(property_root, f"month={day[:7]}", f"day-{day}.parquet")
+
+
+def _replace_table(path: str, table, compression: str = PARQUET_COMPRESSION) -> None:
+    """Atomically writes a table to path (via a hidden temporary file)."""
+    import pyarrow.parquet as pq
+
+    directory, filename = os.path.split(path)
+    temp_path = os.path.join(directory, f".{filename}.tmp")
+    pq.write_table(table, temp_path, compression=compression, use_dictionary=True)
+    os.replace(temp_path, path)
+
+
+def remove_days_from_compacted(month_dir: str, days: Iterable[str]) -> int:
+    """
+    Drops the rows of the given days from a month's compacted file, so they
+    can be replaced by fresh day files.
+
+    Returns:
+        Number of rows removed
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+
+    path = os.path.join(month_dir, COMPACTED_FILE)
+    if not os.path.exists(path):
+        return 0
+    table = pq.read_table(path)
+    dates = pc.cast(table['Date'], pa.string())
+    keep = pc.invert(pc.is_in(dates, value_set=pa.array(sorted(set(days)), pa.string())))
+    kept = table.filter(keep)
+    removed = table.num_rows - kept.num_rows
+    if not removed:
+        return 0
+    if kept.num_rows:
+        _replace_table(path, kept)
+    else:
+        os.remove(path)
+    return removed
+
+
+def remove_days(property_root: str, days: Iterable[str]) -> None:
+    """
+    Deletes the rows of the given days (YYYY-MM-DD) from a property's
+    partitions: their day files and their rows in each month's compacted file.
+    """
+    days_by_month: Dict[str, List[str]] = {}
+    for day in days:
+        days_by_month.setdefault(os.path.dirname(day_path(property_root, day)), []).append(day)
+    for month_dir, month_days in days_by_month.items():
+        for day in month_days:
+            try:
+                os.remove(day_path(property_root, day))
+            except FileNotFoundError:
+                pass
+        remove_days_from_compacted(month_dir, month_days)
+
+
+def compact_month(month_dir: str) -> int:
+    """
+    Merges a month's day files (and any earlier compacted file) into one
+    compacted file sorted by date.
+
+    Returns:
+        Number of day files merged
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+
+    day_files = sorted(f for f in os.listdir(month_dir) if _DAY_FILE.match(f))
+    if not day_files:
+        return 0
+    compacted_path = os.path.join(month_dir, COMPACTED_FILE)
+    sources = ([compacted_path] if os.path.exists(compacted_path) else []) + [
+        os.path.join(month_dir, f) for f in day_files
+    ]
+    # Files written before the schema was fixed may differ (e.g. int64 revenue): cast them all to it
+    schema = output_schema()
+    table = pa.concat_tables([pq.read_table(path).cast(schema) for path in sources]).unify_dictionaries()
+    # Dictionary columns cannot be sorted directly; order by the decoded dates
+    table = table.take(pc.sort_indices(pc.cast(table['Date'], pa.string())))
+    _replace_table(compacted_path, table)
+    for filename in day_files:
+        os.remove(os.path.join(month_dir, filename))
+    return len(day_files)
+
+
+def _month_end(month_dir: str) -> Optional[date]:
+    match = _MONTH_DIR.match(os.path.basename(month_dir))
+    if not match:
+        return None
+    year, month = int(match.group(1)), int(match.group(2))
+    first_of_next = date(year + month // 12, month % 12 + 1, 1)
+    return first_of_next - timedelta(days=1)
+
+
+def compact_dataset(root: str = DATASET_DIR, include_recent: bool = False) -> List[str]:
+    """
+    Compacts every settled month of every property in the dataset.
+
+    Args:
+        root: Dataset directory
+        include_recent: Also compact months with days GA4 may still revise
+
+    Returns:
+        Month directories that were compacted
+    """
+    settled_before = date.today() - timedelta(days=MANIFEST_FRESHNESS_DAYS)
+    compacted = []
+    for month_dir in sorted(glob.glob(os.path.join(root, 'property=*', 'month=*'))):
+        month_end = _month_end(month_dir)
+        if month_end is None or (not include_recent and month_end > settled_before):
+            continue
+        merged = compact_month(month_dir)
+        if merged:
+            print(f"   [COMPACT] {os.path.relpath(month_dir, root)}: merged {merged} day file(s)")
+            compacted.append(month_dir)
+    return compacted
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Maintain the unified GA4 Parquet dataset")
+    subcommands = parser.add_subparsers(dest='command', required=True)
+    compact = subcommands.add_parser('compact', help="Merge daily partitions into monthly files")
+    compact.add_argument('--all', action='store_true', help="Also compact months that may still change")
+    compact.add_argument('--root', default=DATASET_DIR, help=f"Dataset directory (default: {DATASET_DIR})")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.root):
+        print(f"[ERROR] Dataset directory not found: {args.root}")
+        return 1
+    compacted = compact_dataset(args.root, include_recent=args.all)
+    print(f"Compacted {len(compacted)} month partition(s) in {args.root}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
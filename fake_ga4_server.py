@@ -0,0 +1,615 @@
+"""
+Local stand-in for the GA4 Data API.
+
+Serves RunReport and BatchRunReports over gRPC on localhost with synthetic
+data, so the real client, extraction and output code can be run and
+benchmarked without credentials, network access or quota:
+
+    python fake_ga4_server.py --port 50051 --rows-per-day 20000 --latency 0.2
+    GA4_EMULATOR_HOST=localhost:50051 python ga4_report_pull.py
+
+Data: every (property, day) has about FakeSettings.rows_per_day distinct
+event-grain rows over all known dimensions, drawn with skewed (few frequent,
+many rare) values from each dimension's configured cardinality. A report
+aggregates them to the requested dimensions and sums the requested metrics,
+so session-grain queries, date-only probes and split queries return
+consistent, smaller results. The same seed always produces the same data.
+
+Behaviour: limit/offset pagination (limit defaults to 10,000 and is capped
+at 250,000, as in GA4), EXACT and IN_LIST dimension filters and their
+negation, rows with all-zero metrics left out unless keep_empty_rows, response
+latency, per-property hourly/daily token and concurrent-request quotas
+(ResourceExhausted once spent, PropertyQuota on request) and randomly
+injected Unavailable errors.
+
+benchmark_e2e.py starts the server in-process with FakeGA4Server.
+"""
+
+import argparse
+import random
+import sys
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+import grpc
+import numpy as np
+from google.analytics.data_v1beta.types import (
+    BatchRunReportsRequest,
+    BatchRunReportsResponse,
+    DimensionHeader,
+    DimensionValue,
+    Filter,
+    MetricHeader,
+    MetricType,
+    MetricValue,
+    PropertyQuota,
+    QuotaStatus,
+    Row,
+    RunReportRequest,
+    RunReportResponse,
+)
+
+from request_planner import resolve_date
+
+SERVICE_NAME = 'google.analytics.data.v1beta.BetaAnalyticsData'
+
+# GA4 defaults and limits
+DEFAULT_LIMIT = 10000
+MAX_LIMIT = 250000
+
+DEFAULT_CARDINALITIES = {
+    'eventName': 40,
+    'fullPageUrl': 5000,
+    'country': 120,
+    'deviceCategory': 3,
+    'sessionDefaultChannelGroup': 12,
+    'sessionMedium': 25,
+    'sessionSource': 300,
+    'sessionCampaignName': 80,
+}
+
+# Realistic leading values per dimension; further values are numbered
+KNOWN_VALUES = {
+    'eventName': ['page_view', 'session_start', 'user_engagement', 'first_visit', 'scroll', 'click',
+                  'form_start', 'form_submit', 'purchase'],
+    'deviceCategory': ['desktop', 'mobile', 'tablet'],
+    'sessionDefaultChannelGroup': ['Organic Search', 'Direct', 'Paid Search', 'Referral', 'Organic Social',
+                                   'Email', 'Display', 'Paid Social', 'Unassigned', 'Affiliates'],
+    'sessionMedium': ['organic', '(none)', 'cpc', 'referral', 'email', 'social'],
+    'sessionSource': ['google', '(direct)', 'bing', 'facebook.com', 'duckduckgo'],
+    'sessionCampaignName': ['(organic)', '(direct)', '(referral)', '(not set)'],
+}
+
+# Higher values make frequent dimension values more frequent
+VALUE_SKEW = 2.0
+
+_ROWS_FIELD = RunReportResponse.pb().DESCRIPTOR.fields_by_name['rows'].number
+_DIMENSION_VALUES_FIELD = Row.pb().DESCRIPTOR.fields_by_name['dimension_values'].number
+_METRIC_VALUES_FIELD = Row.pb().DESCRIPTOR.fields_by_name['metric_values'].number
+_DIMENSION_VALUE_FIELD = DimensionValue.pb().DESCRIPTOR.fields_by_name['value'].number
+_METRIC_VALUE_FIELD = MetricValue.pb().DESCRIPTOR.fields_by_name['value'].number
+_REPORTS_FIELD = BatchRunReportsResponse.pb().DESCRIPTOR.fields_by_name['reports'].number
+
+
+@dataclass
+class FakeSettings:
+    """Data shape and behaviour of the fake API."""
+    rows_per_day: int = 10000
+    # Rows per day of individual properties (e.g. {'properties/1': 50000}), overriding rows_per_day
+    property_rows: Dict[str, int] = field(default_factory=dict)
+    # Fraction of (property, day) pairs without any data
+    empty_day_rate: float = 0.0
+    cardinalities: Dict[str, int] = field(default_factory=lambda: dict(DEFAULT_CARDINALITIES))
+    # Response latency: fixed seconds plus seconds per 1,000 returned rows, randomized by +/- jitter
+    latency: float = 0.0
+    latency_per_1k_rows: float = 0.0
+    jitter: float = 0.0
+    # Property quotas (per property, as in GA4)
+    tokens_per_request: int = 10
+    tokens_per_hour: int = 40000
+    tokens_per_day: int = 200000
+    concurrent_requests: int = 10
+    # Fraction of calls failing with Unavailable
+    error_rate: float = 0.0
+    seed: int = 0
+    # Encoded pages kept for repeated requests (e.g. repeated benchmark runs)
+    page_cache_mb: float = 512
+
+
+class RequestError(Exception):
+    """A request the fake API rejects, with the gRPC status GA4 would return."""
+
+    def __init__(self, code: grpc.StatusCode, message: str):
+        super().__init__(message)
+        self.code = code
+
+
+def _varint(value: int) -> bytes:
+    out = bytearray()
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def _field(number: int, payload: bytes) -> bytes:
+    """Encodes a length-delimited protobuf field."""
+    return _varint((number << 3) | 2) + _varint(len(payload)) + payload
+
+
+def _dimension_entry(value: str) -> bytes:
+    return _field(_DIMENSION_VALUES_FIELD, _field(_DIMENSION_VALUE_FIELD, value.encode()))
+
+
+@lru_cache(maxsize=65536)
+def _metric_entry(value: str) -> bytes:
+    return _field(_METRIC_VALUES_FIELD, _field(_METRIC_VALUE_FIELD, value.encode()))
+
+
+def _is_currency(metric: str) -> bool:
+    return 'revenue' in metric.lower()
+
+
+def _dimension_values(dimension: str, cardinality: int) -> List[str]:
+    known = KNOWN_VALUES.get(dimension, [])[:cardinality]
+    if dimension == 'fullPageUrl':
+        known = ['https://www.example.com/'] + [f"https://www.example.com/page/{k}" for k in range(1, cardinality)]
+    return known + [f"{dimension}_{k}" for k in range(len(known), cardinality)]
+
+
+def _property_number(property_id: str) -> int:
+    number = property_id.split('/')[-1]
+    return int(number) if number.isdigit() else zlib.crc32(number.encode())
+
+
+class _Report:
+    """A request's aggregated rows, before pagination."""
+
+    def __init__(self, dimensions: List[str], metrics: List[str], codes: np.ndarray, values: List[np.ndarray]):
+        self.dimensions = dimensions
+        self.metrics = metrics
+        self.codes = codes
+        self.values = values
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+
+class FakeDataset:
+    """Synthetic report data: per-day event-grain rows, aggregated per request."""
+
+    def __init__(self, settings: FakeSettings):
+        self.settings = settings
+        self.dimensions = ['date'] + list(settings.cardinalities)
+        self._values = {
+            dimension: _dimension_values(dimension, cardinality)
+            for dimension, cardinality in settings.cardinalities.items()
+        }
+        self._codes = {dimension: {value: code for code, value in enumerate(values)}
+                       for dimension, values in self._values.items()}
+        self._entries = {dimension: [_dimension_entry(value) for value in values]
+                         for dimension, values in self._values.items()}
+        self._date_entries: Dict[int, bytes] = {}
+        self._lock = threading.Lock()
+        self._reports: 'OrderedDict[Tuple, _Report]' = OrderedDict()
+        self._pages: 'OrderedDict[Tuple, bytes]' = OrderedDict()
+        self._page_bytes = 0
+
+    def _rng(self, property_id: str, day: date, *salt: int) -> np.random.Generator:
+        return np.random.default_rng([self.settings.seed, _property_number(property_id), day.toordinal(), *salt])
+
+    def _day_codes(self, property_id: str, day: date) -> np.ndarray:
+        """Distinct event-grain rows of one day: one column of value codes per dimension."""
+        rows = self.settings.property_rows.get(property_id, self.settings.rows_per_day)
+        rng = self._rng(property_id, day)
+        if rows <= 0 or rng.random() < self.settings.empty_day_rate:
+            return np.empty((0, len(self.dimensions)), dtype=np.int64)
+        columns = [np.full(rows, day.toordinal(), dtype=np.int64)]
+        for cardinality in self.settings.cardinalities.values():
+            columns.append((cardinality * rng.random(rows) ** VALUE_SKEW).astype(np.int64))
+        return np.unique(np.column_stack(columns), axis=0)
+
+    def _day_values(self, property_id: str, day: date, metric: str, rows: int) -> np.ndarray:
+        rng = self._rng(property_id, day, zlib.crc32(metric.encode()))
+        if _is_currency(metric):
+            return np.round(rng.gamma(2.0, 25.0, rows) * (rng.random(rows) < 0.05), 2)
+        return rng.integers(1 if metric == 'eventCount' else 0, 10, rows).astype(np.float64)
+
+    def _row_filter(self, request: Any, codes: np.ndarray) -> Optional[np.ndarray]:
+        """Returns the mask of rows matching the request's dimension filter (None: no filter)."""
+        expression = request.dimension_filter
+        if not expression.ListFields():
+            return None
+        return self._expression_mask(expression, codes)
+
+    def _expression_mask(self, expression: Any, codes: np.ndarray) -> np.ndarray:
+        kind = expression.WhichOneof('expr')
+        if kind == 'not_expression':
+            return ~self._expression_mask(expression.not_expression, codes)
+        if kind != 'filter':
+            raise RequestError(grpc.StatusCode.INVALID_ARGUMENT,
+                               "Only single dimension filters and their negation are supported")
+        condition = expression.filter
+        if condition.field_name not in self._codes:
+            raise RequestError(grpc.StatusCode.INVALID_ARGUMENT, f"Cannot filter on {condition.field_name}")
+        kind = condition.WhichOneof('one_filter')
+        exact = (Filter.StringFilter.MatchType.MATCH_TYPE_UNSPECIFIED, Filter.StringFilter.MatchType.EXACT)
+        if kind == 'string_filter' and condition.string_filter.match_type in exact:
+            values = [condition.string_filter.value]
+        elif kind == 'in_list_filter':
+            values = list(condition.in_list_filter.values)
+        else:
+            raise RequestError(grpc.StatusCode.INVALID_ARGUMENT, "Only EXACT and IN_LIST filters are supported")
+        codes_by_value = self._codes[condition.field_name]
+        wanted = [codes_by_value[value] for value in values if value in codes_by_value]
+        return np.isin(codes[:, self.dimensions.index(condition.field_name)], wanted)
+
+    def report(self, request: Any) -> _Report:
+        """Aggregates the request's rows (cached, so every page of a report is computed once)."""
+        key = self._report_key(request)
+        with self._lock:
+            if key in self._reports:
+                self._reports.move_to_end(key)
+                return self._reports[key]
+
+        dimensions = [dimension.name for dimension in request.dimensions]
+        metrics = [metric.name for metric in request.metrics]
+        unknown = [dimension for dimension in dimensions if dimension not in self.dimensions]
+        if unknown:
+            raise RequestError(grpc.StatusCode.INVALID_ARGUMENT, f"Unknown dimension(s): {', '.join(unknown)}")
+        if len(request.date_ranges) != 1:
+            raise RequestError(grpc.StatusCode.INVALID_ARGUMENT, "Exactly one date range is supported")
+        try:
+            start = resolve_date(request.date_ranges[0].start_date)
+            end = resolve_date(request.date_ranges[0].end_date)
+        except ValueError as e:
+            raise RequestError(grpc.StatusCode.INVALID_ARGUMENT, str(e))
+        if end < start:
+            raise RequestError(grpc.StatusCode.INVALID_ARGUMENT, "Date range ends before it starts")
+
+        days = [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+        day_codes = [self._day_codes(request.property, day) for day in days]
+        codes = np.concatenate(day_codes)
+        values = [
+            np.concatenate([self._day_values(request.property, day, metric, len(rows))
+                            for day, rows in zip(days, day_codes)])
+            for metric in metrics
+        ]
+        mask = self._row_filter(request, codes)
+        if mask is not None:
+            codes = codes[mask]
+            values = [column[mask] for column in values]
+
+        selected = codes[:, [self.dimensions.index(dimension) for dimension in dimensions]]
+        if len(dimensions) < len(self.dimensions):
+            selected, groups = np.unique(selected, axis=0, return_inverse=True)
+            groups = groups.reshape(-1)
+            values = [np.bincount(groups, weights=column, minlength=len(selected)) for column in values]
+        values = [np.round(column, 2) if _is_currency(metric) else column.astype(np.int64)
+                  for metric, column in zip(metrics, values)]
+        if not request.keep_empty_rows and values:
+            # Like GA4, rows whose metrics are all zero are left out unless requested
+            kept = np.logical_or.reduce([column != 0 for column in values])
+            selected = selected[kept]
+            values = [column[kept] for column in values]
+        report = _Report(dimensions, metrics, selected, values)
+
+        with self._lock:
+            self._reports[key] = report
+            while len(self._reports) > 64:
+                self._reports.popitem(last=False)
+        return report
+
+    @staticmethod
+    def _report_key(request: Any) -> Tuple:
+        return (
+            request.property,
+            tuple(dimension.name for dimension in request.dimensions),
+            tuple(metric.name for metric in request.metrics),
+            tuple((date_range.start_date, date_range.end_date) for date_range in request.date_ranges),
+            request.dimension_filter.SerializeToString(deterministic=True),
+            request.keep_empty_rows,
+        )
+
+    def _entry(self, dimension: str, code: int) -> bytes:
+        if dimension != 'date':
+            return self._entries[dimension][code]
+        entry = self._date_entries.get(code)
+        if entry is None:
+            entry = self._date_entries[code] = _dimension_entry(date.fromordinal(code).strftime('%Y%m%d'))
+        return entry
+
+    def rows_bytes(self, request: Any, report: _Report, offset: int, limit: int) -> bytes:
+        """Encodes one page of a report's rows as repeated RunReportResponse.rows fields."""
+        key = (self._report_key(request), offset, limit)
+        with self._lock:
+            if key in self._pages:
+                self._pages.move_to_end(key)
+                return self._pages[key]
+
+        codes = report.codes[offset:offset + limit].tolist()
+        values = [
+            [f"{value:.2f}".rstrip('0').rstrip('.') for value in column[offset:offset + limit].tolist()]
+            if _is_currency(metric) else [str(value) for value in column[offset:offset + limit].tolist()]
+            for metric, column in zip(report.metrics, report.values)
+        ]
+        if report.dimensions and all(dimension != 'date' for dimension in report.dimensions):
+            tables = [self._entries[dimension] for dimension in report.dimensions]
+            dimension_bytes = [b''.join([table[code] for table, code in zip(tables, row)]) for row in codes]
+        else:
+            dimension_bytes = [
+                b''.join([self._entry(dimension, code) for dimension, code in zip(report.dimensions, row)])
+                for row in codes
+            ]
+        rows = []
+        for index, dimension_part in enumerate(dimension_bytes):
+            body = dimension_part + b''.join([_metric_entry(column[index]) for column in values])
+            rows.append(_field(_ROWS_FIELD, body))
+        encoded = b''.join(rows)
+
+        with self._lock:
+            self._pages[key] = encoded
+            self._page_bytes += len(encoded)
+            while self._page_bytes > self.settings.page_cache_mb * 1024 * 1024 and self._pages:
+                _, evicted = self._pages.popitem(last=False)
+                self._page_bytes -= len(evicted)
+        return encoded
+
+    def metric_headers(self, report: _Report) -> List[MetricHeader]:
+        return [
+            MetricHeader(name=metric,
+                         type_=MetricType.TYPE_CURRENCY if _is_currency(metric) else MetricType.TYPE_INTEGER)
+            for metric in report.metrics
+        ]
+
+
+class _QuotaState:
+    def __init__(self):
+        self.hour = -1
+        self.day = -1
+        self.hour_tokens = 0
+        self.day_tokens = 0
+        self.in_flight = 0
+
+
+class FakeGA4Service:
+    """Request handling of the fake API: quotas, errors, latency and response encoding."""
+
+    def __init__(self, settings: Optional[FakeSettings] = None):
+        self.settings = settings or FakeSettings()
+        self.dataset = FakeDataset(self.settings)
+        self._lock = threading.Lock()
+        self._quota: Dict[str, _QuotaState] = {}
+        self._random = random.Random(self.settings.seed)
+        self.stats = {'calls': 0, 'reports': 0, 'rows': 0, 'bytes': 0, 'errors': 0, 'exhausted': 0}
+
+    def _count(self, **increments: int) -> None:
+        with self._lock:
+            for key, value in increments.items():
+                self.stats[key] += value
+
+    def _acquire(self, property_id: str, reports: int) -> _QuotaState:
+        """Takes a concurrent-request slot and the tokens of `reports` reports, or raises ResourceExhausted."""
+        settings = self.settings
+        now = time.time()
+        with self._lock:
+            state = self._quota.setdefault(property_id, _QuotaState())
+            hour, day = int(now // 3600), int(now // 86400)
+            if hour != state.hour:
+                state.hour, state.hour_tokens = hour, 0
+            if day != state.day:
+                state.day, state.day_tokens = day, 0
+            cost = settings.tokens_per_request * reports
+            if state.in_flight >= settings.concurrent_requests:
+                message = "Exhausted concurrent requests quota"
+            elif state.hour_tokens + cost > settings.tokens_per_hour:
+                message = "Exhausted property tokens per hour quota"
+            elif state.day_tokens + cost > settings.tokens_per_day:
+                message = "Exhausted property tokens per day quota"
+            else:
+                state.in_flight += 1
+                state.hour_tokens += cost
+                state.day_tokens += cost
+                return state
+            self.stats['exhausted'] += 1
+        raise RequestError(grpc.StatusCode.RESOURCE_EXHAUSTED, message)
+
+    def _release(self, state: _QuotaState) -> None:
+        with self._lock:
+            state.in_flight -= 1
+
+    def _property_quota(self, state: _QuotaState) -> PropertyQuota:
+        settings = self.settings
+        with self._lock:
+            return PropertyQuota(
+                tokens_per_hour=QuotaStatus(consumed=settings.tokens_per_request,
+                                            remaining=max(0, settings.tokens_per_hour - state.hour_tokens)),
+                tokens_per_day=QuotaStatus(consumed=settings.tokens_per_request,
+                                           remaining=max(0, settings.tokens_per_day - state.day_tokens)),
+                concurrent_requests=QuotaStatus(consumed=0,
+                                                remaining=settings.concurrent_requests - state.in_flight),
+            )
+
+    def _maybe_fail(self) -> None:
+        with self._lock:
+            failed = self._random.random() < self.settings.error_rate
+        if failed:
+            raise RequestError(grpc.StatusCode.UNAVAILABLE, "The service is currently unavailable (injected)")
+
+    def _sleep(self, rows: int) -> None:
+        settings = self.settings
+        delay = settings.latency + settings.latency_per_1k_rows * rows / 1000
+        if delay > 0:
+            with self._lock:
+                factor = 1 + settings.jitter * (2 * self._random.random() - 1)
+            time.sleep(delay * factor)
+
+    def _report_bytes(self, request: Any, state: _QuotaState) -> Tuple[bytes, int]:
+        """Encodes the RunReportResponse of one request; returns it with its number of rows."""
+        report = self.dataset.report(request)
+        limit = min(request.limit or DEFAULT_LIMIT, MAX_LIMIT)
+        offset = request.offset
+        rows = max(0, min(limit, len(report) - offset))
+        header = RunReportResponse(
+            dimension_headers=[DimensionHeader(name=dimension) for dimension in report.dimensions],
+            metric_headers=self.dataset.metric_headers(report),
+            row_count=len(report),
+            property_quota=self._property_quota(state) if request.return_property_quota else None,
+        )
+        # Concatenated serialized messages parse as one message with the rows appended
+        payload = RunReportResponse.serialize(header)
+        if rows:
+            payload += self.dataset.rows_bytes(request, report, offset, limit)
+        return payload, rows
+
+    def _handle(self, property_id: str, requests: List[Any]) -> Tuple[List[bytes], int]:
+        self._maybe_fail()
+        state = self._acquire(property_id, len(requests))
+        try:
+            reports = [self._report_bytes(request, state) for request in requests]
+            rows = sum(count for _, count in reports)
+            self._sleep(rows)
+        finally:
+            self._release(state)
+        payloads = [payload for payload, _ in reports]
+        self._count(calls=1, reports=len(payloads), rows=rows, bytes=sum(len(payload) for payload in payloads))
+        return payloads, rows
+
+    def run_report(self, request: Any, context: grpc.ServicerContext) -> bytes:
+        try:
+            payloads, _ = self._handle(request.property, [request])
+        except RequestError as e:
+            self._count(errors=1)
+            context.abort(e.code, str(e))
+        return payloads[0]
+
+    def batch_run_reports(self, request: Any, context: grpc.ServicerContext) -> bytes:
+        try:
+            for report_request in request.requests:
+                if report_request.property and report_request.property != request.property:
+                    raise RequestError(grpc.StatusCode.INVALID_ARGUMENT, "Batched requests must share the property")
+                report_request.property = request.property
+            payloads, _ = self._handle(request.property, list(request.requests))
+        except RequestError as e:
+            self._count(errors=1)
+            context.abort(e.code, str(e))
+        return b''.join(_field(_REPORTS_FIELD, payload) for payload in payloads)
+
+
+class FakeGA4Server:
+    """The fake API served on a local port (use as a context manager)."""
+
+    def __init__(self, settings: Optional[FakeSettings] = None, port: int = 0, workers: int = 64):
+        self.service = FakeGA4Service(settings)
+        self._server = grpc.server(
+            ThreadPoolExecutor(max_workers=workers),
+            options=[('grpc.max_send_message_length', -1), ('grpc.max_receive_message_length', -1)],
+        )
+        handlers = {
+            'RunReport': grpc.unary_unary_rpc_method_handler(
+                self.service.run_report, request_deserializer=RunReportRequest.pb().FromString,
+            ),
+            'BatchRunReports': grpc.unary_unary_rpc_method_handler(
+                self.service.batch_run_reports, request_deserializer=BatchRunReportsRequest.pb().FromString,
+            ),
+        }
+        self._server.add_generic_rpc_handlers((grpc.method_handlers_generic_handler(SERVICE_NAME, handlers),))
+        self.port = self._server.add_insecure_port(f"localhost:{port}")
+        self.address = f"localhost:{self.port}"
+
+    def start(self) -> 'FakeGA4Server':
+        self._server.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.stop(grace=None)
+
+    def __enter__(self) -> 'FakeGA4Server':
+        return self.start()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
+
+
+def parse_cardinalities(values: List[str]) -> Dict[str, int]:
+    """Parses DIMENSION=N options on top of DEFAULT_CARDINALITIES."""
+    cardinalities = dict(DEFAULT_CARDINALITIES)
+    for value in values:
+        dimension, _, count = value.partition('=')
+        if not count.isdigit() or int(count) < 1:
+            raise argparse.ArgumentTypeError(f"Expected DIMENSION=N, got {value!r}")
+        cardinalities[dimension] = int(count)
+    return cardinalities
+
+
+def add_settings_arguments(parser: argparse.ArgumentParser) -> None:
+    """Adds the FakeSettings options shared by this server and benchmark_e2e.py."""
+    defaults = FakeSettings()
+    parser.add_argument('--rows-per-day', type=int, default=defaults.rows_per_day,
+                        help=f"Event-grain rows per property and day (default: {defaults.rows_per_day})")
+    parser.add_argument('--cardinality', action='append', default=[], metavar='DIMENSION=N',
+                        help="Distinct values of a dimension (repeatable)")
+    parser.add_argument('--empty-day-rate', type=float, default=defaults.empty_day_rate,
+                        help="Fraction of days without data (default: 0)")
+    parser.add_argument('--latency', type=float, default=defaults.latency,
+                        help="Seconds per response (default: 0)")
+    parser.add_argument('--latency-per-1k-rows', type=float, default=defaults.latency_per_1k_rows,
+                        help="Additional seconds per 1,000 returned rows (default: 0)")
+    parser.add_argument('--jitter', type=float, default=defaults.jitter,
+                        help="Relative latency randomization, e.g. 0.3 for +/-30%% (default: 0)")
+    parser.add_argument('--tokens-per-hour', type=int, default=defaults.tokens_per_hour,
+                        help=f"Property tokens per hour (default: {defaults.tokens_per_hour})")
+    parser.add_argument('--concurrent-requests', type=int, default=defaults.concurrent_requests,
+                        help=f"Concurrent requests per property (default: {defaults.concurrent_requests})")
+    parser.add_argument('--error-rate', type=float, default=defaults.error_rate,
+                        help="Fraction of calls failing with Unavailable (default: 0)")
+    parser.add_argument('--seed', type=int, default=defaults.seed, help="Data seed (default: 0)")
+
+
+def settings_from_args(args: argparse.Namespace, **overrides: Any) -> FakeSettings:
+    """Builds FakeSettings from options added by add_settings_arguments."""
+    return FakeSettings(
+        rows_per_day=args.rows_per_day,
+        cardinalities=parse_cardinalities(args.cardinality),
+        empty_day_rate=args.empty_day_rate,
+        latency=args.latency,
+        latency_per_1k_rows=args.latency_per_1k_rows,
+        jitter=args.jitter,
+        tokens_per_hour=args.tokens_per_hour,
+        concurrent_requests=args.concurrent_requests,
+        error_rate=args.error_rate,
+        seed=args.seed,
+        **overrides,
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Local fake GA4 Data API server")
+    parser.add_argument('--port', type=int, default=50051, help="Port to listen on (default: 50051)")
+    add_settings_arguments(parser)
+    args = parser.parse_args(argv)
+
+    server = FakeGA4Server(settings_from_args(args), port=args.port).start()
+    print(f"Fake GA4 Data API listening on {server.address}")
+    print(f"Run the extractor against it with: GA4_EMULATOR_HOST={server.address}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+        print(f"Served {server.service.stats}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
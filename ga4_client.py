@@ -0,0 +1,183 @@
+"""
+Shared GA4 Data API client factory.
+
+Every script used to call ``BetaAnalyticsDataClient.from_service_account_json``
+on its own, repeating key parsing, the OAuth token exchange and gRPC channel
+setup per property. This module does that work once per process:
+
+- Service account credentials are loaded once and their access token is cached
+  on disk (TOKEN_CACHE_PATH) and reused by later runs until shortly before expiry.
+- Clients share a small round-robin pool of gRPC channels (CLIENT_CHANNEL_POOL_SIZE)
+  so concurrent workers are spread over several HTTP/2 connections.
+- Channels optionally use gzip transport compression (GRPC_COMPRESSION).
+- With EMULATOR_HOST set, channels connect to a local stand-in for the API
+  (see fake_ga4_server.py) in plain text and without credentials.
+
+The async engine gets the same pooling from get_async_client(); its clients are
+bound to the event loop that created them.
+"""
+
+import asyncio
+import itertools
+import json
+import os
+import threading
+import weakref
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+import grpc
+from google.analytics.data_v1beta import BetaAnalyticsDataAsyncClient, BetaAnalyticsDataClient
+from google.analytics.data_v1beta.services.beta_analytics_data.transports import (
+    BetaAnalyticsDataGrpcAsyncIOTransport,
+    BetaAnalyticsDataGrpcTransport,
+)
+from google.auth.transport.requests import Request
+from google.oauth2 import service_account
+
+from config import (
+    KEY_FILE_PATH,
+    CLIENT_CHANNEL_POOL_SIZE,
+    EMULATOR_HOST,
+    GRPC_COMPRESSION,
+    TOKEN_CACHE_PATH,
+)
+
+SCOPES = ['https://www.googleapis.com/auth/analytics.readonly']
+
+# Cached tokens are only reused if they stay valid for at least this long
+TOKEN_EXPIRY_MARGIN = timedelta(minutes=5)
+
+CHANNEL_OPTIONS = [
+    ('grpc.max_send_message_length', -1),
+    ('grpc.max_receive_message_length', -1),
+    ('grpc.keepalive_time_ms', 60000),
+]
+
+_lock = threading.Lock()
+_credentials: Optional[service_account.Credentials] = None
+_clients: List[BetaAnalyticsDataClient] = []
+_client_cycle = None
+_async_client_cycles: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, itertools.cycle]' = weakref.WeakKeyDictionary()
+
+
+def _load_cached_token(credentials: service_account.Credentials) -> bool:
+    """Applies a still-valid cached access token to the credentials; returns True on success."""
+    try:
+        with open(TOKEN_CACHE_PATH, 'r') as f:
+            cached = json.load(f)
+        if cached.get('client_email') != credentials.service_account_email or cached.get('scopes') != SCOPES:
+            return False
+        token = cached['token']
+        expiry = datetime.fromisoformat(cached['expiry'])
+        # google-auth keeps expiry as naive UTC
+        if expiry - TOKEN_EXPIRY_MARGIN <= datetime.now(timezone.utc).replace(tzinfo=None):
+            return False
+    except (OSError, AttributeError, KeyError, TypeError, ValueError):
+        # Missing, truncated or hand-edited cache: treat it as a miss
+        return False
+
+    credentials.token = token
+    credentials.expiry = expiry
+    return True
+
+
+def _save_token(credentials: service_account.Credentials) -> None:
+    """Writes the credentials' access token to the on-disk cache (owner-readable only)."""
+    payload = {
+        'client_email': credentials.service_account_email,
+        'scopes': SCOPES,
+        'token': credentials.token,
+        'expiry': credentials.expiry.isoformat(),
+    }
+    try:
+        fd = os.open(TOKEN_CACHE_PATH, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(payload, f)
+    except OSError:
+        # The cache is an optimization only; a read-only directory must not break extraction
+        pass
+
+
+def get_credentials() -> service_account.Credentials:
+    """
+    Returns the process-wide service account credentials, loading them from
+    KEY_FILE_PATH and the token cache on first use.
+
+    Raises:
+        FileNotFoundError: If the service account key file does not exist
+    """
+    global _credentials
+    with _lock:
+        if _credentials is None:
+            credentials = service_account.Credentials.from_service_account_file(KEY_FILE_PATH, scopes=SCOPES)
+            if not _load_cached_token(credentials):
+                credentials.refresh(Request())
+                _save_token(credentials)
+            _credentials = credentials
+        return _credentials
+
+
+def _compression() -> Optional[grpc.Compression]:
+    return grpc.Compression.Gzip if GRPC_COMPRESSION == 'gzip' else None
+
+
+def _client_credentials() -> Optional[service_account.Credentials]:
+    # The emulator takes unauthenticated requests, so no key file is needed
+    return None if EMULATOR_HOST else get_credentials()
+
+
+def _create_client(credentials: Optional[service_account.Credentials]) -> BetaAnalyticsDataClient:
+    if EMULATOR_HOST:
+        channel = grpc.insecure_channel(EMULATOR_HOST, options=CHANNEL_OPTIONS, compression=_compression())
+    else:
+        channel = BetaAnalyticsDataGrpcTransport.create_channel(
+            credentials=credentials,
+            compression=_compression(),
+            options=CHANNEL_OPTIONS,
+        )
+    return BetaAnalyticsDataClient(transport=BetaAnalyticsDataGrpcTransport(channel=channel))
+
+
+def get_client() -> BetaAnalyticsDataClient:
+    """
+    Returns a shared GA4 Data API client.
+
+    Clients are created lazily, one per pooled gRPC channel, and handed out
+    round-robin. They are thread-safe and may be used from any worker.
+    """
+    global _client_cycle
+    credentials = _client_credentials()
+    with _lock:
+        if not _clients:
+            _clients.extend(_create_client(credentials) for _ in range(max(1, CLIENT_CHANNEL_POOL_SIZE)))
+            _client_cycle = itertools.cycle(_clients)
+        return next(_client_cycle)
+
+
+def _create_async_client(credentials: Optional[service_account.Credentials]) -> BetaAnalyticsDataAsyncClient:
+    if EMULATOR_HOST:
+        channel = grpc.aio.insecure_channel(EMULATOR_HOST, options=CHANNEL_OPTIONS, compression=_compression())
+    else:
+        channel = BetaAnalyticsDataGrpcAsyncIOTransport.create_channel(
+            credentials=credentials,
+            compression=_compression(),
+            options=CHANNEL_OPTIONS,
+        )
+    return BetaAnalyticsDataAsyncClient(transport=BetaAnalyticsDataGrpcAsyncIOTransport(channel=channel))
+
+
+def get_async_client() -> BetaAnalyticsDataAsyncClient:
+    """
+    Returns a shared async GA4 Data API client for the running event loop.
+
+    Must be called from a coroutine. Shares credentials and the token cache
+    with get_client(); each event loop gets its own pool of channels.
+    """
+    loop = asyncio.get_running_loop()
+    credentials = _client_credentials()
+    with _lock:
+        if loop not in _async_client_cycles:
+            clients = [_create_async_client(credentials) for _ in range(max(1, CLIENT_CHANNEL_POOL_SIZE))]
+            _async_client_cycles[loop] = itertools.cycle(clients)
+        return next(_async_client_cycles[loop])
@@ -8,22 +8,56 @@ Author: GA4 Data Extraction Pipeline
 Version: 6.0
 """ 
 
+import numpy as np
 import pandas as pd
+import argparse
 import sys
 import os
 import time
-from datetime import datetime
-from typing import Optional, List, Dict, Any
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime
+from typing import Optional, List, Dict, Any, Set, Tuple, Callable, Iterable, Iterator
 from google.analytics.data_v1beta import BetaAnalyticsDataClient
+from google.api_core import exceptions
 from google.analytics.data_v1beta.types import (
-    DateRange,
+    BatchRunReportsRequest,
     Dimension,
     Metric,
+    MetricType,
     RunReportRequest,
 )
 
-from config import KEY_FILE_PATH, DATE_RANGES, COLUMN_MAPPING, OUTPUT_COLUMN_ORDER
+from config import (
+    KEY_FILE_PATH,
+    DATE_RANGES,
+    COLUMN_MAPPING,
+    OUTPUT_COLUMN_ORDER,
+    NUMERIC_COLUMNS,
+    CATEGORICAL_COLUMNS,
+    METRIC_DTYPES,
+    MAX_CONCURRENT_PROPERTIES,
+    MAX_CONCURRENT_REQUESTS_PER_PROPERTY,
+    EXTRACTION_ENGINE,
+    USE_BATCH_REQUESTS,
+    PAGE_SIZE,
+    PIPELINE_MAX_PENDING_REQUESTS,
+    REQUEST_TIMEOUT_SECONDS,
+    OUTPUT_FORMAT,
+)
+from checkpoint import Page, PageCheckpoint, page_checkpoint
+from ga4_client import get_client
+from manifest import DayStats, Manifest, days_to_ranges, expand_days, report_spec_hash
+from metrics import finish_run_metrics, get_metrics, stage_timer, start_run_metrics
+from output_writers import WRITERS, OutputWriter, get_writer
+from pipeline import bounded_map, decode_in_process, get_decode_pool, shutdown_decode_pool
+from profiling import finish_profiler, get_profiler, profile_stage, start_profiler
 from properties import GA4_PROPERTIES
+from rate_limiter import RateLimiter
+from response_cache import get_response_cache
+from retry import get_retry_policy
+from scheduler import schedule_properties
+from request_planner import ReportWindow, merge_date_ranges, plan_report_windows
+from scope_merge import SessionGrainIndex
 
 # --- API NAMES (GA4 API Dimension and Metric Names) ---
 DIMENSION_NAMES = [
@@ -48,8 +82,469 @@ METRIC_NAMES = [
     'totalRevenue',
 ]
 
+# Session-grain query: session/user metrics without the event-scoped dimensions,
+# which would repeat every session's counts on each of its event rows
+SESSION_DIMENSION_NAMES = [d for d in DIMENSION_NAMES if d not in ('eventName', 'fullPageUrl')]
+SESSION_METRIC_NAMES = ['sessions', 'engagedSessions', 'activeUsers', 'newUsers', 'totalUsers']
+
+# Event-grain query: event metrics with all dimensions
+EVENT_METRIC_NAMES = [m for m in METRIC_NAMES if m not in SESSION_METRIC_NAMES]
+
+# Output columns of the session-grain query's keys and metrics (see scope_merge.py)
+SESSION_KEY_COLUMNS = [COLUMN_MAPPING[d] for d in SESSION_DIMENSION_NAMES]
+SESSION_METRIC_COLUMNS = [COLUMN_MAPPING[m] for m in SESSION_METRIC_NAMES]
+
+# Checkpoint identifiers of the two queries
+SESSION_REPORT_SPEC = report_spec_hash(SESSION_DIMENSION_NAMES, SESSION_METRIC_NAMES)
+EVENT_REPORT_SPEC = report_spec_hash(DIMENSION_NAMES, EVENT_METRIC_NAMES)
+
+# Manifest identifier of the merged report; changing either query re-extracts all days
+REPORT_SPEC = report_spec_hash([SESSION_REPORT_SPEC, EVENT_REPORT_SPEC], METRIC_NAMES)
+
+# BatchRunReports accepts at most 5 RunReportRequests per call
+MAX_BATCH_REQUESTS = 5
+
+
+def _record_exhausted(limiter: RateLimiter, property_id: str) -> None:
+    """Tells the limiter a property hit ResourceExhausted and reports the pause."""
+    backoff = limiter.record_exhausted(property_id)
+    print(f"   [QUOTA] {property_id} exhausted, pausing its requests for {backoff:.0f}s")
+
+
+def _record_call(
+    property_id: str,
+    method: str,
+    started: float,
+    response: Any,
+    reports: List[Any],
+    requests: List[RunReportRequest],
+) -> None:
+    """Records a completed API call's latency, rows, response size, page offsets and quota tokens."""
+    metrics = get_metrics()
+    if metrics is None:
+        return
+    metrics.record_request(
+        property_id,
+        method,
+        time.perf_counter() - started,
+        rows=sum(len(report.rows) for report in reports),
+        response_bytes=_raw_response(response).ByteSize(),
+        offsets=[request.offset for request in requests],
+        tokens=sum(report.property_quota.tokens_per_hour.consumed for report in reports),
+    )
+
+
+def _record_cache_hits(property_id: str, requests: List[RunReportRequest]) -> None:
+    """Records report pages served from the response cache instead of the API."""
+    metrics = get_metrics()
+    if metrics is not None:
+        for request in requests:
+            metrics.record_cache_hit(property_id, request.offset)
+
+
+def _record_call_error(property_id: str, method: str, started: float, error: Exception) -> None:
+    """Records a failed API call attempt."""
+    metrics = get_metrics()
+    if metrics is not None:
+        metrics.record_error(property_id, method, time.perf_counter() - started, error)
+
+
+def _run_report(client: BetaAnalyticsDataClient, request: RunReportRequest, limiter: RateLimiter) -> Any:
+    """
+    Sends a single RunReportRequest through the property's rate limiter and
+    feeds the returned property quota back into it. Served from the response
+    cache without an API call when possible; transient errors are retried.
+    """
+    cache = get_response_cache()
+    cached = cache.get(request) if cache else None
+    if cached is not None:
+        _record_cache_hits(request.property, [request])
+        return cached
+
+    request.return_property_quota = True
+
+    def send() -> Any:
+        with limiter.request(request.property):
+            started = time.perf_counter()
+            try:
+                with profile_stage(request.property, 'fetch'):
+                    response = client.run_report(request, timeout=REQUEST_TIMEOUT_SECONDS)
+            except Exception as e:
+                _record_call_error(request.property, 'run_report', started, e)
+                if isinstance(e, exceptions.ResourceExhausted):
+                    _record_exhausted(limiter, request.property)
+                raise
+            _record_call(request.property, 'run_report', started, response, [response], [request])
+            return response
+
+    response = get_retry_policy().call(send, request.property)
+    limiter.record_quota(request.property, response.property_quota)
+    if cache:
+        cache.put(request, response)
+    return response
+
+
+def _batch_run_reports(
+    client: BetaAnalyticsDataClient,
+    property_id: str,
+    requests: List[RunReportRequest],
+    limiter: RateLimiter,
+) -> List[Any]:
+    """
+    Sends up to MAX_BATCH_REQUESTS reports for one property in a single
+    BatchRunReports round trip. Returns the reports in request order; reports
+    found in the response cache are left out of the API call. Transient errors
+    retry the whole batch.
+    """
+    cache = get_response_cache()
+    reports = [cache.get(request) if cache else None for request in requests]
+    missing = [index for index, report in enumerate(reports) if report is None]
+    _record_cache_hits(property_id, [request for request, report in zip(requests, reports) if report is not None])
+    if not missing:
+        return reports
+
+    for index in missing:
+        requests[index].return_property_quota = True
+    batch = BatchRunReportsRequest(property=property_id, requests=[requests[index] for index in missing])
+
+    def send() -> Any:
+        with limiter.request(property_id):
+            started = time.perf_counter()
+            try:
+                with profile_stage(property_id, 'fetch'):
+                    response = client.batch_run_reports(batch, timeout=REQUEST_TIMEOUT_SECONDS)
+            except Exception as e:
+                _record_call_error(property_id, 'batch_run_reports', started, e)
+                if isinstance(e, exceptions.ResourceExhausted):
+                    _record_exhausted(limiter, property_id)
+                raise
+            _record_call(property_id, 'batch_run_reports', started, response, response.reports, batch.requests)
+            return response
+
+    response = get_retry_policy().call(send, property_id)
+    for index, report in zip(missing, response.reports):
+        limiter.record_quota(property_id, report.property_quota)
+        if cache:
+            cache.put(requests[index], report)
+        reports[index] = report
+    return reports
+
+
+def _window_request(
+    property_id: str,
+    window: ReportWindow,
+    dimensions: List[Dimension],
+    metrics: List[Metric],
+    limit: int,
+    offset: int,
+) -> RunReportRequest:
+    """Builds the RunReportRequest for one page of a request window."""
+    return RunReportRequest(
+        property=property_id,
+        date_ranges=[window.date_range()],
+        dimensions=dimensions,
+        metrics=metrics,
+        dimension_filter=window.dimension_filter(),
+        limit=limit,
+        offset=offset
+    )
+
+
+def _page_offsets(row_count: int, limit: int) -> List[int]:
+    """Offsets of every page after the first, derived from the report's row_count."""
+    return list(range(limit, row_count, limit))
+
+
+def _fetch_pages(
+    client: BetaAnalyticsDataClient,
+    property_id: str,
+    window: ReportWindow,
+    dimensions: List[Dimension],
+    metrics: List[Metric],
+    limit: int,
+    limiter: RateLimiter,
+    decode: Callable[[Any], pd.DataFrame],
+    name: str,
+    checkpoint: Optional[PageCheckpoint] = None,
+) -> Iterator[pd.DataFrame]:
+    """
+    Fetches and decodes every page of one request window.
+
+    The first page reports the total row_count, so all remaining offsets are
+    known up front and fetched concurrently (bounded by the property's limiter),
+    at most PIPELINE_MAX_PENDING_REQUESTS ahead of the consumer. Each page is
+    decoded as soon as it is fetched and the protobuf is dropped right away.
+    Pages found in the checkpoint are not requested again, and newly completed
+    pages are added to it.
+
+    Yields:
+        Decoded page chunks in offset order (nothing if the window has no rows)
+    """
+    limit = window.page_limit(limit)
+
+    def fetch_page(offset: int) -> Page:
+        saved = checkpoint.load(window, offset) if checkpoint else None
+        if saved is not None:
+            return saved
+        request = _window_request(property_id, window, dimensions, metrics, limit, offset)
+        response = _run_report(client, request, limiter)
+        page = (response.row_count, decode(response) if response.rows else None)
+        if checkpoint:
+            checkpoint.save(window, offset, page)
+        return page
+
+    row_count, first = fetch_page(0)
+    if first is None:
+        return
+
+    offsets = _page_offsets(row_count, limit)
+    print(f"   [{name}] > {window.label}: {row_count:,} rows in {len(offsets) + 1} page(s)")
+    yield first
+    del first
+    if not offsets:
+        return
+
+    with ThreadPoolExecutor(max_workers=min(len(offsets), MAX_CONCURRENT_REQUESTS_PER_PROPERTY)) as pool:
+        for _, chunk in bounded_map(pool, fetch_page, offsets, PIPELINE_MAX_PENDING_REQUESTS):
+            if chunk is not None and not chunk.empty:
+                yield chunk
+
+
+def _checkpointed_keys(
+    checkpoint: Optional[PageCheckpoint],
+    keys: List[Tuple[ReportWindow, int]],
+    name: str,
+) -> Set[Tuple[ReportWindow, int]]:
+    """Returns the keys among `keys` whose pages were completed by an earlier run (without loading them)."""
+    if not checkpoint:
+        return set()
+    saved = {key for key in keys if checkpoint.has(*key)}
+    if saved:
+        print(f"   [{name}] Resuming {len(saved)} checkpointed page(s)")
+    return saved
+
+
+def _fetch_windows_batched(
+    client: BetaAnalyticsDataClient,
+    property_id: str,
+    windows: List[ReportWindow],
+    dimensions: List[Dimension],
+    metrics: List[Metric],
+    limit: int,
+    limiter: RateLimiter,
+    decode: Callable[[Any], pd.DataFrame],
+    name: str,
+    checkpoint: Optional[PageCheckpoint] = None,
+) -> Iterator[pd.DataFrame]:
+    """
+    Fetches and decodes report pages for many request windows through BatchRunReports.
+
+    First pages of the windows go out MAX_BATCH_REQUESTS per call; each
+    window's row_count then gives its remaining pages, which are batched the
+    same way. Windows are streamed in order: a window's pages are all yielded
+    before the next window's are. First pages of upcoming windows are fetched
+    one batch ahead of the consumer, since windows are planned at about a page
+    each, and the current window's remaining pages about
+    PIPELINE_MAX_PENDING_REQUESTS ahead, so memory does not grow with the
+    number of windows. Every report is decoded as soon as its batch returns.
+
+    Args:
+        client: GA4 Data API client
+        property_id: GA4 property ID (e.g., 'properties/123456789')
+        windows: Request windows, in output order
+        dimensions: Report dimensions
+        metrics: Report metrics
+        limit: Rows per page, unless a window has its own page size
+        limiter: Shared per-property rate limiter
+        decode: Converts one response page into a DataFrame chunk
+        name: Property name for progress output
+        checkpoint: Completed pages to resume from; new pages are added to it
 
-def get_ga4_report(property_id: str, property_details: Dict[str, str]) -> Optional[pd.DataFrame]:
+    Yields:
+        Decoded page chunks ordered by window, then by offset
+    """
+    PageKey = Tuple[ReportWindow, int]
+    # Batches of MAX_BATCH_REQUESTS pages held ahead of the consumer for a window's remaining pages
+    max_pending_batches = max(1, PIPELINE_MAX_PENDING_REQUESTS // MAX_BATCH_REQUESTS)
+
+    def run_chunk(chunk: List[PageKey]) -> List[Tuple[PageKey, Page]]:
+        requests = [
+            _window_request(property_id, window, dimensions, metrics, window.page_limit(limit), offset)
+            for window, offset in chunk
+        ]
+        reports = _batch_run_reports(client, property_id, requests, limiter)
+        pages = []
+        for key, report in zip(chunk, reports):
+            page = (report.row_count, decode(report) if report.rows else None)
+            if checkpoint:
+                checkpoint.save(*key, page)
+            pages.append((key, page))
+        return pages
+
+    def fetch_all(items: List[PageKey], max_pending: int) -> Iterator[Tuple[PageKey, Page]]:
+        """Yields the pages of `items` in order; checkpointed pages are read back as they come up."""
+        saved = _checkpointed_keys(checkpoint, items, name)
+        missing = [key for key in items if key not in saved]
+        chunks = [missing[i:i + MAX_BATCH_REQUESTS] for i in range(0, len(missing), MAX_BATCH_REQUESTS)]
+        with ThreadPoolExecutor(max_workers=max(1, min(len(chunks), MAX_CONCURRENT_REQUESTS_PER_PROPERTY))) as pool:
+            fetched = (
+                pair
+                for pairs in bounded_map(pool, run_chunk, chunks, max_pending)
+                for pair in pairs
+            )
+            for key in items:
+                if key not in saved:
+                    yield next(fetched)
+                    continue
+                page = checkpoint.load(*key)
+                # Expired since it was listed: fetch it after all
+                yield (key, page) if page is not None else run_chunk([key])[0]
+
+    print(f"   [{name}] Fetching {len(windows)} window(s) in batches of {MAX_BATCH_REQUESTS}...")
+    for (window, _), (row_count, first) in fetch_all([(window, 0) for window in windows], 1):
+        if first is None:
+            continue
+        offsets = _page_offsets(row_count, window.page_limit(limit))
+        print(f"   [{name}] > {window.label}: {row_count:,} rows in {len(offsets) + 1} page(s)")
+        yield first
+        del first
+        for _, (_, chunk) in fetch_all([(window, offset) for offset in offsets], max_pending_batches):
+            if chunk is not None:
+                yield chunk
+
+
+def page_decoder(property_id: str, property_details: Dict[str, str]) -> Callable[[Any], pd.DataFrame]:
+    """
+    Returns the page decode step: in the decode worker processes if there are
+    any, else inline. Pages are always decoded inline with --profile.
+    """
+    pool = get_decode_pool() if get_profiler() is None else None
+
+    def decode(response: Any) -> pd.DataFrame:
+        with stage_timer(property_id, 'decode'):
+            if pool is None:
+                return page_to_frame(response, property_details)
+            return decode_in_process(pool, response, property_details)
+
+    return decode
+
+
+def _query_checkpoints(property_id: str) -> List[PageCheckpoint]:
+    """Page checkpoints of a property's session- and event-grain queries (none if disabled)."""
+    checkpoints = [page_checkpoint(property_id, spec, PAGE_SIZE) for spec in (SESSION_REPORT_SPEC, EVENT_REPORT_SPEC)]
+    return [checkpoint for checkpoint in checkpoints if checkpoint]
+
+
+def session_index(property_id: str, session_chunks: List[pd.DataFrame]) -> SessionGrainIndex:
+    """Indexes a property's decoded session-grain pages for merging."""
+    with stage_timer(property_id, 'transform'):
+        return SessionGrainIndex(concat_frames(session_chunks), SESSION_KEY_COLUMNS, SESSION_METRIC_COLUMNS)
+
+
+def merge_scopes(
+    property_id: str,
+    index: SessionGrainIndex,
+    event_chunks: Iterable[pd.DataFrame],
+) -> Iterator[pd.DataFrame]:
+    """
+    Streams event-grain chunks with the session metrics merged in, followed
+    by the session-grain rows no event-grain row matched.
+    """
+    for chunk in event_chunks:
+        with stage_timer(property_id, 'transform'):
+            chunk = index.merge(chunk)
+        yield chunk
+    with stage_timer(property_id, 'transform'):
+        unmatched = index.unmatched()
+    if not unmatched.empty:
+        yield unmatched
+
+
+def iter_ga4_report(
+    property_id: str,
+    property_details: Dict[str, str],
+    limiter: Optional[RateLimiter] = None,
+    date_ranges: Optional[List[Dict[str, str]]] = None,
+    manifest: Optional[Manifest] = None,
+) -> Iterator[pd.DataFrame]:
+    """
+    Streams a single GA4 property as decoded DataFrame chunks, one per page.
+
+    The property is extracted with scope-separated queries over the same
+    request windows (see scope_merge.py): the session-grain query is fetched
+    first and indexed, then event-grain pages are merged with it as they
+    arrive. This generator is the fetch and decode end of the pipeline (see
+    pipeline.py): pages are decoded as they arrive and their protobufs
+    released, and fetching runs at most PIPELINE_MAX_PENDING_REQUESTS ahead
+    of the consumer, so memory stays bounded however slow the writer is.
+    Errors propagate to the caller.
+
+    Args:
+        property_id: GA4 property ID (e.g., 'properties/123456789')
+        property_details: Dictionary containing 'name' and 'hostname' for the property
+        limiter: Shared per-property rate limiter (a private one is created if omitted)
+        date_ranges: Ranges to extract (defaults to config.DATE_RANGES)
+        manifest: Extraction manifest holding recorded day probes; new probes are added to it
+
+    Yields:
+        DataFrame chunks with the final output columns, in window/offset order
+    """
+    limiter = limiter or RateLimiter()
+    name = property_details['name']
+    client = get_client()
+
+    # Build dimensions
+    dimensions = [Dimension(name=d) for d in DIMENSION_NAMES]
+    session_dimensions = [Dimension(name=d) for d in SESSION_DIMENSION_NAMES]
+
+    # Build metrics
+    session_metrics = [Metric(name=m) for m in SESSION_METRIC_NAMES]
+    event_metrics = [Metric(name=m) for m in EVENT_METRIC_NAMES]
+
+    # Merge overlapping ranges and size request windows from per-day row
+    # estimates of the event-grain query, the larger of the two
+    windows, probed = plan_report_windows(
+        date_ranges or DATE_RANGES,
+        property_id,
+        dimensions,
+        event_metrics,
+        lambda request: _run_report(client, request, limiter),
+        name,
+        manifest.settled_probes(property_id, REPORT_SPEC) if manifest else None,
+    )
+    if manifest:
+        manifest.record_probes(property_id, REPORT_SPEC, probed)
+
+    decode = page_decoder(property_id, property_details)
+
+    def fetch(query_dimensions: List[Dimension], query_metrics: List[Metric], spec: str) -> Iterator[pd.DataFrame]:
+        # Pages completed by an interrupted earlier run are reused from here
+        checkpoint = page_checkpoint(property_id, spec, PAGE_SIZE)
+        if USE_BATCH_REQUESTS:
+            yield from _fetch_windows_batched(
+                client, property_id, windows, query_dimensions, query_metrics, PAGE_SIZE, limiter, decode, name,
+                checkpoint,
+            )
+        else:
+            for window in windows:
+                print(f"   [{name}] Fetching data for {window.label}...")
+                yield from _fetch_pages(
+                    client, property_id, window, query_dimensions, query_metrics, PAGE_SIZE, limiter, decode, name,
+                    checkpoint,
+                )
+
+    print(f"   [{name}] Session-grain query...")
+    index = session_index(property_id, list(fetch(session_dimensions, session_metrics, SESSION_REPORT_SPEC)))
+    print(f"   [{name}] Event-grain query ({len(index):,} session-grain rows indexed)...")
+    yield from merge_scopes(property_id, index, fetch(dimensions, event_metrics, EVENT_REPORT_SPEC))
+
+
+def get_ga4_report(
+    property_id: str,
+    property_details: Dict[str, str],
+    limiter: Optional[RateLimiter] = None,
+    date_ranges: Optional[List[Dict[str, str]]] = None,
+) -> Optional[pd.DataFrame]:
     """
     Extracts data from a single GA4 property using scope-separated queries.
     
@@ -61,156 +556,42 @@ def get_ga4_report(property_id: str, property_details: Dict[str, str]) -> Option
     Args:
         property_id: GA4 property ID (e.g., 'properties/123456789')
         property_details: Dictionary containing 'name' and 'hostname' for the property
+        limiter: Shared per-property rate limiter (a private one is created if omitted)
+        date_ranges: Ranges to extract (defaults to config.DATE_RANGES)
 
     Returns:
         Merged DataFrame with all columns and accurate totals or None if error occurs
     """
+    name = property_details['name']
     try:
-        print(f"   Authenticating with Google Analytics API...")
-        client = BetaAnalyticsDataClient.from_service_account_json(KEY_FILE_PATH)
-
-        # Create date ranges
-        date_range_list = [
-            DateRange(start_date=dr['startDate'], end_date=dr['endDate'])
-            for dr in DATE_RANGES
-        ]
-
-        # Build dimensions
-        dimensions = [Dimension(name=d) for d in DIMENSION_NAMES]
-
-        # Build metrics
-        metrics = [Metric(name=m) for m in METRIC_NAMES]
-
-        all_responses = []
-        
-        # Process each date range separately to avoid aggregation
-        print(f"   Fetching data for each individual date to maximize granularity...")
-        
-        for date_range in date_range_list:
-            # Calculate date range
-            start_date = date_range.start_date
-            end_date = date_range.end_date
-            
-            # Try to parse dates if they're in YYYY-MM-DD format
-            try:
-                from datetime import datetime as dt
-                if start_date not in ['today', 'yesterday', '7daysAgo', '30daysAgo']:
-                    start_dt = dt.strptime(start_date, '%Y-%m-%d')
-                    end_dt = dt.strptime(end_date, '%Y-%m-%d')
-                    
-                    # Loop through each individual day
-                    current_date = start_dt
-                    while current_date <= end_dt:
-                        date_str = current_date.strftime('%Y-%m-%d')
-                        print(f"   Fetching data for {date_str}...")
-                        
-                        # Create single-day date range
-                        day_date_range = [DateRange(start_date=date_str, end_date=date_str)]
-                        
-                        offset = 0
-                        limit = 10000
-                        
-                        while True:
-                            request = RunReportRequest(
-                                property=property_id,
-                                date_ranges=day_date_range,
-                                dimensions=dimensions,
-                                metrics=metrics,
-                                limit=limit,
-                                offset=offset
-                            )
-                            
-                            response = client.run_report(request)
-                            
-                            if not response.rows:
-                                break
-                            
-                            all_responses.append(response)
-                            rows_returned = len(response.rows)
-                            total_rows = sum(len(r.rows) for r in all_responses)
-                            
-                            print(f"   > Retrieved {rows_returned:,} rows for {date_str} (Total: {total_rows:,})")
-                            
-                            if rows_returned < limit:
-                                break
-                            
-                            offset += limit
-                        
-                        # Move to next day
-                        from datetime import timedelta
-                        current_date += timedelta(days=1)
-                else:
-                    # Use original date range as-is
-                    offset = 0
-                    limit = 10000
-                    
-                    while True:
-                        request = RunReportRequest(
-                            property=property_id,
-                            date_ranges=[date_range],
-                            dimensions=dimensions,
-                            metrics=metrics,
-                            limit=limit,
-                            offset=offset
-                        )
-                        
-                        response = client.run_report(request)
-                        
-                        if not response.rows:
-                            break
-                        
-                        all_responses.append(response)
-                        rows_returned = len(response.rows)
-                        
-                        if rows_returned < limit:
-                            break
-                        
-                        offset += limit
-                        
-            except ValueError:
-                # Fallback to original approach
-                offset = 0
-                limit = 10000
-                
-                while True:
-                    request = RunReportRequest(
-                        property=property_id,
-                        date_ranges=[date_range],
-                        dimensions=dimensions,
-                        metrics=metrics,
-                        limit=limit,
-                        offset=offset
-                    )
-                    
-                    response = client.run_report(request)
-                    
-                    if not response.rows:
-                        break
-                    
-                    all_responses.append(response)
-                    rows_returned = len(response.rows)
-                    
-                    if rows_returned < limit:
-                        break
-                    
-                    offset += limit
-        
-        # Convert responses to DataFrame using response_to_dataframe
-        if not all_responses:
+        chunks = list(iter_ga4_report(property_id, property_details, limiter, date_ranges))
+        if not chunks:
             return pd.DataFrame()
-        
-        df = response_to_dataframe(all_responses, property_details)
+
+        df = concat_frames(chunks)
+        print(f"   [{name}] Total rows in DataFrame: {len(df):,} ({len(chunks)} page(s))")
         return df
 
-    except FileNotFoundError:
-        print(f"   [ERROR] Service account key file not found at: {KEY_FILE_PATH}")
-        print(f"   Please download your service account JSON key and place it in the project directory.")
-        return None
     except Exception as e:
-        print(f"   [ERROR] Failed to fetch data - {type(e).__name__}: {str(e)}")
+        report_fetch_error(property_id, name, e)
         return None
 
 
+def report_fetch_error(property_id: str, name: str, error: Exception) -> None:
+    """
+    Prints why a property's extraction failed and how many completed pages
+    the next run will resume from.
+    """
+    if isinstance(error, FileNotFoundError):
+        print(f"   [{name}] [ERROR] Service account key file not found at: {KEY_FILE_PATH}")
+        print("   Please download your service account JSON key and place it in the project directory.")
+        return
+    print(f"   [{name}] [ERROR] Failed to fetch data - {type(error).__name__}: {str(error)}")
+    pages = sum(checkpoint.page_count() for checkpoint in _query_checkpoints(property_id))
+    if pages:
+        print(f"   [{name}] [CHECKPOINT] {pages} completed page(s) kept; the next run resumes from them")
+
+
 def response_to_dataframe(responses: List[Any], property_details: Dict[str, str]) -> pd.DataFrame:
     """
     Converts GA4 API response(s) to a pandas DataFrame with proper transformations.
@@ -226,50 +607,126 @@ def response_to_dataframe(responses: List[Any], property_details: Dict[str, str]
     if not responses or not responses[0].rows:
         return pd.DataFrame()
 
-    print(f"   Converting {len(responses)} page(s) to DataFrame...")
+    return concat_frames([page_to_frame(response, property_details) for response in responses])
+
+
+def concat_frames(chunks: List[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Concatenates decoded chunks, keeping CATEGORICAL_COLUMNS as 'category'.
+
+    pd.concat falls back to object dtype when chunks carry different
+    categories, so each categorical column is first given the union of
+    all chunks' categories.
+    """
+    chunks = [chunk for chunk in chunks if not chunk.empty]
+    if not chunks:
+        return pd.DataFrame()
+    if len(chunks) > 1:
+        for col in CATEGORICAL_COLUMNS:
+            if not all(isinstance(chunk[col].dtype, pd.CategoricalDtype) for chunk in chunks):
+                continue
+            categories = pd.Index([])
+            for chunk in chunks:
+                categories = categories.union(chunk[col].cat.categories, sort=False)
+            chunks = [chunk.assign(**{col: chunk[col].cat.set_categories(categories)}) for chunk in chunks]
+    return pd.concat(chunks, ignore_index=True)
+
+
+def _raw_response(response: Any) -> Any:
+    """Returns the underlying protobuf message of a proto-plus response (or the message itself)."""
+    pb = getattr(type(response), 'pb', None)
+    return pb(response) if pb is not None else response
+
+
+def _parse_metric(values: np.ndarray, metric_type: int) -> np.ndarray:
+    """
+    Parses a column of metric strings straight to int64 (integer metrics) or
+    float64 (currency, float, durations, ...) based on the header's MetricType.
+    """
+    dtype = np.int64 if metric_type == MetricType.TYPE_INTEGER else np.float64
+    try:
+        return values.astype(dtype)
+    except ValueError:
+        # Unexpected values (e.g. empty strings): fall back to lenient parsing
+        return pd.to_numeric(pd.Series(values), errors='coerce').fillna(0).to_numpy().astype(dtype)
 
-    # Extract headers from first response
-    dimension_headers = [header.name for header in responses[0].dimension_headers]
-    metric_headers = [header.name for header in responses[0].metric_headers]
-    
-    # Build column names (Website Name + dimensions + metrics)
-    column_names = ['Website Name'] + dimension_headers + metric_headers
-
-    # Extract row data from all pages
-    data = []
-    for response in responses:
-        for row in response.rows:
-            row_values = [property_details['name']]  # Website Name first
-            
-            # Add dimension values
-            row_values.extend([dim_value.value for dim_value in row.dimension_values])
-            
-            # Add metric values
-            row_values.extend([metric_value.value for metric_value in row.metric_values])
-            
-            data.append(row_values)
-
-    # Create initial DataFrame
-    df = pd.DataFrame(data, columns=column_names)
-    
-    print(f"   Total rows in DataFrame: {len(df):,}")
+
+def _map_categories(values: pd.Series, transform: Callable[[pd.Series], pd.Series]) -> pd.Series:
+    """Applies a string transform to a categorical column's categories instead of every row."""
+    categories = transform(pd.Series(values.cat.categories))
+    if categories.is_unique:
+        return values.cat.rename_categories(categories.tolist())
+    # The transform merged some categories: re-encode from the mapped values
+    return pd.Series(pd.Categorical(categories.to_numpy()[values.cat.codes]), index=values.index)
+
+
+def _format_dates(dates: pd.Series) -> pd.Series:
+    """Formats YYYYMMDD strings as YYYY-MM-DD; other values are kept as-is."""
+    is_compact = dates.str.fullmatch(r'\d{8}')
+    return dates.where(~is_compact, dates.str[:4] + '-' + dates.str[4:6] + '-' + dates.str[6:8])
+
+
+def page_to_frame(response: Any, property_details: Dict[str, str]) -> pd.DataFrame:
+    """
+    Decodes a single GA4 response page into a DataFrame chunk with the final
+    output columns. Used by the streaming extractor so each page can be
+    converted as soon as it arrives.
+
+    Decoding is columnar: one array per dimension and metric is filled
+    directly from the raw protobuf rows, metrics are parsed to int64/float64
+    according to the response's metric_headers, and the URL/date transforms
+    are vectorized string operations. CATEGORICAL_COLUMNS are dictionary-encoded
+    as they are read, so their transforms only touch the distinct values.
+
+    Args:
+        response: GA4 RunReportResponse (one page)
+        property_details: Dictionary containing 'name' and 'hostname' for the property
+
+    Returns:
+        pandas DataFrame with formatted columns (empty if the page has no rows)
+    """
+    pb = _raw_response(response)
+    rows = pb.rows
+    if not rows:
+        return pd.DataFrame()
+
+    # Extract headers
+    dimension_headers = [header.name for header in pb.dimension_headers]
+    metric_headers = [(header.name, header.type_) for header in pb.metric_headers]
+
+    # Transpose rows into one column per dimension and metric
+    columns: Dict[str, Any] = {
+        'Website Name': pd.Categorical.from_codes(np.zeros(len(rows), dtype=np.int8), [property_details['name']])
+    }
+    dimension_columns = zip(*[[value.value for value in row.dimension_values] for row in rows])
+    for header, values in zip(dimension_headers, dimension_columns):
+        if COLUMN_MAPPING.get(header, header) in CATEGORICAL_COLUMNS:
+            columns[header] = pd.Categorical(values)
+        else:
+            columns[header] = values
+    metric_matrix = np.array([[value.value for value in row.metric_values] for row in rows])
+    for index, (header, metric_type) in enumerate(metric_headers):
+        columns[header] = _parse_metric(metric_matrix[:, index], metric_type)
+
+    df = pd.DataFrame(columns)
 
     # --- CRITICAL TRANSFORMATION: Clean FullURL from fullPageUrl ---
     if 'fullPageUrl' in df.columns:
         # fullPageUrl returns complete URL - extract domain and path only (remove protocol)
-        df['FullURL'] = df['fullPageUrl'].apply(
-            lambda x: x.replace('https://', '').replace('http://', '') if x else ''
+        df['FullURL'] = (
+            df['fullPageUrl']
+            .str.replace('https://', '', regex=False)
+            .str.replace('http://', '', regex=False)
         )
         # Remove the intermediate column
         df = df.drop(columns=['fullPageUrl'])
-    
-    print(f"   Transforming data (FullURL construction, column renaming, date formatting)...")
 
     # Format Date column from YYYYMMDD to YYYY-MM-DD
     if 'date' in df.columns:
-        df['date'] = df['date'].apply(
-            lambda x: f"{x[:4]}-{x[4:6]}-{x[6:8]}" if x and len(x) == 8 and x.isdigit() else x
-        )
+        if isinstance(df['date'].dtype, pd.CategoricalDtype):
+            df['date'] = _map_categories(df['date'], _format_dates)
+        else:
+            df['date'] = _format_dates(df['date'])
 
     # Rename columns to clean output names
     df = df.rename(columns=COLUMN_MAPPING)
@@ -277,23 +734,16 @@ def response_to_dataframe(responses: List[Any], property_details: Dict[str, str]
     # Ensure all columns exist (in case some weren't present in response)
     for col in OUTPUT_COLUMN_ORDER:
         if col not in df.columns:
+            if col in NUMERIC_COLUMNS:
+                # Same dtype as when decoded, so every chunk and output file has one schema
+                df[col] = np.zeros(len(df), dtype=METRIC_DTYPES[col])
+                continue
             df[col] = ''
+            if col in CATEGORICAL_COLUMNS:
+                df[col] = df[col].astype('category')
 
     # Select and reorder columns
-    existing_columns = [col for col in OUTPUT_COLUMN_ORDER if col in df.columns]
-    df = df[existing_columns]
-
-    # Convert numeric columns to appropriate types
-    numeric_columns = [
-        'Sessions', 'Engaged sessions', 'Views', 
-        'Active users', 'New users', 'Total users', 'Total revenue'
-    ]
-    
-    for col in numeric_columns:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
-
-    return df
+    return df[OUTPUT_COLUMN_ORDER]
 
 
 def generate_output_directory() -> str:
@@ -313,49 +763,297 @@ def generate_output_directory() -> str:
     return output_dir
 
 
-def generate_output_filename(website_name: str, hostname: str, output_dir: str) -> str:
+def pending_date_ranges(
+    property_id: str,
+    details: Dict[str, str],
+    manifest: Manifest,
+    refresh: bool = False,
+) -> Tuple[Optional[List[date]], List[Dict[str, str]]]:
     """
-    Generates a filename for a property's CSV based on its hostname.
-    
+    Works out which configured days a property still needs.
+
     Args:
-        website_name: The website name
-        hostname: The hostname (URL)
+        property_id: GA4 property ID (e.g., 'properties/123456789')
+        details: Dictionary containing 'name' and 'hostname' for the property
+        manifest: Extraction manifest of previous runs
+        refresh: Ignore the manifest and request every configured day
+
+    Returns:
+        Tuple of (days to extract, their date ranges). Days is None when the
+        configured ranges cannot be resolved to calendar dates; they are then
+        requested as-is and not tracked in the manifest.
+    """
+    configured = configured_days()
+    if configured is None:
+        return None, DATE_RANGES
+
+    days = configured if refresh else manifest.pending_days(property_id, REPORT_SPEC, configured)
+    if days and len(days) < len(configured):
+        print(f"   [{details['name']}] Manifest: {len(days)} of {len(configured)} day(s) missing or stale")
+    return days, days_to_ranges(days)
+
+
+def configured_days() -> Optional[List[date]]:
+    """Every day of config.DATE_RANGES, or None if they cannot be resolved to calendar dates."""
+    try:
+        return list(expand_days(merge_date_ranges(DATE_RANGES)))
+    except ValueError:
+        return None
+
+
+def schedule(
+    properties: Dict[str, Dict[str, str]],
+    manifest: Manifest,
+    refresh: bool = False,
+) -> Dict[str, Dict[str, str]]:
+    """Orders properties longest first by their pending days' estimated extraction time."""
+    configured = configured_days()
+    pending = {
+        property_id: None if configured is None
+        else configured if refresh
+        else manifest.pending_days(property_id, REPORT_SPEC, configured)
+        for property_id in properties
+    }
+    return schedule_properties(properties, manifest, REPORT_SPEC, pending)
+
+
+def complete_extraction(
+    manifest: Manifest,
+    property_id: str,
+    details: Dict[str, str],
+    days: Optional[List[date]],
+    result: Tuple[str, Optional[str]],
+    stats: DayStats,
+    seconds: float,
+) -> None:
+    """
+    Records a property's result in the run metrics. Once its output is saved,
+    also records its extracted days and run duration in the manifest and drops
+    its page checkpoints.
+    """
+    status, output_file = result
+    metrics = get_metrics()
+    if metrics is not None:
+        metrics.record_property(property_id, details['name'], status, stats.total_rows, seconds)
+    if status not in ('success', 'empty'):
+        return
+    if days:
+        manifest.record(property_id, REPORT_SPEC, days, stats, output_file)
+        manifest.record_run(property_id, REPORT_SPEC, len(days), stats.total_rows, seconds)
+    for checkpoint in _query_checkpoints(property_id):
+        checkpoint.clear()
+
+
+def write_property_output(
+    chunks: Iterable[pd.DataFrame],
+    property_id: str,
+    details: Dict[str, str],
+    output_dir: str,
+    writer: OutputWriter,
+    days: Optional[List[date]] = None,
+) -> Tuple[Tuple[str, Optional[str]], DayStats]:
+    """
+    Streams a property's decoded page chunks into the selected output writer.
+
+    Each chunk is appended as soon as it is produced, so memory does not grow
+    with property size. The output only appears under its final name once
+    every chunk was written; if extraction fails midway it is discarded.
+
+    Args:
+        chunks: Decoded page chunks (e.g. from iter_ga4_report); errors raised
+            while iterating fail the property
+        property_id: GA4 property ID (e.g., 'properties/123456789')
+        details: Dictionary containing 'name' and 'hostname' for the property
         output_dir: The output directory path
-        
+        writer: Output writer for the selected format
+        days: Days the chunks were extracted for (None if not known); an
+            upserting writer replaces all of them, including days without rows
+
     Returns:
-        Full path to the CSV file
+        Tuple of ((status, saved file path), per-day stats of the written rows)
+        where status is 'success', 'empty' or 'failed'
     """
-    # Extract domain from hostname (e.g., www.example.com -> example.com)
-    # Remove protocol and path
-    domain = hostname.replace('https://', '').replace('http://', '').split('/')[0]
-    
-    # Remove www. prefix if present
-    if domain.startswith('www.'):
-        domain = domain[4:]
-    
-    # Sanitize for filename (replace dots and special chars with underscores)
-    sanitized_domain = domain.replace('.', '_').replace('/', '_')
-    
-    # Generate filename
-    filename = f"{sanitized_domain}.csv"
-    full_path = os.path.join(output_dir, filename)
-    
-    return full_path
+    name = details['name']
+    stats = DayStats()
+    sink = None
+    pages = 0
+    try:
+        for chunk in chunks:
+            if chunk.empty:
+                continue
+            with stage_timer(property_id, 'write'):
+                if sink is None:
+                    sink = writer.open(property_id, details, output_dir, days)
+                sink.write(chunk)
+            stats.add(chunk)
+            pages += 1
+        with stage_timer(property_id, 'write'):
+            output_filename = sink.close() if sink else None
+            if sink is None and days:
+                writer.write_empty(property_id, days)
+    except Exception as e:
+        if sink:
+            sink.abort()
+        report_fetch_error(property_id, name, e)
+        print(f"   [{name}] [ERROR] Failed to retrieve data")
+        return ('failed', None), stats
+
+    if output_filename is None:
+        print(f"   [{name}] [WARNING] No data available for this property")
+        return ('empty', None), stats
+
+    print(f"   [{name}] Total rows written: {stats.total_rows:,} ({pages} page(s))")
+    print(f"   [{name}] [SUCCESS] Retrieved {stats.total_rows} rows")
+    print(f"   [{name}] [FILE] Saved to: {os.path.basename(output_filename)}")
+    return ('success', output_filename), stats
+
+
+def process_property(
+    idx: int,
+    total: int,
+    property_id: str,
+    details: Dict[str, str],
+    output_dir: str,
+    limiter: RateLimiter,
+    manifest: Manifest,
+    writer: OutputWriter,
+    refresh: bool = False,
+) -> Tuple[str, Optional[str]]:
+    """
+    Extracts and saves a single property. Safe to run concurrently with other properties.
+
+    Args:
+        idx: 1-based position of the property in the run (for progress output)
+        total: Total number of properties in the run
+        property_id: GA4 property ID (e.g., 'properties/123456789')
+        details: Dictionary containing 'name' and 'hostname' for the property
+        output_dir: The output directory path
+        limiter: Rate limiter shared by all workers
+        manifest: Extraction manifest; only days missing from it are requested
+        writer: Output writer for the selected format
+        refresh: Re-extract every configured day regardless of the manifest
+
+    Returns:
+        Tuple of (status, saved file path) where status is one of
+        'success', 'skipped', 'empty' or 'failed'
+    """
+    name = details['name']
+    print(f"[{idx}/{total}] Processing: {name} ({property_id})")
+
+    # Only request days the manifest has no settled extraction for
+    days, date_ranges = pending_date_ranges(property_id, details, manifest, refresh)
+    if days == []:
+        print(f"   [{name}] [SKIP] All configured days already extracted (manifest: {manifest.path})")
+        print(f"   [{name}] To re-extract, run again with --refresh.")
+        return 'skipped', None
+
+    started = time.monotonic()
+    chunks = iter_ga4_report(property_id, details, limiter, date_ranges, manifest)
+    result, stats = write_property_output(chunks, property_id, details, output_dir, writer, days)
+    complete_extraction(manifest, property_id, details, days, result, stats, time.monotonic() - started)
+    return result
+
+
+def run_properties(
+    properties: Dict[str, Dict[str, str]],
+    output_dir: str,
+    limiter: RateLimiter,
+    workers: int,
+    manifest: Manifest,
+    writer: OutputWriter,
+    refresh: bool = False,
+) -> List[Tuple[str, Optional[str]]]:
+    """
+    Threaded engine: extracts properties on a bounded worker pool.
+
+    Returns:
+        (status, saved file path) per property, in completion order
+    """
+    results = []
+    total = len(properties)
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        futures = {
+            executor.submit(
+                process_property, idx, total, property_id, details, output_dir, limiter, manifest, writer, refresh
+            ): details
+            for idx, (property_id, details) in enumerate(properties.items(), 1)
+        }
+        for future in as_completed(futures):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                print(f"   [{futures[future]['name']}] [ERROR] Unexpected failure - {type(e).__name__}: {str(e)}")
+                results.append(('failed', None))
+    except BaseException:
+        # Ctrl-C: drop the queued properties instead of extracting them before exiting
+        executor.shutdown(wait=True, cancel_futures=True)
+        raise
+    executor.shutdown(wait=True)
+    return results
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parses command line options for the extraction run."""
+    parser = argparse.ArgumentParser(description="GA4 unified cross-property data extraction")
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=MAX_CONCURRENT_PROPERTIES,
+        help=f"Number of properties extracted concurrently (default: {MAX_CONCURRENT_PROPERTIES})",
+    )
+    parser.add_argument(
+        '--engine',
+        choices=['sync', 'async'],
+        default=EXTRACTION_ENGINE,
+        help=f"Extraction engine: worker threads or asyncio coroutines (default: {EXTRACTION_ENGINE})",
+    )
+    parser.add_argument(
+        '--format',
+        choices=sorted(WRITERS),
+        default=OUTPUT_FORMAT,
+        help=f"Output format (default: {OUTPUT_FORMAT})",
+    )
+    parser.add_argument(
+        '--refresh',
+        action='store_true',
+        help="Re-extract every configured day, ignoring the extraction manifest",
+    )
+    parser.add_argument(
+        '--profile',
+        action='store_true',
+        help="Profile CPU and memory of each pipeline stage (runs the sync engine, stages serialized)",
+    )
+    return parser.parse_args(argv)
 
 
-def main():
+def main(argv: Optional[List[str]] = None, properties: Optional[Dict[str, Dict[str, str]]] = None):
     """
-    Main execution: Loop through all GA4 properties and generate unified report.
+    Main execution: Extract all GA4 properties concurrently and generate unified report.
+
+    Args:
+        argv: Command line arguments (defaults to sys.argv)
+        properties: Properties to extract (defaults to properties.GA4_PROPERTIES)
     """
+    args = parse_args(argv)
+    if properties is None:
+        properties = GA4_PROPERTIES
+    workers = max(1, args.workers)
+    if args.profile and args.engine == 'async':
+        # Profilers attach to threads, not to coroutines sharing the event loop
+        print("[INFO] --profile uses the sync engine")
+        args.engine = 'sync'
+
     print("=" * 70)
     print("GA4 UNIFIED CROSS-PROPERTY DATA EXTRACTION")
     print("=" * 70)
     print(f"Date Range: {DATE_RANGES[0]['startDate']} to {DATE_RANGES[0]['endDate']}")
-    print(f"Properties to process: {len(GA4_PROPERTIES)}")
+    print(f"Properties to process: {len(properties)}")
+    print(f"Engine: {args.engine} | Concurrent properties: {workers} | Format: {args.format}")
     print("=" * 70)
     print()
 
-    if not GA4_PROPERTIES:
+    if not properties:
         print("[ERROR] No properties configured in properties.py")
         print("Please add at least one GA4 property to proceed.")
         sys.exit(1)
@@ -364,76 +1062,47 @@ def main():
     output_dir = generate_output_directory()
     print(f"Output Directory: {output_dir}")
     print()
-    
-    successful_properties = 0
-    failed_properties = 0
-    skipped_properties = 0
-    saved_files = []
-
-    # Loop through each property
-    for idx, (property_id, details) in enumerate(GA4_PROPERTIES.items(), 1):
-        print(f"[{idx}/{len(GA4_PROPERTIES)}] Processing: {details['name']}")
-        print(f"   Property ID: {property_id}")
-        
-        # Check if this property has already been extracted today
-        expected_filename_base = generate_output_filename(
-            details['name'], 
-            details['hostname'], 
-            output_dir
-        )
-        # Check for any file matching the base pattern (ignoring timestamp)
-        base_name = os.path.splitext(expected_filename_base)[0]
-        existing_files = [f for f in os.listdir(output_dir) if f.startswith(os.path.basename(base_name)) and f.endswith('.csv')]
-        
-        if existing_files:
-            print(f"   [SKIP] Data already exists: {existing_files[0]}")
-            print(f"   To re-extract, delete the file and run again.")
-            skipped_properties += 1
-            print()
-            continue
-        
-        df = get_ga4_report(property_id, details)
-        
-        if df is not None and not df.empty:
-            # Generate filename based on hostname
-            output_filename = generate_output_filename(
-                details['name'], 
-                details['hostname'], 
-                output_dir
-            )
-            
-            # Add timestamp to filename to avoid conflicts
-            import time
-            base_name = os.path.splitext(output_filename)[0]
-            output_filename = f"{base_name}_{int(time.time())}.csv"
-            
-            # Save individual CSV for this property
-            df.to_csv(output_filename, index=False)
-            saved_files.append(output_filename)
-            successful_properties += 1
-            print(f"   [SUCCESS] Retrieved {len(df)} rows")
-            print(f"   [FILE] Saved to: {os.path.basename(output_filename)}")
+
+    # One limiter for the whole run: it keeps a separate schedule per property,
+    # so concurrent workers never throttle each other across properties
+    limiter = RateLimiter()
+    writer = get_writer(args.format)
+    manifest = Manifest()
+    start_run_metrics(output_dir)
+    if args.profile:
+        start_profiler(output_dir, {property_id: details['name'] for property_id, details in properties.items()})
+
+    try:
+        # Longest properties first, by durations and row counts of past runs
+        properties = schedule(properties, manifest, args.refresh)
+        if args.engine == 'async':
+            import asyncio
+            from async_engine import run_properties_async
+            results = asyncio.run(run_properties_async(
+                properties, output_dir, limiter, workers, manifest, writer, args.refresh
+            ))
         else:
-            failed_properties += 1
-            if df is None:
-                print(f"   [ERROR] Failed to retrieve data")
-            else:
-                print(f"   [WARNING] No data available for this property")
-        
-        print()
-        
-        # Add delay between properties to avoid API rate limiting (skip for last property)
-        if idx < len(GA4_PROPERTIES):
-            print(f"   [WAIT] Pausing 15 seconds before next property...")
-            time.sleep(15)
-            print()
+            results = run_properties(properties, output_dir, limiter, workers, manifest, writer, args.refresh)
+    finally:
+        manifest.close()
+        shutdown_decode_pool()
+        # Per-request and per-stage metrics: JSON lines, Prometheus textfile and summary
+        finish_run_metrics()
+        finish_profiler()
+
+    saved_files = [path for status, path in results if status == 'success']
+    successful_properties = len(saved_files)
+    skipped_properties = sum(1 for status, _ in results if status == 'skipped')
+    failed_properties = len(results) - successful_properties - skipped_properties
+
+    print()
 
     # Summary of results
     print("=" * 70)
     if saved_files:
         print("[SUCCESS] DATA EXTRACTION COMPLETE!")
         print("=" * 70)
-        print(f"Successful Properties: {successful_properties}/{len(GA4_PROPERTIES)}")
+        print(f"Successful Properties: {successful_properties}/{len(properties)}")
         print(f"Skipped Properties: {skipped_properties}")
         print(f"Failed Properties: {failed_properties}")
         print(f"Output Directory: {output_dir}")
@@ -444,10 +1113,10 @@ def main():
     elif skipped_properties > 0:
         print("[INFO] ALL PROPERTIES ALREADY EXTRACTED")
         print("=" * 70)
-        print(f"Skipped Properties: {skipped_properties}/{len(GA4_PROPERTIES)}")
-        print(f"All properties have already been extracted for today.")
+        print(f"Skipped Properties: {skipped_properties}/{len(properties)}")
+        print("Every configured day of these properties is already recorded in the extraction manifest.")
         print(f"Output Directory: {output_dir}")
-        print("\nTo re-extract data, delete the existing CSV files.")
+        print("\nTo re-extract data, run again with --refresh.")
         print("=" * 70)
     else:
         print("[ERROR] NO DATA RETRIEVED")
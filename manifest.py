@@ -0,0 +1,289 @@
+"""
+Extraction manifest for incremental runs.
+
+A local SQLite file records every (property, date, report spec) unit that has
+been extracted, with its row count, a checksum of its rows and the file it was
+written to. Before extracting a property the run asks the manifest which of
+the configured days are still missing or stale, and only those days are
+requested from the API.
+
+A day is stale while GA4 may still be processing it: a unit extracted less
+than MANIFEST_FRESHNESS_DAYS after its date is fetched again on later runs.
+The report spec is a hash of the requested dimensions and metrics, so changing
+the report re-extracts every day under the new spec.
+
+The manifest also keeps the request planner's per-day row estimates (probes).
+Probes taken once a day had settled are reused by later runs instead of
+probing the API again. Finished property runs are recorded with their row
+count and duration, which the scheduler uses to start the longest properties
+first (see scheduler.py).
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from config import MANIFEST_FRESHNESS_DAYS, MANIFEST_PATH
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS extracted_units (
+    property_id TEXT NOT NULL,
+    date TEXT NOT NULL,
+    report_spec TEXT NOT NULL,
+    row_count INTEGER NOT NULL,
+    checksum TEXT NOT NULL,
+    output_file TEXT,
+    extracted_at TEXT NOT NULL,
+    PRIMARY KEY (property_id, date, report_spec)
+);
+CREATE TABLE IF NOT EXISTS day_probes (
+    property_id TEXT NOT NULL,
+    date TEXT NOT NULL,
+    report_spec TEXT NOT NULL,
+    estimated_rows INTEGER NOT NULL,
+    probed_at TEXT NOT NULL,
+    PRIMARY KEY (property_id, date, report_spec)
+);
+CREATE TABLE IF NOT EXISTS property_runs (
+    property_id TEXT NOT NULL,
+    report_spec TEXT NOT NULL,
+    days INTEGER NOT NULL,
+    row_count INTEGER NOT NULL,
+    seconds REAL NOT NULL,
+    finished_at TEXT NOT NULL
+)
+"""
+
+
+def report_spec_hash(dimensions: List[str], metrics: List[str]) -> str:
+    """Returns a short stable identifier for a report's dimensions and metrics."""
+    spec = json.dumps({'dimensions': dimensions, 'metrics': metrics}, sort_keys=True)
+    return hashlib.sha256(spec.encode('utf-8')).hexdigest()[:16]
+
+
+class DayStats:
+    """
+    Per-day row counts and checksums of extracted rows, accumulated chunk by
+    chunk as pages are written. The checksum is the sum (mod 2**64) of the
+    rows' hashes, so it does not depend on page order or boundaries.
+    """
+
+    def __init__(self):
+        self.rows: Dict[str, int] = {}
+        self._hashes: Dict[str, int] = {}
+
+    def add(self, chunk: pd.DataFrame) -> None:
+        """Adds a chunk with the output 'Date' column."""
+        if chunk.empty:
+            return
+        row_hashes = pd.util.hash_pandas_object(chunk, index=False).to_numpy()
+        for day, positions in chunk.groupby('Date', observed=True, sort=False).indices.items():
+            day = str(day)
+            day_hash = int(row_hashes[positions].sum(dtype=np.uint64))
+            self.rows[day] = self.rows.get(day, 0) + len(positions)
+            self._hashes[day] = (self._hashes.get(day, 0) + day_hash) % 2 ** 64
+
+    @property
+    def total_rows(self) -> int:
+        return sum(self.rows.values())
+
+    def checksum(self, day: str) -> str:
+        return f"{self._hashes[day]:016x}" if day in self._hashes else ''
+
+
+def days_to_ranges(days: List[date]) -> List[Dict[str, str]]:
+    """Groups days into consecutive runs in config.DATE_RANGES format."""
+    ranges: List[Dict[str, str]] = []
+    previous: Optional[date] = None
+    for day in sorted(days):
+        if previous is not None and day == previous + timedelta(days=1):
+            ranges[-1]['endDate'] = day.isoformat()
+        else:
+            ranges.append({'startDate': day.isoformat(), 'endDate': day.isoformat()})
+        previous = day
+    return ranges
+
+
+def expand_days(ranges: List[Tuple[date, date]]) -> Iterator[date]:
+    """Yields every day of the given (start, end) ranges."""
+    for start, end in ranges:
+        day = start
+        while day <= end:
+            yield day
+            day += timedelta(days=1)
+
+
+class Manifest:
+    """Thread-safe handle on the SQLite extraction manifest."""
+
+    def __init__(self, path: str = MANIFEST_PATH, freshness_days: int = MANIFEST_FRESHNESS_DAYS):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.freshness_days = freshness_days
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def pending_days(self, property_id: str, report_spec: str, days: List[date]) -> List[date]:
+        """
+        Returns the days that still need extracting for a property.
+
+        Args:
+            property_id: GA4 property ID (e.g., 'properties/123456789')
+            report_spec: Identifier from report_spec_hash()
+            days: Candidate days, typically the configured date ranges expanded
+
+        Returns:
+            Days with no manifest entry or whose entry was extracted before
+            the day was MANIFEST_FRESHNESS_DAYS old, in date order
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT date, extracted_at FROM extracted_units WHERE property_id = ? AND report_spec = ?',
+                (property_id, report_spec),
+            ).fetchall()
+        extracted = {row_date: datetime.fromisoformat(extracted_at) for row_date, extracted_at in rows}
+
+        pending = []
+        for day in sorted(set(days)):
+            extracted_at = extracted.get(day.isoformat())
+            if extracted_at is None or not self._settled(day, extracted_at):
+                pending.append(day)
+        return pending
+
+    def _settled(self, day: date, observed_at: datetime) -> bool:
+        """Whether data for `day` observed at `observed_at` is final (GA4 has finished processing it)."""
+        return observed_at >= datetime.combine(day + timedelta(days=self.freshness_days), datetime.min.time())
+
+    def settled_probes(self, property_id: str, report_spec: str) -> Dict[date, int]:
+        """
+        Returns the recorded row estimates of a property's days that were
+        probed after they had settled, so they can be planned without probing.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT date, estimated_rows, probed_at FROM day_probes WHERE property_id = ? AND report_spec = ?',
+                (property_id, report_spec),
+            ).fetchall()
+        probes = {}
+        for row_date, estimated_rows, probed_at in rows:
+            day = date.fromisoformat(row_date)
+            if self._settled(day, datetime.fromisoformat(probed_at)):
+                probes[day] = estimated_rows
+        return probes
+
+    def record_probes(self, property_id: str, report_spec: str, day_rows: Dict[date, int]) -> None:
+        """
+        Records the planner's estimated row count per probed day.
+
+        Args:
+            property_id: GA4 property ID
+            report_spec: Identifier from report_spec_hash()
+            day_rows: Estimated report rows per day (0 for days without data)
+        """
+        if not day_rows:
+            return
+        probed_at = datetime.now().isoformat(timespec='seconds')
+        entries = [
+            (property_id, day.isoformat(), report_spec, rows, probed_at)
+            for day, rows in sorted(day_rows.items())
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany('INSERT OR REPLACE INTO day_probes VALUES (?, ?, ?, ?, ?)', entries)
+
+    def record(
+        self,
+        property_id: str,
+        report_spec: str,
+        days: List[date],
+        stats: DayStats,
+        output_file: Optional[str],
+    ) -> None:
+        """
+        Records the extracted days of a property after its output was written.
+
+        Every requested day gets an entry, including days without rows, so
+        days GA4 has no data for are not requested again once settled.
+
+        Args:
+            property_id: GA4 property ID
+            report_spec: Identifier from report_spec_hash()
+            days: Days that were requested
+            stats: Row counts and checksums of the written rows
+            output_file: File the rows were written to (None when there were no rows)
+        """
+        extracted_at = datetime.now().isoformat(timespec='seconds')
+        entries = []
+        for day in sorted(set(days)):
+            key = day.isoformat()
+            rows = stats.rows.get(key, 0)
+            entries.append((property_id, key, report_spec, rows, stats.checksum(key),
+                            output_file if rows else None, extracted_at))
+
+        with self._lock, self._conn:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO extracted_units VALUES (?, ?, ?, ?, ?, ?, ?)',
+                entries,
+            )
+
+    def day_row_counts(self, property_id: str, report_spec: str) -> Dict[date, int]:
+        """
+        Returns the best known row count of every day seen for a property:
+        the count of its last extraction, else its probe estimate.
+        """
+        with self._lock:
+            probes = self._conn.execute(
+                'SELECT date, estimated_rows FROM day_probes WHERE property_id = ? AND report_spec = ?',
+                (property_id, report_spec),
+            ).fetchall()
+            extracted = self._conn.execute(
+                'SELECT date, row_count FROM extracted_units WHERE property_id = ? AND report_spec = ?',
+                (property_id, report_spec),
+            ).fetchall()
+        counts = {date.fromisoformat(row_date): rows for row_date, rows in probes}
+        counts.update((date.fromisoformat(row_date), rows) for row_date, rows in extracted)
+        return counts
+
+    def record_run(self, property_id: str, report_spec: str, days: int, row_count: int, seconds: float) -> None:
+        """Records a finished extraction of a property and how long it took."""
+        finished_at = datetime.now().isoformat(timespec='seconds')
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT INTO property_runs VALUES (?, ?, ?, ?, ?, ?)',
+                (property_id, report_spec, days, row_count, seconds, finished_at),
+            )
+
+    def run_history(self, report_spec: str, runs_per_property: int) -> Dict[str, List[Tuple[int, int, float]]]:
+        """
+        Returns the most recent finished runs of every property.
+
+        Returns:
+            (days, row count, seconds) per run, newest first, keyed by property ID
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT property_id, days, row_count, seconds FROM property_runs '
+                'WHERE report_spec = ? ORDER BY finished_at DESC, rowid DESC',
+                (report_spec,),
+            ).fetchall()
+        history: Dict[str, List[Tuple[int, int, float]]] = {}
+        for property_id, days, row_count, seconds in rows:
+            runs = history.setdefault(property_id, [])
+            if len(runs) < runs_per_property:
+                runs.append((days, row_count, seconds))
+        return history
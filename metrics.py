@@ -0,0 +1,293 @@
+"""
+Run metrics: per-request instrumentation, stage timings and exports.
+
+Every GA4 Data API call is recorded with its latency, rows, response bytes,
+page offset(s) and the quota tokens it consumed. Each property also
+accumulates the time spent in every pipeline stage:
+
+- fetch: API calls (successful attempts, summed across fetch threads)
+- decode: protobuf-to-column conversion of response pages
+- transform: the session/event-grain merge
+- write: appending chunks to the output and publishing it
+
+Events are appended to a JSON lines file as they happen. At the end of the
+run the totals are written as a Prometheus textfile (for node_exporter's
+textfile collector) and summarised on the console: p50/p95 request latency,
+rows/sec and stage times per property.
+
+Stage times are summed over threads, so with concurrent fetches or decode
+processes they can add up to more than the property's wall time.
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from typing import Any, Dict, IO, Iterator, List, Optional
+
+import numpy as np
+
+from config import METRICS_ENABLED, PROMETHEUS_TEXTFILE
+from profiling import profile_stage
+
+STAGES = ('fetch', 'decode', 'transform', 'write')
+
+_lock = threading.Lock()
+_metrics: Optional['RunMetrics'] = None
+
+
+def _quantile(values: List[float], q: float) -> float:
+    return float(np.percentile(values, q * 100)) if values else 0.0
+
+
+def _label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', ' ')
+
+
+class PropertyMetrics:
+    """Totals of one property."""
+
+    def __init__(self, property_id: str):
+        self.property_id = property_id
+        self.name = property_id
+        self.latencies: List[float] = []
+        self.requests = 0
+        self.errors = 0
+        self.cache_hits = 0
+        self.response_rows = 0
+        self.response_bytes = 0
+        self.quota_tokens = 0
+        self.stage_seconds: Dict[str, float] = {stage: 0.0 for stage in STAGES}
+        self.rows_written = 0
+        self.seconds = 0.0
+        self.status = ''
+
+
+class RunMetrics:
+    """Thread-safe collector of one run's metrics."""
+
+    def __init__(self, jsonl_path: str, prometheus_path: str):
+        self.jsonl_path = jsonl_path
+        self.prometheus_path = prometheus_path
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._properties: Dict[str, PropertyMetrics] = {}
+        directory = os.path.dirname(jsonl_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Line buffered, so the file can be followed while the run is in progress
+        self._file: Optional[IO[str]] = open(jsonl_path, 'a', encoding='utf-8', buffering=1)
+
+    def _property(self, property_id: str) -> PropertyMetrics:
+        if property_id not in self._properties:
+            self._properties[property_id] = PropertyMetrics(property_id)
+        return self._properties[property_id]
+
+    def _emit(self, event: Dict[str, Any]) -> None:
+        """Appends one event to the JSON lines file (caller holds the lock)."""
+        if self._file is not None:
+            event = {'ts': round(time.time(), 3), **event}
+            self._file.write(json.dumps(event, separators=(',', ':')) + '\n')
+
+    def record_request(
+        self,
+        property_id: str,
+        method: str,
+        latency: float,
+        rows: int,
+        response_bytes: int,
+        offsets: List[int],
+        tokens: int,
+    ) -> None:
+        """Records a successful API call (one RunReport, or one BatchRunReports with several reports)."""
+        with self._lock:
+            totals = self._property(property_id)
+            totals.requests += 1
+            totals.latencies.append(latency)
+            totals.response_rows += rows
+            totals.response_bytes += response_bytes
+            totals.quota_tokens += tokens
+            totals.stage_seconds['fetch'] += latency
+            self._emit({
+                'event': 'request', 'property': property_id, 'method': method, 'latency': round(latency, 4),
+                'rows': rows, 'bytes': response_bytes, 'offsets': offsets, 'tokens': tokens,
+            })
+
+    def record_error(self, property_id: str, method: str, latency: float, error: BaseException) -> None:
+        """Records a failed API call attempt."""
+        with self._lock:
+            self._property(property_id).errors += 1
+            self._emit({
+                'event': 'request_error', 'property': property_id, 'method': method,
+                'latency': round(latency, 4), 'error': type(error).__name__,
+            })
+
+    def record_cache_hit(self, property_id: str, offset: int) -> None:
+        with self._lock:
+            self._property(property_id).cache_hits += 1
+            self._emit({'event': 'cache_hit', 'property': property_id, 'offset': offset})
+
+    def record_stage(self, property_id: str, stage: str, seconds: float) -> None:
+        with self._lock:
+            self._property(property_id).stage_seconds[stage] += seconds
+            self._emit({'event': 'stage', 'property': property_id, 'stage': stage, 'seconds': round(seconds, 4)})
+
+    @contextmanager
+    def stage(self, property_id: str, stage: str) -> Iterator[None]:
+        """Times a block of work as part of a property's stage."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_stage(property_id, stage, time.perf_counter() - started)
+
+    def record_property(self, property_id: str, name: str, status: str, rows: int, seconds: float) -> None:
+        """Records a property's outcome once its output is saved (or it failed)."""
+        with self._lock:
+            totals = self._property(property_id)
+            totals.name = name
+            totals.status = status
+            totals.rows_written = rows
+            totals.seconds = seconds
+            self._emit({'event': 'property', 'property': property_id, 'name': name, 'status': status,
+                        'rows': rows, 'seconds': round(seconds, 3)})
+
+    def close(self) -> None:
+        """Writes the Prometheus textfile and closes the JSON lines file."""
+        with self._lock:
+            self._emit({'event': 'run', 'seconds': round(time.time() - self.started, 3)})
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            if self.prometheus_path:
+                self._write_prometheus()
+
+    def _write_prometheus(self) -> None:
+        lines: List[str] = []
+
+        def metric(name: str, kind: str, help_text: str, samples: List[str]) -> None:
+            lines.extend([f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"] + samples)
+
+        properties = sorted(self._properties.values(), key=lambda totals: totals.property_id)
+        labels = {totals.property_id: f'property="{_label(totals.property_id)}",name="{_label(totals.name)}"'
+                  for totals in properties}
+
+        latency_samples = []
+        for totals in properties:
+            for q in (0.5, 0.95):
+                latency_samples.append(
+                    f'ga4_export_request_latency_seconds{{{labels[totals.property_id]},quantile="{q}"}} '
+                    f'{_quantile(totals.latencies, q):.6f}'
+                )
+            latency_samples.append(
+                f'ga4_export_request_latency_seconds_sum{{{labels[totals.property_id]}}} {sum(totals.latencies):.6f}'
+            )
+            latency_samples.append(
+                f'ga4_export_request_latency_seconds_count{{{labels[totals.property_id]}}} {len(totals.latencies)}'
+            )
+        metric('ga4_export_request_latency_seconds', 'summary', 'GA4 Data API call latency', latency_samples)
+
+        counters = [
+            ('ga4_export_requests_total', 'Successful GA4 Data API calls', 'requests'),
+            ('ga4_export_request_errors_total', 'Failed GA4 Data API call attempts', 'errors'),
+            ('ga4_export_cache_hits_total', 'Report pages served from the response cache', 'cache_hits'),
+            ('ga4_export_response_rows_total', 'Rows returned by the API', 'response_rows'),
+            ('ga4_export_response_bytes_total', 'Serialized size of API responses', 'response_bytes'),
+            ('ga4_export_quota_tokens_total', 'Property quota tokens consumed', 'quota_tokens'),
+            ('ga4_export_rows_written_total', 'Rows written to the output', 'rows_written'),
+        ]
+        for name, help_text, attribute in counters:
+            metric(name, 'counter', help_text, [
+                f'{name}{{{labels[totals.property_id]}}} {getattr(totals, attribute)}' for totals in properties
+            ])
+
+        metric('ga4_export_stage_seconds_total', 'counter', 'Time spent per pipeline stage', [
+            f'ga4_export_stage_seconds_total{{{labels[totals.property_id]},stage="{stage}"}} '
+            f'{totals.stage_seconds[stage]:.6f}'
+            for totals in properties for stage in STAGES
+        ])
+        metric('ga4_export_property_duration_seconds', 'gauge', 'Wall time of the property extraction', [
+            f'ga4_export_property_duration_seconds{{{labels[totals.property_id]}}} {totals.seconds:.3f}'
+            for totals in properties
+        ])
+        metric('ga4_export_property_success', 'gauge', 'Whether the property was extracted (1) or failed (0)', [
+            f'ga4_export_property_success{{{labels[totals.property_id]}}} {int(totals.status != "failed")}'
+            for totals in properties if totals.status
+        ])
+        metric('ga4_export_run_duration_seconds', 'gauge', 'Wall time of the whole run',
+               [f'ga4_export_run_duration_seconds {time.time() - self.started:.3f}'])
+        metric('ga4_export_last_run_timestamp_seconds', 'gauge', 'End time of the last run',
+               [f'ga4_export_last_run_timestamp_seconds {time.time():.0f}'])
+
+        # Atomic replace, so the textfile collector never reads a partial file
+        directory = os.path.dirname(self.prometheus_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{self.prometheus_path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.replace(temp_path, self.prometheus_path)
+
+    def print_summary(self) -> None:
+        """Prints p50/p95 latency, rows/sec and stage times per property."""
+        with self._lock:
+            properties = [totals for totals in self._properties.values() if totals.status]
+            latencies = [latency for totals in self._properties.values() for latency in totals.latencies]
+            requests = sum(totals.requests for totals in self._properties.values())
+            errors = sum(totals.errors for totals in self._properties.values())
+            cache_hits = sum(totals.cache_hits for totals in self._properties.values())
+        if not properties and not requests:
+            return
+
+        print("Metrics:")
+        print(f"   API calls: {requests:,} ({errors:,} failed attempts, {cache_hits:,} cache hits) | "
+              f"latency p50 {_quantile(latencies, 0.5):.2f}s, p95 {_quantile(latencies, 0.95):.2f}s")
+        header = f"   {'Property':<28}{'Rows':>11}{'Rows/s':>9}{'p50':>7}{'p95':>7}" + ''.join(
+            f"{stage:>10}" for stage in STAGES)
+        print(header)
+        for totals in sorted(properties, key=lambda totals: totals.seconds, reverse=True):
+            rate = totals.rows_written / totals.seconds if totals.seconds else 0.0
+            print(f"   {totals.name[:27]:<28}{totals.rows_written:>11,}{rate:>9,.0f}"
+                  f"{_quantile(totals.latencies, 0.5):>6.2f}s{_quantile(totals.latencies, 0.95):>6.2f}s"
+                  + ''.join(f"{totals.stage_seconds[stage]:>9.1f}s" for stage in STAGES))
+        print(f"   Events: {self.jsonl_path}" + (f" | Prometheus: {self.prometheus_path}" if self.prometheus_path else ""))
+
+
+def start_run_metrics(output_dir: str) -> Optional[RunMetrics]:
+    """Starts collecting metrics for a run, with the JSON lines file in the run's output directory."""
+    global _metrics
+    if not METRICS_ENABLED:
+        return None
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    with _lock:
+        _metrics = RunMetrics(
+            os.path.join(output_dir, f"metrics_{timestamp}.jsonl"),
+            PROMETHEUS_TEXTFILE or os.path.join(output_dir, 'ga4_export.prom'),
+        )
+        return _metrics
+
+
+def get_metrics() -> Optional[RunMetrics]:
+    """Returns the current run's metrics collector, or None if metrics are off or no run started."""
+    return _metrics
+
+
+@contextmanager
+def stage_timer(property_id: str, stage: str) -> Iterator[None]:
+    """Times a block as part of a property's stage, and profiles it with --profile."""
+    metrics = _metrics
+    with profile_stage(property_id, stage):
+        with metrics.stage(property_id, stage) if metrics is not None else nullcontext():
+            yield
+
+
+def finish_run_metrics() -> None:
+    """Writes the run's exports, prints its summary and stops collecting."""
+    global _metrics
+    with _lock:
+        metrics, _metrics = _metrics, None
+    if metrics is not None:
+        metrics.close()
+        metrics.print_summary()
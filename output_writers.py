@@ -0,0 +1,333 @@
+"""
+Output writers for extracted property data.
+
+A writer streams one property's decoded page chunks into files under the
+run's output directory: ``open()`` returns a sink, every chunk is appended as
+it comes out of the decode stage, and ``close()`` publishes the result. Files
+are written under temporary names and renamed into place on close, so a
+crashed or failed extraction never leaves a partial file behind. The format is
+chosen with OUTPUT_FORMAT in config.py or ``--format`` on the command line:
+
+- ``csv``: one timestamped CSV per property (the original output), optionally
+  gzip or zstd compressed (CSV_COMPRESSION; zstd requires zstandard).
+- ``parquet``: a Parquet dataset partitioned as ``property=<id>/date=<YYYY-MM-DD>/``.
+  Categorical columns are stored dictionary-encoded and files are compressed
+  with PARQUET_COMPRESSION. Requires pyarrow.
+- ``dataset``: one unified Parquet dataset for all properties and runs, where
+  re-extracted days replace their old rows, including days that no longer have
+  any (see dataset.py). Requires pyarrow.
+
+New formats are added by subclassing OutputWriter and OutputSink and
+registering the writer in WRITERS.
+"""
+
+import gzip
+import io
+import os
+import time
+from datetime import date
+from typing import IO, Any, Dict, Iterable, List, Optional, Type
+
+import pandas as pd
+
+import dataset
+from config import CSV_COMPRESSION, DATASET_DIR, PARQUET_COMPRESSION
+
+# File extension per CSV compression
+CSV_EXTENSIONS = {'none': '.csv', 'gzip': '.csv.gz', 'zstd': '.csv.zst'}
+
+
+def generate_output_filename(website_name: str, hostname: str, output_dir: str) -> str:
+    """
+    Generates a filename for a property's CSV based on its hostname.
+
+    Args:
+        website_name: The website name
+        hostname: The hostname (URL)
+        output_dir: The output directory path
+
+    Returns:
+        Full path to the CSV file
+    """
+    # Extract domain from hostname (e.g., www.example.com -> example.com)
+    # Remove protocol and path
+    domain = hostname.replace('https://', '').replace('http://', '').split('/')[0]
+
+    # Remove www. prefix if present
+    if domain.startswith('www.'):
+        domain = domain[4:]
+
+    # Sanitize for filename (replace dots and special chars with underscores)
+    sanitized_domain = domain.replace('.', '_').replace('/', '_')
+
+    # Generate filename
+    filename = f"{sanitized_domain}.csv"
+    full_path = os.path.join(output_dir, filename)
+
+    return full_path
+
+
+def _temp_path(path: str) -> str:
+    """Hidden in-progress name next to the final path (never matches *.csv or *.parquet)."""
+    directory, filename = os.path.split(path)
+    return os.path.join(directory, f".{filename}.tmp")
+
+
+class OutputSink:
+    """An in-progress output for one property: append chunks, then close or abort."""
+
+    def write(self, chunk: pd.DataFrame) -> None:
+        """Appends a non-empty chunk with the final output columns."""
+        raise NotImplementedError
+
+    def close(self) -> str:
+        """
+        Finishes the output and moves it into place.
+
+        Returns:
+            Path of the written file (or dataset directory)
+        """
+        raise NotImplementedError
+
+    def abort(self) -> None:
+        """Discards everything written so far."""
+        raise NotImplementedError
+
+
+class OutputWriter:
+    """Creates output sinks; subclasses implement one format each."""
+
+    name = ''
+
+    def open(
+        self,
+        property_id: str,
+        details: Dict[str, str],
+        output_dir: str,
+        days: Optional[List[date]] = None,
+    ) -> OutputSink:
+        """
+        Starts the output of one property.
+
+        Args:
+            property_id: GA4 property ID (e.g., 'properties/123456789')
+            details: Dictionary containing 'name' and 'hostname' for the property
+            output_dir: The run's output directory
+            days: Days the extraction requested, or None if they are not known
+        """
+        raise NotImplementedError
+
+    def write_empty(self, property_id: str, days: List[date]) -> None:
+        """
+        Called instead of open() when an extraction of `days` produced no rows.
+        Writers that upsert by day drop those days' earlier rows; the others
+        write nothing.
+        """
+
+
+class CsvSink(OutputSink):
+    """Appends chunks to a temporary, optionally compressed CSV file."""
+
+    def __init__(self, path: str, compression: str):
+        self.path = path
+        self.temp_path = _temp_path(path)
+        self._header = True
+        self._file = self._open(compression)
+
+    def _open(self, compression: str) -> IO[str]:
+        if compression == 'gzip':
+            return gzip.open(self.temp_path, 'wt', encoding='utf-8', newline='')
+        if compression == 'zstd':
+            import zstandard
+            raw = zstandard.ZstdCompressor().stream_writer(open(self.temp_path, 'wb'))
+            return io.TextIOWrapper(raw, encoding='utf-8', newline='')
+        return open(self.temp_path, 'w', encoding='utf-8', newline='')
+
+    def write(self, chunk: pd.DataFrame) -> None:
+        chunk.to_csv(self._file, header=self._header, index=False)
+        self._header = False
+
+    def close(self) -> str:
+        self._file.close()
+        os.replace(self.temp_path, self.path)
+        return self.path
+
+    def abort(self) -> None:
+        self._file.close()
+        try:
+            os.remove(self.temp_path)
+        except OSError:
+            pass
+
+
+class CsvWriter(OutputWriter):
+    """One timestamped CSV per property and run."""
+
+    name = 'csv'
+
+    def __init__(self, compression: str = CSV_COMPRESSION):
+        if compression not in CSV_EXTENSIONS:
+            raise ValueError(f"Unknown CSV compression '{compression}' (choose from: {', '.join(CSV_EXTENSIONS)})")
+        if compression == 'zstd':
+            try:
+                import zstandard  # noqa: F401
+            except ImportError:
+                raise ImportError("zstd-compressed CSV requires zstandard: pip install zstandard") from None
+        self.compression = compression
+
+    def open(
+        self,
+        property_id: str,
+        details: Dict[str, str],
+        output_dir: str,
+        days: Optional[List[date]] = None,
+    ) -> OutputSink:
+        # Add timestamp to filename to avoid conflicts
+        output_filename = generate_output_filename(details['name'], details['hostname'], output_dir)
+        base_name = os.path.splitext(output_filename)[0]
+        return CsvSink(f"{base_name}_{int(time.time())}{CSV_EXTENSIONS[self.compression]}", self.compression)
+
+
+class ParquetSink(OutputSink):
+    """
+    Appends chunks to one temporary Parquet file per date partition. A date
+    can span several chunks (pages), so every partition's file stays open
+    until close().
+    """
+
+    def __init__(self, property_dir: str, part_name: str, compression: str):
+        self.property_dir = property_dir
+        self.part_name = part_name
+        self.compression = compression
+        # Fixed schema, so every chunk and file of every run has the same column types
+        self._schema = dataset.output_schema()
+        self._files: Dict[str, Any] = {}
+
+    def _final_path(self, day: str) -> str:
+        return os.path.join(self.property_dir, f"date={day}", self.part_name)
+
+    def write(self, chunk: pd.DataFrame) -> None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        for day, group in chunk.groupby('Date', observed=True, sort=False):
+            day = str(day)
+            if day not in self._files:
+                final_path = self._final_path(day)
+                os.makedirs(os.path.dirname(final_path), exist_ok=True)
+                self._files[day] = pq.ParquetWriter(
+                    _temp_path(final_path),
+                    self._schema,
+                    compression=self.compression,
+                    use_dictionary=True,
+                )
+            table = pa.Table.from_pandas(group, schema=self._schema, preserve_index=False)
+            self._files[day].write_table(table)
+
+    def close(self) -> str:
+        for day, writer in self._files.items():
+            writer.close()
+            final_path = self._final_path(day)
+            os.replace(_temp_path(final_path), final_path)
+        return self.property_dir
+
+    def abort(self) -> None:
+        for day, writer in self._files.items():
+            writer.close()
+            try:
+                os.remove(_temp_path(self._final_path(day)))
+            except OSError:
+                pass
+
+
+class ParquetWriter(OutputWriter):
+    """Parquet dataset partitioned by property and date (hive-style directories)."""
+
+    name = 'parquet'
+
+    def __init__(self, compression: str = PARQUET_COMPRESSION):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ImportError("Parquet output requires pyarrow: pip install pyarrow") from None
+        self.compression = compression
+
+    def open(
+        self,
+        property_id: str,
+        details: Dict[str, str],
+        output_dir: str,
+        days: Optional[List[date]] = None,
+    ) -> OutputSink:
+        property_dir = os.path.join(output_dir, f"property={property_id.split('/')[-1]}")
+        return ParquetSink(property_dir, f"part-{int(time.time())}.parquet", self.compression)
+
+
+class DatasetSink(ParquetSink):
+    """
+    Upserts a property's days into the unified dataset: each extracted day
+    replaces that day's file, and is removed from its month's compacted file.
+    Requested days that produced no rows lose their earlier rows.
+    """
+
+    def __init__(self, property_dir: str, part_name: str, compression: str, days: Iterable[str] = ()):
+        super().__init__(property_dir, part_name, compression)
+        self.days = set(days)
+
+    def _final_path(self, day: str) -> str:
+        return dataset.day_path(self.property_dir, day)
+
+    def close(self) -> str:
+        property_dir = super().close()
+        days_by_month: Dict[str, List[str]] = {}
+        for day in self._files:
+            days_by_month.setdefault(os.path.dirname(self._final_path(day)), []).append(day)
+        for month_dir, days in days_by_month.items():
+            dataset.remove_days_from_compacted(month_dir, days)
+        dataset.remove_days(property_dir, sorted(self.days - set(self._files)))
+        return property_dir
+
+
+class DatasetWriter(ParquetWriter):
+    """Unified cross-property dataset under DATASET_DIR (see dataset.py)."""
+
+    name = 'dataset'
+
+    def __init__(self, root: str = DATASET_DIR, compression: str = PARQUET_COMPRESSION):
+        super().__init__(compression)
+        self.root = root
+
+    def open(
+        self,
+        property_id: str,
+        details: Dict[str, str],
+        output_dir: str,
+        days: Optional[List[date]] = None,
+    ) -> OutputSink:
+        return DatasetSink(
+            dataset.property_dir(self.root, property_id), '', self.compression,
+            [day.isoformat() for day in days or []],
+        )
+
+    def write_empty(self, property_id: str, days: List[date]) -> None:
+        dataset.remove_days(dataset.property_dir(self.root, property_id), [day.isoformat() for day in days])
+
+
+WRITERS: Dict[str, Type[OutputWriter]] = {
+    CsvWriter.name: CsvWriter,
+    ParquetWriter.name: ParquetWriter,
+    DatasetWriter.name: DatasetWriter,
+}
+
+
+def get_writer(output_format: str) -> OutputWriter:
+    """
+    Returns a writer for the given format name.
+
+    Raises:
+        ValueError: If the format is not registered in WRITERS
+    """
+    try:
+        return WRITERS[output_format]()
+    except KeyError:
+        raise ValueError(f"Unknown output format '{output_format}' (choose from: {', '.join(WRITERS)})") from None
@@ -0,0 +1,164 @@
+"""
+Pipelined fetch -> decode -> write stages.
+
+Each property is extracted as three overlapping stages:
+
+- fetch: I/O-bound worker threads send report requests through the
+  property's rate limiter;
+- decode: the CPU-bound protobuf-to-column conversion (page_to_frame). With
+  DECODE_PROCESSES > 0 every fetched page is serialized and decoded in a
+  shared pool of worker processes, so several pages decode in parallel
+  outside the GIL while the fetch threads keep the network busy;
+- write: the consumer of ga4_report_pull.iter_ga4_report appends decoded
+  chunks to the output sink, in page order.
+
+The stages are connected by bounded ordered queues (bounded_map): at most
+PIPELINE_MAX_PENDING_REQUESTS requests per property are in flight or
+fetched but not yet written. When the writer falls behind, no further pages
+are requested, so memory stays flat however large the property is.
+
+Decoded pages travel back from the worker processes as Arrow IPC files in a
+run-scoped handoff directory (in shared memory, /dev/shm, where available)
+instead of pickled DataFrames. The parent memory-maps each file, so reading
+it copies nothing, and numeric columns become pandas columns without a copy.
+Only the file path crosses the process boundary. Without pyarrow, pages are
+returned pickled.
+"""
+
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, Optional, TypeVar
+
+import pandas as pd
+
+from config import DECODE_PROCESSES
+
+T = TypeVar('T')
+R = TypeVar('R')
+
+_lock = threading.Lock()
+_pool: Optional[ProcessPoolExecutor] = None
+_handoff_dir: Optional[str] = None
+
+_DONE = object()
+
+
+def bounded_map(executor: Executor, func: Callable[[T], R], items: Iterable[T], max_pending: int) -> Iterator[R]:
+    """
+    Like Executor.map, but keeps at most max_pending tasks submitted and not
+    yet consumed. The next task is only submitted once the consumer takes a
+    result, which applies backpressure from the consumer to the producers.
+
+    Yields:
+        Results in item order
+    """
+    items = iter(items)
+    pending: Deque[Future] = deque()
+    try:
+        for item in items:
+            pending.append(executor.submit(func, item))
+            if len(pending) >= max(1, max_pending):
+                break
+        while pending:
+            result = pending.popleft().result()
+            item = next(items, _DONE)
+            if item is not _DONE:
+                pending.append(executor.submit(func, item))
+            yield result
+    finally:
+        # The consumer stopped early (or failed): drop work that has not started
+        for future in pending:
+            future.cancel()
+
+
+def get_decode_pool() -> Optional[ProcessPoolExecutor]:
+    """Returns the run-wide decode process pool, or None when pages are decoded in the fetch threads."""
+    global _pool, _handoff_dir
+    if DECODE_PROCESSES <= 0:
+        return None
+    with _lock:
+        if _pool is None:
+            # Workers are spawned rather than forked: forking a process with
+            # live gRPC channels and threads is unsafe
+            _pool = ProcessPoolExecutor(max_workers=DECODE_PROCESSES, mp_context=multiprocessing.get_context('spawn'))
+            _handoff_dir = _make_handoff_dir()
+        return _pool
+
+
+def shutdown_decode_pool() -> None:
+    """Stops the decode worker processes and removes their handoff files (at the end of a run)."""
+    global _pool, _handoff_dir
+    with _lock:
+        if _pool is not None:
+            _pool.shutdown(cancel_futures=True)
+            _pool = None
+        if _handoff_dir is not None:
+            shutil.rmtree(_handoff_dir, ignore_errors=True)
+            _handoff_dir = None
+
+
+def _make_handoff_dir() -> Optional[str]:
+    """Creates the directory decoded pages are handed over in, or returns None without pyarrow."""
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return None
+    shared_memory = '/dev/shm'
+    return tempfile.mkdtemp(prefix='ga4_decode_', dir=shared_memory if os.path.isdir(shared_memory) else None)
+
+
+def _write_arrow(frame: pd.DataFrame, directory: str) -> str:
+    """Writes a decoded page as an Arrow IPC file and returns its path."""
+    import pyarrow as pa
+
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    fd, path = tempfile.mkstemp(dir=directory, suffix='.arrow')
+    os.close(fd)
+    with pa.OSFile(path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    return path
+
+
+def _read_arrow(path: str) -> pd.DataFrame:
+    """Memory-maps a handed-over page and converts it to a DataFrame, then deletes the file."""
+    import pyarrow as pa
+
+    try:
+        with pa.memory_map(path) as source:
+            table = pa.ipc.open_file(source).read_all()
+        # split_blocks keeps each column in its own block, so numeric columns
+        # are not copied into a consolidated 2D block
+        return table.to_pandas(split_blocks=True, self_destruct=True)
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            # Still mapped on Windows: removed with the handoff directory
+            pass
+
+
+def _decode_in_worker(payload: bytes, property_details: Dict[str, str], handoff_dir: Optional[str]) -> Any:
+    from google.analytics.data_v1beta.types import RunReportResponse
+
+    from ga4_report_pull import page_to_frame
+
+    frame = page_to_frame(RunReportResponse.pb().FromString(payload), property_details)
+    if handoff_dir is None or frame.empty:
+        return frame
+    return _write_arrow(frame, handoff_dir)
+
+
+def decode_in_process(pool: ProcessPoolExecutor, response: Any, property_details: Dict[str, str]) -> pd.DataFrame:
+    """
+    Decodes one response page in a worker process. Blocks the calling fetch
+    thread until the page is decoded; other fetch threads keep fetching.
+    """
+    pb = getattr(type(response), 'pb', None)
+    payload = (pb(response) if pb is not None else response).SerializeToString()
+    result = pool.submit(_decode_in_worker, payload, property_details, _handoff_dir).result()
+    return _read_arrow(result) if isinstance(result, str) else result
@@ -0,0 +1,211 @@
+"""
+Per-stage CPU and memory profiling (``--profile``).
+
+Every block of pipeline work (an API call, a page decode, a scope merge, a
+chunk write, a response-cache or checkpoint read or write) runs under a
+cProfile profiler for its property and stage, and is bracketed by tracemalloc
+measurements:
+
+- peak: the most memory allocated by the block and alive at the same time;
+- allocators: the source lines whose allocations were still held when the
+  block ended, attributed to the innermost frame in this project (the
+  library line that actually allocated is shown next to it).
+
+Stage blocks are serialized across threads while profiling, so each stage's
+CPU time and memory are its own; fetching is therefore slower than in a
+normal run. tracemalloc sees every thread, so response-cache and checkpoint
+I/O, which run outside the pipeline stages, are profiled as stages of their
+own instead of being charged to whichever block is open.
+
+Pages are decoded in the fetch threads rather than in decode processes, whose
+work could not be profiled.
+
+At the end of the run each property gets a directory under the run's output
+directory with one cProfile file per stage (``pstats``/snakeviz compatible)
+and a text report, and a per-stage summary is printed.
+"""
+
+import cProfile
+import io
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from typing import ContextManager, Dict, Iterator, List, Optional, Tuple
+
+from config import PROFILE_TOP
+
+STAGES = ('fetch', 'decode', 'transform', 'write', 'cache', 'checkpoint')
+
+# Frames kept per traced allocation, enough to reach project code from inside pandas/protobuf
+TRACEBACK_FRAMES = 25
+
+_PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+_lock = threading.Lock()
+_profiler: Optional['StageProfiler'] = None
+
+
+def _format_bytes(size: float) -> str:
+    for unit in ('B', 'KB', 'MB'):
+        if abs(size) < 1024:
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+def _allocator(traceback: tracemalloc.Traceback) -> str:
+    """Names an allocation by its innermost project frame, with the allocating library line."""
+    innermost = traceback[-1]
+    location = f"{os.path.basename(innermost.filename)}:{innermost.lineno}"
+    for frame in reversed(traceback):
+        if os.path.dirname(os.path.abspath(frame.filename)) == _PROJECT_DIR:
+            origin = f"{os.path.basename(frame.filename)}:{frame.lineno}"
+            return origin if frame is innermost else f"{origin} ({location})"
+    return location
+
+
+class StageStats:
+    """Profile and memory totals of one stage of one property."""
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+        self.blocks = 0
+        self.seconds = 0.0
+        self.peak = 0
+        self.allocations: Counter = Counter()
+
+
+class StageProfiler:
+    """Run-wide collector of per-property, per-stage profiles."""
+
+    def __init__(self, output_dir: str, names: Dict[str, str]):
+        self.output_dir = os.path.join(output_dir, 'profile')
+        self._names = names
+        self._stats: Dict[Tuple[str, str], StageStats] = {}
+        # One stage block at a time, re-entrant for blocks nested on one thread
+        self._serial = threading.RLock()
+        self._local = threading.local()
+
+    def _stack(self) -> List[StageStats]:
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    @contextmanager
+    def stage(self, property_id: str, stage: str) -> Iterator[None]:
+        """Profiles a block of work as part of a property's stage."""
+        with self._serial:
+            stats = self._stats.setdefault((property_id, stage), StageStats())
+            stack = self._stack()
+            if stack:
+                # Nested block: the enclosing stage's profile pauses until it ends
+                stack[-1].profile.disable()
+            stack.append(stats)
+            # Allocations are only traced inside blocks, from the block's start,
+            # so the snapshot at its end holds exactly what it allocated and kept
+            if tracemalloc.is_tracing():
+                tracemalloc.clear_traces()
+            else:
+                tracemalloc.start(TRACEBACK_FRAMES)
+            started = time.perf_counter()
+            stats.profile.enable()
+            try:
+                yield
+            finally:
+                stats.profile.disable()
+                stats.seconds += time.perf_counter() - started
+                stats.blocks += 1
+                stats.peak = max(stats.peak, tracemalloc.get_traced_memory()[1])
+                snapshot = tracemalloc.take_snapshot().filter_traces([
+                    tracemalloc.Filter(False, __file__, all_frames=True),
+                    tracemalloc.Filter(False, tracemalloc.__file__),
+                ])
+                for statistic in snapshot.statistics('traceback'):
+                    stats.allocations[_allocator(statistic.traceback)] += statistic.size
+                stack.pop()
+                if stack:
+                    stack[-1].profile.enable()
+                else:
+                    tracemalloc.stop()
+
+    def _property_ids(self) -> List[str]:
+        return sorted({property_id for property_id, _ in self._stats})
+
+    def save(self) -> None:
+        """Writes each property's per-stage cProfile files and text report."""
+        for property_id in self._property_ids():
+            directory = os.path.join(self.output_dir, property_id.split('/')[-1])
+            os.makedirs(directory, exist_ok=True)
+            report = io.StringIO()
+            report.write(f"{self._names.get(property_id, property_id)} ({property_id})\n")
+            for stage in STAGES:
+                stats = self._stats.get((property_id, stage))
+                if stats is None:
+                    continue
+                stats.profile.dump_stats(os.path.join(directory, f"{stage}.prof"))
+                report.write(f"\n{'=' * 70}\n{stage}: {stats.blocks} block(s), {stats.seconds:.2f}s, "
+                             f"peak {_format_bytes(stats.peak)}\n{'=' * 70}\n")
+                report.write("\nTop allocators (memory held at the end of a block):\n")
+                for location, size in stats.allocations.most_common(PROFILE_TOP):
+                    report.write(f"   {_format_bytes(size):>10}  {location}\n")
+                report.write("\n")
+                pstats.Stats(stats.profile, stream=report).sort_stats('cumulative').print_stats(PROFILE_TOP)
+            with open(os.path.join(directory, 'report.txt'), 'w', encoding='utf-8') as f:
+                f.write(report.getvalue())
+
+    def print_summary(self) -> None:
+        """Prints time, peak memory and top allocators per property and stage."""
+        if not self._stats:
+            return
+        print("Profile:")
+        for property_id in self._property_ids():
+            print(f"   {self._names.get(property_id, property_id)}:")
+            for stage in STAGES:
+                stats = self._stats.get((property_id, stage))
+                if stats is None:
+                    continue
+                print(f"      {stage:<10}{stats.blocks:>6} block(s){stats.seconds:>9.2f}s"
+                      f"   peak {_format_bytes(stats.peak):>10}")
+                for location, size in stats.allocations.most_common(3):
+                    print(f"         {_format_bytes(size):>10}  {location}")
+        print(f"   Profiles and reports: {self.output_dir}")
+
+
+def start_profiler(output_dir: str, names: Dict[str, str]) -> StageProfiler:
+    """
+    Starts profiling the run's stages.
+
+    Args:
+        output_dir: The run's output directory; profiles are saved under it
+        names: Display name per property ID
+    """
+    global _profiler
+    with _lock:
+        _profiler = StageProfiler(output_dir, names)
+        return _profiler
+
+
+def get_profiler() -> Optional[StageProfiler]:
+    """Returns the run's stage profiler, or None when not running with --profile."""
+    return _profiler
+
+
+def profile_stage(property_id: str, stage: str) -> ContextManager[None]:
+    """Profiles a block as part of a property's stage (does nothing without --profile)."""
+    profiler = _profiler
+    return profiler.stage(property_id, stage) if profiler is not None else nullcontext()
+
+
+def finish_profiler() -> None:
+    """Saves the profiles and prints their summary."""
+    global _profiler
+    with _lock:
+        profiler, _profiler = _profiler, None
+    if profiler is None:
+        return
+    profiler.save()
+    profiler.print_summary()
@@ -0,0 +1,247 @@
+"""
+Per-property, quota-aware request rate limiting for the GA4 Data API.
+
+GA4 quotas are enforced per property, so each property gets its own pool of
+concurrent request slots and its own dispatch schedule. Requests against one
+property never wait on another property's traffic.
+
+Every request asks for ``return_property_quota`` and the limiter feeds the
+returned ``PropertyQuota`` back into the schedule:
+
+- Requests go out at full speed while at least half of the hourly token budget
+  is left; below that the remaining tokens are spread over the rest of the hour,
+  and dispatch stops until the window resets once hourly or daily tokens run out.
+- The concurrent-request quota caps the number of in-flight requests.
+- A ``ResourceExhausted`` error halves the property's concurrency and pauses
+  dispatch with exponential backoff; successful responses grow it back.
+"""
+
+import asyncio
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Dict, Iterator, Optional
+
+from config import (
+    MAX_CONCURRENT_REQUESTS_PER_PROPERTY,
+    MIN_REQUEST_INTERVAL_SECONDS,
+    QUOTA_RESERVE_TOKENS_PER_HOUR,
+    QUOTA_RESERVE_TOKENS_PER_DAY,
+    QUOTA_EXHAUSTED_BACKOFF_SECONDS,
+)
+
+# Cap for the ResourceExhausted backoff (GA4 hourly quotas refill within an hour)
+MAX_BACKOFF_SECONDS = 3600.0
+
+# How often a coroutine waiting for a free slot re-checks the limiter
+ASYNC_SLOT_POLL_SECONDS = 0.02
+
+
+@dataclass
+class QuotaState:
+    """Latest known quota position of a single property."""
+    tokens_per_hour: Optional[int] = None
+    hour_capacity: int = 0
+    tokens_per_day: Optional[int] = None
+    concurrent_capacity: Optional[int] = None
+    avg_request_cost: float = 0.0
+    concurrency_cap: int = MAX_CONCURRENT_REQUESTS_PER_PROPERTY
+    in_flight: int = 0
+    next_dispatch: float = 0.0
+    paused_until: float = 0.0
+    exhausted_strikes: int = 0
+
+
+def _seconds_until_next_hour(now: datetime) -> float:
+    next_hour = now.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+    return max(1.0, (next_hour - now).total_seconds())
+
+
+def _seconds_until_next_day(now: datetime) -> float:
+    next_day = now.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    return max(1.0, (next_day - now).total_seconds())
+
+
+def _paced_interval(remaining: Optional[int], capacity: int, reserve: int,
+                    avg_cost: float, window_seconds: float) -> float:
+    """
+    Seconds to wait between requests given a window's remaining tokens.
+
+    No pacing while more than half of the window's capacity is usable; below
+    that the usable tokens are spread evenly over the rest of the window.
+    """
+    if remaining is None or avg_cost <= 0:
+        return 0.0
+    usable = remaining - reserve
+    if usable < avg_cost:
+        # Out of budget for this window: wait for it to refill
+        return window_seconds
+    if capacity and usable > capacity / 2:
+        return 0.0
+    return window_seconds / (usable / avg_cost)
+
+
+class RateLimiter:
+    """
+    Thread-safe limiter that bounds in-flight requests and adapts request
+    dispatch to the quota reported by GA4, for each property independently.
+    Works from worker threads (request) and from coroutines (request_async).
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = MAX_CONCURRENT_REQUESTS_PER_PROPERTY,
+        min_interval: float = MIN_REQUEST_INTERVAL_SECONDS,
+        reserve_tokens_per_hour: int = QUOTA_RESERVE_TOKENS_PER_HOUR,
+        reserve_tokens_per_day: int = QUOTA_RESERVE_TOKENS_PER_DAY,
+        exhausted_backoff: float = QUOTA_EXHAUSTED_BACKOFF_SECONDS,
+    ):
+        self.max_concurrent = max(1, max_concurrent)
+        self.min_interval = max(0.0, min_interval)
+        self.reserve_tokens_per_hour = reserve_tokens_per_hour
+        self.reserve_tokens_per_day = reserve_tokens_per_day
+        self.exhausted_backoff = exhausted_backoff
+        self._cond = threading.Condition()
+        self._states: Dict[str, QuotaState] = {}
+
+    def _state(self, property_id: str) -> QuotaState:
+        # Caller must hold self._cond
+        if property_id not in self._states:
+            self._states[property_id] = QuotaState(concurrency_cap=self.max_concurrent)
+        return self._states[property_id]
+
+    def _concurrency_limit(self, state: QuotaState) -> int:
+        limit = min(self.max_concurrent, state.concurrency_cap)
+        if state.concurrent_capacity:
+            limit = min(limit, state.concurrent_capacity)
+        return max(1, limit)
+
+    def _interval(self, state: QuotaState) -> float:
+        now = datetime.now()
+        interval = max(
+            self.min_interval,
+            _paced_interval(state.tokens_per_hour, state.hour_capacity, self.reserve_tokens_per_hour,
+                            state.avg_request_cost, _seconds_until_next_hour(now)),
+        )
+        # Daily tokens only stop dispatch once exhausted; a nightly run may spend them freely
+        if (state.tokens_per_day is not None and state.avg_request_cost > 0
+                and state.tokens_per_day - self.reserve_tokens_per_day < state.avg_request_cost):
+            interval = max(interval, _seconds_until_next_day(now))
+        return interval
+
+    def _try_acquire(self, property_id: str) -> Optional[float]:
+        """
+        Takes a concurrent slot and reserves a dispatch time if a slot is free.
+        Returns seconds to wait before sending, or None if no slot is available.
+        Caller must hold self._cond.
+        """
+        state = self._state(property_id)
+        if state.in_flight >= self._concurrency_limit(state):
+            return None
+        state.in_flight += 1
+        now = time.monotonic()
+        dispatch_at = max(now, state.next_dispatch, state.paused_until)
+        state.next_dispatch = dispatch_at + self._interval(state)
+        return dispatch_at - now
+
+    def acquire(self, property_id: str) -> None:
+        """Blocks until a request against the property may be sent."""
+        with self._cond:
+            delay = self._try_acquire(property_id)
+            while delay is None:
+                self._cond.wait()
+                delay = self._try_acquire(property_id)
+        if delay > 0:
+            time.sleep(delay)
+
+    def release(self, property_id: str) -> None:
+        """Frees the concurrent request slot taken by acquire()."""
+        with self._cond:
+            state = self._state(property_id)
+            state.in_flight = max(0, state.in_flight - 1)
+            self._cond.notify_all()
+
+    @contextmanager
+    def request(self, property_id: str) -> Iterator[None]:
+        """Context manager wrapping a single API request."""
+        self.acquire(property_id)
+        try:
+            yield
+        finally:
+            self.release(property_id)
+
+    async def acquire_async(self, property_id: str) -> None:
+        """Waits without blocking the event loop until a request may be sent."""
+        while True:
+            with self._cond:
+                delay = self._try_acquire(property_id)
+            if delay is not None:
+                break
+            await asyncio.sleep(ASYNC_SLOT_POLL_SECONDS)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    @asynccontextmanager
+    async def request_async(self, property_id: str) -> AsyncIterator[None]:
+        """Async context manager wrapping a single API request."""
+        await self.acquire_async(property_id)
+        try:
+            yield
+        finally:
+            self.release(property_id)
+
+    def record_quota(self, property_id: str, property_quota: Any) -> None:
+        """
+        Updates the property's schedule from a response's ``property_quota``.
+
+        Args:
+            property_id: GA4 property ID the response belongs to
+            property_quota: PropertyQuota message (may be empty if not requested)
+        """
+        if not property_quota:
+            return
+        with self._cond:
+            state = self._state(property_id)
+            hourly = property_quota.tokens_per_hour
+            daily = property_quota.tokens_per_day
+            concurrent = property_quota.concurrent_requests
+            if hourly:
+                state.tokens_per_hour = hourly.remaining
+                state.hour_capacity = max(state.hour_capacity, hourly.remaining + hourly.consumed)
+                cost = float(hourly.consumed)
+                state.avg_request_cost = cost if not state.avg_request_cost else (
+                    0.8 * state.avg_request_cost + 0.2 * cost
+                )
+            if daily:
+                state.tokens_per_day = daily.remaining
+            if concurrent and (concurrent.consumed or concurrent.remaining):
+                # `remaining` is what was left while this property's other requests were in
+                # flight too (this one's slot is already released), so they count as capacity
+                state.concurrent_capacity = concurrent.consumed + concurrent.remaining + state.in_flight
+            # Additive increase after a successful request
+            state.exhausted_strikes = 0
+            if state.concurrency_cap < self.max_concurrent:
+                state.concurrency_cap += 1
+            self._cond.notify_all()
+
+    def record_exhausted(self, property_id: str) -> float:
+        """
+        Slows a property down after a ``ResourceExhausted`` error.
+
+        Returns:
+            Seconds until the property's dispatch resumes
+        """
+        with self._cond:
+            state = self._state(property_id)
+            state.exhausted_strikes += 1
+            state.concurrency_cap = max(1, state.concurrency_cap // 2)
+            backoff = min(MAX_BACKOFF_SECONDS, self.exhausted_backoff * (2 ** (state.exhausted_strikes - 1)))
+            state.paused_until = max(state.paused_until, time.monotonic() + backoff)
+            return backoff
+
+    def snapshot(self, property_id: str) -> QuotaState:
+        """Returns a copy of the property's current quota state."""
+        with self._cond:
+            return QuotaState(**vars(self._state(property_id)))
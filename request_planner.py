@@ -0,0 +1,424 @@
+"""
+Request planning for GA4 report extraction.
+
+Turns the configured DATE_RANGES into the list of request windows sent for a
+property:
+
+1. Ranges are resolved to calendar dates and overlapping or adjacent ranges
+   are merged, so no day is fetched twice.
+2. Two cheap probes per merged range estimate each day's row count: a
+   limit=1 request of the full report returns the range's total row_count,
+   and a date-only request returns every day's PROBE_METRIC total. The row
+   count is spread over the days in proportion to that total, and days the
+   date-only request has no row for are empty.
+3. Consecutive non-empty days are grouped into windows of about
+   WINDOW_TARGET_ROWS estimated rows; empty days are skipped entirely. A
+   window estimated above PAGE_SIZE rows that still fits in one page of up to
+   MAX_PAGE_SIZE rows is fetched as that single page, saving the follow-up
+   request for its last few rows.
+4. Single days expected to exceed MAX_ROWS_PER_WINDOW are split into one
+   window per value of SPLIT_DIMENSION, plus a window for all other values,
+   so every row is covered by exactly one window.
+
+Estimates already known for a day (recorded by an earlier run, see
+manifest.py) are used instead of probing; a range is only probed when one of
+its days is unknown.
+
+Relative dates ('today', 'yesterday', 'NdaysAgo') are resolved against the
+local calendar date, which can differ from the property's time zone around
+midnight.
+"""
+
+import asyncio
+import re
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, replace
+from datetime import date, datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from google.analytics.data_v1beta.types import (
+    DateRange,
+    Dimension,
+    Filter,
+    FilterExpression,
+    Metric,
+    RunReportRequest,
+)
+
+from config import (
+    MAX_CONCURRENT_REQUESTS_PER_PROPERTY,
+    MAX_PAGE_SIZE,
+    MAX_ROWS_PER_WINDOW,
+    PAGE_SIZE,
+    SPLIT_DIMENSION,
+    WINDOW_TARGET_ROWS,
+)
+
+_DAYS_AGO = re.compile(r'^(\d+)daysAgo$')
+
+# Metric of the date-only probe; each day's share of it apportions the full
+# report's row count between days
+PROBE_METRIC = 'eventCount'
+
+# Room left in a window's own page size above its estimate, which is
+# apportioned from the probes rather than counted
+PAGE_SIZE_HEADROOM = 1.1
+
+
+@dataclass(frozen=True)
+class ReportWindow:
+    """
+    A single report request scope: a date span, optionally restricted to one
+    split value, or (split_value None) to every split value not in excluded_values.
+    page_size overrides the configured rows per page for this window.
+    """
+    start_date: str
+    end_date: str
+    split_dimension: Optional[str] = None
+    split_value: Optional[str] = None
+    excluded_values: Tuple[str, ...] = ()
+    page_size: Optional[int] = None
+
+    @property
+    def label(self) -> str:
+        span = self.start_date if self.start_date == self.end_date else f"{self.start_date} to {self.end_date}"
+        if self.split_dimension:
+            value = self.split_value if self.split_value is not None else '(other)'
+            return f"{span} [{self.split_dimension}={value}]"
+        return span
+
+    def date_range(self) -> DateRange:
+        return DateRange(start_date=self.start_date, end_date=self.end_date)
+
+    def page_limit(self, default: int) -> int:
+        """Rows per page to request for this window."""
+        return self.page_size or default
+
+    def dimension_filter(self) -> Optional[FilterExpression]:
+        if not self.split_dimension:
+            return None
+        if self.split_value is None:
+            return FilterExpression(not_expression=FilterExpression(filter=Filter(
+                field_name=self.split_dimension,
+                in_list_filter=Filter.InListFilter(values=list(self.excluded_values)),
+            )))
+        return FilterExpression(filter=Filter(
+            field_name=self.split_dimension,
+            string_filter=Filter.StringFilter(value=self.split_value, match_type=Filter.StringFilter.MatchType.EXACT),
+        ))
+
+
+def resolve_date(value: str, today: Optional[date] = None) -> date:
+    """
+    Resolves a GA4 date string ('today', 'yesterday', 'NdaysAgo', 'YYYY-MM-DD').
+
+    Raises:
+        ValueError: If the value is not a recognised date format
+    """
+    today = today or date.today()
+    if value == 'today':
+        return today
+    if value == 'yesterday':
+        return today - timedelta(days=1)
+    match = _DAYS_AGO.match(value)
+    if match:
+        return today - timedelta(days=int(match.group(1)))
+    return date.fromisoformat(value)
+
+
+def merge_date_ranges(date_ranges: List[Dict[str, str]], today: Optional[date] = None) -> List[Tuple[date, date]]:
+    """
+    Resolves configured date ranges and merges overlapping or adjacent ones.
+
+    Args:
+        date_ranges: Ranges in config.DATE_RANGES format ({'startDate': ..., 'endDate': ...})
+        today: Reference date for relative dates (defaults to the local date)
+
+    Returns:
+        Sorted, non-overlapping (start, end) date pairs
+    """
+    resolved = sorted(
+        (resolve_date(dr['startDate'], today), resolve_date(dr['endDate'], today))
+        for dr in date_ranges
+    )
+    merged: List[Tuple[date, date]] = []
+    for start, end in resolved:
+        if end < start:
+            continue
+        if merged and start <= merged[-1][1] + timedelta(days=1):
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def estimate_day_rows(start: date, end: date, total_rows: int, day_totals: Any) -> Dict[date, int]:
+    """
+    Spreads a range's total row count over its days.
+
+    Args:
+        start: First day of the range
+        end: Last day of the range
+        total_rows: row_count of the full report over the range
+        day_totals: Response of the range's date-only probe
+
+    Returns:
+        Estimated rows per day of the range, 0 for days without data
+    """
+    totals: Dict[date, float] = {}
+    for row in day_totals.rows:
+        day = datetime.strptime(row.dimension_values[0].value, '%Y%m%d').date()
+        totals[day] = totals.get(day, 0.0) + float(row.metric_values[0].value or 0)
+    grand_total = sum(totals.values())
+
+    days = _range_days(start, end)
+    if not grand_total:
+        # Nothing to apportion by: assume every day has data, evenly spread
+        return {day: max(1, total_rows // len(days)) for day in days}
+    return {
+        day: max(1, round(total_rows * totals[day] / grand_total)) if day in totals else 0
+        for day in days
+    }
+
+
+def coalesce_days(day_rows: Dict[date, int], target_rows: int) -> List[Tuple[ReportWindow, int]]:
+    """
+    Groups consecutive non-empty days into windows of about target_rows estimated rows.
+
+    Returns:
+        (window, estimated rows) pairs in date order; a day reaching target_rows
+        on its own gets a single-day window and empty days get none
+    """
+    windows: List[Tuple[ReportWindow, int]] = []
+    first: Optional[date] = None
+    last: Optional[date] = None
+    rows = 0
+    for day in sorted(day_rows):
+        day_count = day_rows[day]
+        if not day_count:
+            continue
+        if last is not None and day == last + timedelta(days=1) and rows + day_count <= target_rows:
+            last = day
+            rows += day_count
+            continue
+        if first is not None:
+            windows.append((ReportWindow(first.isoformat(), last.isoformat()), rows))
+        first = last = day
+        rows = day_count
+    if first is not None:
+        windows.append((ReportWindow(first.isoformat(), last.isoformat()), rows))
+    return windows
+
+
+def size_pages(windows: List[Tuple[ReportWindow, int]], page_size: int = PAGE_SIZE) -> List[Tuple[ReportWindow, int]]:
+    """
+    Gives each window estimated above page_size rows, but within one page of
+    MAX_PAGE_SIZE rows (with PAGE_SIZE_HEADROOM), its own page size, so it is
+    fetched in one request instead of a page and a short follow-up. Larger
+    windows keep page_size, which bounds the memory a page takes.
+
+    Returns:
+        (window, estimated rows) pairs in the same order
+    """
+    sized = []
+    for window, rows in windows:
+        limit = int(rows * PAGE_SIZE_HEADROOM)
+        if rows > page_size and limit <= MAX_PAGE_SIZE:
+            window = replace(window, page_size=limit)
+        sized.append((window, rows))
+    return sized
+
+
+def _range_days(start: date, end: date) -> List[date]:
+    return [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+
+
+def _probe_request(property_id: str, window: ReportWindow, dimensions: List[Dimension],
+                   metrics: List[Metric]) -> RunReportRequest:
+    return RunReportRequest(
+        property=property_id,
+        date_ranges=[window.date_range()],
+        dimensions=dimensions,
+        metrics=metrics,
+        limit=1,
+    )
+
+
+def _day_totals_request(property_id: str, start: date, end: date) -> RunReportRequest:
+    """Date-only probe: one row per day with data, carrying the day's PROBE_METRIC total."""
+    return RunReportRequest(
+        property=property_id,
+        date_ranges=[DateRange(start_date=start.isoformat(), end_date=end.isoformat())],
+        dimensions=[Dimension(name='date')],
+        metrics=[Metric(name=PROBE_METRIC)],
+    )
+
+
+def _split_request(property_id: str, window: ReportWindow, metrics: List[Metric]) -> RunReportRequest:
+    """Lists the SPLIT_DIMENSION values seen in a window."""
+    return RunReportRequest(
+        property=property_id,
+        date_ranges=[window.date_range()],
+        dimensions=[Dimension(name=SPLIT_DIMENSION)],
+        metrics=metrics[:1],
+        # Values whose first metric is zero still have rows in the report
+        keep_empty_rows=True,
+    )
+
+
+def _split_windows(window: ReportWindow, response: Any) -> List[ReportWindow]:
+    """
+    Splits a single-day window into one window per SPLIT_DIMENSION value in the
+    response, and one for the values the response did not list.
+    """
+    values = [row.dimension_values[0].value for row in response.rows]
+    if len(values) < 2:
+        return [window]
+    return [
+        ReportWindow(window.start_date, window.end_date, SPLIT_DIMENSION, value)
+        for value in values
+    ] + [ReportWindow(window.start_date, window.end_date, SPLIT_DIMENSION, excluded_values=tuple(values))]
+
+
+def _log_plan(name: str, start: date, end: date, day_rows: Dict[date, int], windows: List[ReportWindow],
+              recorded: bool) -> None:
+    whole = ReportWindow(start.isoformat(), end.isoformat())
+    total_rows = sum(day_rows.get(day, 0) for day in _range_days(start, end))
+    if not total_rows:
+        print(f"   [{name}] Plan: {whole.label} has no data, skipping")
+        return
+    empty_days = sum(1 for day in _range_days(start, end) if not day_rows.get(day))
+    details = [f"{empty_days} empty day(s) skipped"] if empty_days else []
+    if recorded:
+        details.append("recorded estimates")
+    suffix = f" ({', '.join(details)})" if details else ""
+    print(f"   [{name}] Plan: {whole.label} ~{total_rows:,} rows -> {len(windows)} window(s){suffix}")
+
+
+def plan_report_windows(
+    date_ranges: List[Dict[str, str]],
+    property_id: str,
+    dimensions: List[Dimension],
+    metrics: List[Metric],
+    run_report: Callable[[RunReportRequest], Any],
+    name: str,
+    known_day_rows: Optional[Dict[date, int]] = None,
+) -> Tuple[List[ReportWindow], Dict[date, int]]:
+    """
+    Plans the request windows for one property.
+
+    Args:
+        date_ranges: Ranges in config.DATE_RANGES format
+        property_id: GA4 property ID (e.g., 'properties/123456789')
+        dimensions: Dimensions of the full report
+        metrics: Metrics of the full report
+        run_report: Sends one RunReportRequest (through the property's rate limiter)
+        name: Property name for progress output
+        known_day_rows: Estimated rows of days that need no probe
+
+    Returns:
+        Tuple of (request windows in date order, estimated rows of every
+        newly probed day)
+    """
+    try:
+        merged = merge_date_ranges(date_ranges)
+    except ValueError:
+        # Unrecognised date format: let the API interpret the ranges as-is
+        return [ReportWindow(dr['startDate'], dr['endDate']) for dr in date_ranges], {}
+    known_day_rows = known_day_rows or {}
+
+    def probe(start: date, end: date) -> Dict[date, int]:
+        total_rows = run_report(_probe_request(
+            property_id, ReportWindow(start.isoformat(), end.isoformat()), dimensions, metrics
+        )).row_count
+        if not total_rows:
+            return {day: 0 for day in _range_days(start, end)}
+        return estimate_day_rows(start, end, total_rows, run_report(_day_totals_request(property_id, start, end)))
+
+    windows: List[ReportWindow] = []
+    probed: Dict[date, int] = {}
+    for start, end in merged:
+        recorded = all(day in known_day_rows for day in _range_days(start, end))
+        if recorded:
+            day_rows = known_day_rows
+        else:
+            day_rows = probe(start, end)
+            probed.update(day_rows)
+
+        range_windows = size_pages(
+            coalesce_days({day: day_rows[day] for day in _range_days(start, end)}, WINDOW_TARGET_ROWS)
+        )
+        oversized = [window for window, rows in range_windows if rows > MAX_ROWS_PER_WINDOW]
+        splits: Dict[ReportWindow, List[ReportWindow]] = {}
+        if oversized:
+            # Days over the per-window row cap: one request per SPLIT_DIMENSION value
+            with ThreadPoolExecutor(max_workers=min(len(oversized), MAX_CONCURRENT_REQUESTS_PER_PROPERTY)) as pool:
+                parts = pool.map(
+                    lambda window: _split_windows(window, run_report(_split_request(property_id, window, metrics))),
+                    oversized,
+                )
+                splits = dict(zip(oversized, parts))
+        planned = [part for window, _ in range_windows for part in splits.get(window, [window])]
+
+        _log_plan(name, start, end, day_rows, planned, recorded)
+        windows.extend(planned)
+    return windows, probed
+
+
+async def plan_report_windows_async(
+    date_ranges: List[Dict[str, str]],
+    property_id: str,
+    dimensions: List[Dimension],
+    metrics: List[Metric],
+    run_report: Callable[[RunReportRequest], Awaitable[Any]],
+    name: str,
+    known_day_rows: Optional[Dict[date, int]] = None,
+) -> Tuple[List[ReportWindow], Dict[date, int]]:
+    """
+    Coroutine version of plan_report_windows; run_report is awaited, and the
+    probes of each range and the splits of oversized days run concurrently.
+    """
+    try:
+        merged = merge_date_ranges(date_ranges)
+    except ValueError:
+        return [ReportWindow(dr['startDate'], dr['endDate']) for dr in date_ranges], {}
+    known_day_rows = known_day_rows or {}
+
+    async def probe(start: date, end: date) -> Dict[date, int]:
+        total, day_totals = await asyncio.gather(
+            run_report(_probe_request(property_id, ReportWindow(start.isoformat(), end.isoformat()), dimensions, metrics)),
+            run_report(_day_totals_request(property_id, start, end)),
+        )
+        if not total.row_count:
+            return {day: 0 for day in _range_days(start, end)}
+        return estimate_day_rows(start, end, total.row_count, day_totals)
+
+    async def split(window: ReportWindow) -> List[ReportWindow]:
+        return _split_windows(window, await run_report(_split_request(property_id, window, metrics)))
+
+    windows: List[ReportWindow] = []
+    probed: Dict[date, int] = {}
+    for start, end in merged:
+        recorded = all(day in known_day_rows for day in _range_days(start, end))
+        if recorded:
+            day_rows = known_day_rows
+        else:
+            day_rows = await probe(start, end)
+            probed.update(day_rows)
+
+        range_windows = size_pages(
+            coalesce_days({day: day_rows[day] for day in _range_days(start, end)}, WINDOW_TARGET_ROWS)
+        )
+        parts = await asyncio.gather(*(
+            split(window) if rows > MAX_ROWS_PER_WINDOW else _as_list(window)
+            for window, rows in range_windows
+        ))
+        planned = [part for part_windows in parts for part in part_windows]
+
+        _log_plan(name, start, end, day_rows, planned, recorded)
+        windows.extend(planned)
+    return windows, probed
+
+
+async def _as_list(window: ReportWindow) -> List[ReportWindow]:
+    return [window]
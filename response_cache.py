@@ -0,0 +1,181 @@
+"""
+Content-addressed on-disk cache of GA4 report responses.
+
+Responses are stored under a hash of the full serialized RunReportRequest, so
+re-runs, restarted backfills and changes to the decoding code replay them
+without spending API quota.
+
+- Requests whose dates all lie before the freshness horizon
+  (RESPONSE_CACHE_FRESHNESS_DAYS) are treated as immutable: GA4 has finished
+  processing those days and their responses never expire.
+- Requests touching more recent days are reused for RESPONSE_CACHE_TTL_SECONDS.
+- Requests with relative dates ('yesterday', 'NdaysAgo') are never cached,
+  since the same request means different days on different runs.
+- The cache is bounded by RESPONSE_CACHE_MAX_MB; least recently used entries
+  are evicted first.
+
+File modification time is the time an entry was stored (for the TTL); access
+time is set explicitly on every hit (for LRU order).
+"""
+
+import copy
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from typing import List, Optional, Tuple
+
+from google.analytics.data_v1beta.types import RunReportRequest, RunReportResponse
+
+from config import (
+    RESPONSE_CACHE_DIR,
+    RESPONSE_CACHE_ENABLED,
+    RESPONSE_CACHE_FRESHNESS_DAYS,
+    RESPONSE_CACHE_MAX_MB,
+    RESPONSE_CACHE_TTL_SECONDS,
+)
+from profiling import profile_stage
+
+# Eviction trims the cache to this fraction of its size limit
+EVICTION_TARGET_RATIO = 0.9
+
+_lock = threading.Lock()
+_cache: Optional['ResponseCache'] = None
+
+
+def _request_end_date(request: RunReportRequest) -> Optional[date]:
+    """Latest end date of the request's date ranges, or None if any date is not YYYY-MM-DD."""
+    try:
+        return max(date.fromisoformat(date_range.end_date) for date_range in request.date_ranges)
+    except ValueError:
+        return None
+
+
+class ResponseCache:
+    """Thread-safe LRU cache of serialized RunReportResponses in a directory."""
+
+    def __init__(
+        self,
+        directory: str = RESPONSE_CACHE_DIR,
+        max_bytes: int = int(RESPONSE_CACHE_MAX_MB * 1024 * 1024),
+        freshness_days: int = RESPONSE_CACHE_FRESHNESS_DAYS,
+        ttl_seconds: float = RESPONSE_CACHE_TTL_SECONDS,
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.freshness_days = freshness_days
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._size = sum(size for _, _, size in self._entries())
+
+    def _entries(self) -> List[Tuple[float, str, int]]:
+        """(access time, path, size) of every cached response."""
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for filename in files:
+                if not filename.endswith('.pb'):
+                    continue
+                path = os.path.join(root, filename)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_atime, path, stat.st_size))
+        return entries
+
+    def key(self, request: RunReportRequest) -> str:
+        """Hash of the request, ignoring return_property_quota (it does not change the rows)."""
+        pb = copy.deepcopy(RunReportRequest.pb(request))
+        pb.return_property_quota = False
+        return hashlib.sha256(pb.SerializeToString(deterministic=True)).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.pb")
+
+    def _max_age(self, request: RunReportRequest) -> Optional[float]:
+        """Seconds an entry stays valid (inf when immutable), or None if the request is not cacheable."""
+        end_date = _request_end_date(request)
+        if end_date is None:
+            return None
+        if end_date <= date.today() - timedelta(days=self.freshness_days):
+            return float('inf')
+        return self.ttl_seconds
+
+    def get(self, request: RunReportRequest) -> Optional[RunReportResponse]:
+        """Returns the cached response for a request, or None on a miss."""
+        with profile_stage(request.property, 'cache'):
+            max_age = self._max_age(request)
+            if max_age is None:
+                return None
+            path = self._path(self.key(request))
+            try:
+                stat = os.stat(path)
+                if time.time() - stat.st_mtime > max_age:
+                    return None
+                with open(path, 'rb') as f:
+                    data = f.read()
+                os.utime(path, (time.time(), stat.st_mtime))
+            except OSError:
+                return None
+            return RunReportResponse.deserialize(data)
+
+    def put(self, request: RunReportRequest, response: RunReportResponse) -> None:
+        """Stores a response; its property_quota is dropped since it is only valid once."""
+        with profile_stage(request.property, 'cache'):
+            if self._max_age(request) is None:
+                return
+            pb = RunReportResponse.pb(response)
+            quota = None
+            if pb.HasField('property_quota'):
+                quota = copy.deepcopy(pb.property_quota)
+                pb.ClearField('property_quota')
+            try:
+                data = pb.SerializeToString()
+            finally:
+                if quota is not None:
+                    pb.property_quota.CopyFrom(quota)
+
+            path = self._path(self.key(request))
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                previous = os.path.getsize(path) if os.path.exists(path) else 0
+                fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            except OSError:
+                # The cache is an optimization only; a full disk must not break extraction
+                return
+
+            with self._lock:
+                self._size += len(data) - previous
+                if self._size > self.max_bytes:
+                    self._evict()
+
+    def _evict(self) -> None:
+        """Deletes least recently used entries until under the target size. Caller holds self._lock."""
+        target = self.max_bytes * EVICTION_TARGET_RATIO
+        entries = sorted(self._entries())
+        self._size = sum(size for _, _, size in entries)
+        for _, path, size in entries:
+            if self._size <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self._size -= size
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """Returns the process-wide response cache, or None if caching is disabled."""
+    global _cache
+    if not RESPONSE_CACHE_ENABLED:
+        return None
+    with _lock:
+        if _cache is None:
+            _cache = ResponseCache()
+        return _cache
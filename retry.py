@@ -0,0 +1,152 @@
+"""
+Retries for GA4 Data API calls.
+
+Errors are classified as retryable (transient server, network and quota
+errors) or fatal (bad requests, missing permissions, ...). Retryable errors are
+retried with exponential backoff and full jitter until one of these limits is
+reached:
+
+- RETRY_MAX_ATTEMPTS attempts for a single request,
+- RETRY_DEADLINE_SECONDS since the request's first attempt,
+- the run-wide RETRY_BUDGET of retries shared by every request, so a broken
+  network fails the run quickly instead of retrying every page.
+
+``ResourceExhausted`` is retried too. The caller has already told the rate
+limiter, which holds the property's requests until its quota pause ends, so
+the retry waits for the quota reset rather than a fixed delay.
+
+Each attempt is bounded by REQUEST_TIMEOUT_SECONDS (passed to the client as
+the gRPC timeout by the callers).
+"""
+
+import asyncio
+import random
+import threading
+import time
+from typing import Awaitable, Callable, Optional, Tuple, Type, TypeVar
+
+from google.api_core import exceptions
+
+from config import (
+    RETRY_BASE_DELAY_SECONDS,
+    RETRY_BUDGET,
+    RETRY_DEADLINE_SECONDS,
+    RETRY_MAX_ATTEMPTS,
+    RETRY_MAX_DELAY_SECONDS,
+)
+
+T = TypeVar('T')
+
+RETRYABLE_ERRORS: Tuple[Type[Exception], ...] = (
+    exceptions.ServiceUnavailable,
+    exceptions.DeadlineExceeded,
+    exceptions.ResourceExhausted,
+    exceptions.InternalServerError,
+    exceptions.BadGateway,
+    exceptions.GatewayTimeout,
+    exceptions.Aborted,
+    exceptions.Unknown,
+    ConnectionError,
+    TimeoutError,
+)
+
+_lock = threading.Lock()
+_policy: Optional['RetryPolicy'] = None
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Whether an API error is transient (retryable) rather than fatal."""
+    return isinstance(error, RETRYABLE_ERRORS)
+
+
+class RetryPolicy:
+    """Thread-safe retry policy with a retry budget shared by all requests of a run."""
+
+    def __init__(
+        self,
+        max_attempts: int = RETRY_MAX_ATTEMPTS,
+        base_delay: float = RETRY_BASE_DELAY_SECONDS,
+        max_delay: float = RETRY_MAX_DELAY_SECONDS,
+        deadline: float = RETRY_DEADLINE_SECONDS,
+        budget: int = RETRY_BUDGET,
+    ):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.budget = budget
+        self.retries = 0
+        self._lock = threading.Lock()
+
+    def _take_retry(self) -> bool:
+        with self._lock:
+            if self.retries >= self.budget:
+                return False
+            self.retries += 1
+            return True
+
+    def _next_delay(self, error: BaseException, attempt: int, started: float, label: str) -> Optional[float]:
+        """
+        Seconds to wait before retrying after `attempt` failed with `error`,
+        or None if the error must be raised.
+        """
+        if not is_retryable(error) or attempt >= self.max_attempts:
+            return None
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+        if time.monotonic() - started + delay > self.deadline:
+            return None
+        if not self._take_retry():
+            print(f"   [RETRY] Retry budget of {self.budget} exhausted, giving up on {label}")
+            return None
+        print(f"   [RETRY] {label}: {type(error).__name__} (attempt {attempt}/{self.max_attempts}), "
+              f"retrying in {delay:.1f}s")
+        return delay
+
+    def call(self, func: Callable[[], T], label: str) -> T:
+        """
+        Calls `func` until it succeeds or the error is fatal or out of retries.
+
+        Args:
+            func: Sends one request; re-invoked on every attempt
+            label: Request description for log output (e.g. the property ID)
+
+        Returns:
+            The result of the first successful call
+
+        Raises:
+            The last error if it is fatal or no retry is left
+        """
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                return func()
+            except Exception as e:
+                delay = self._next_delay(e, attempt, started, label)
+                if delay is None:
+                    raise
+            time.sleep(delay)
+
+    async def call_async(self, func: Callable[[], Awaitable[T]], label: str) -> T:
+        """Coroutine version of call(); `func` returns a new awaitable per attempt."""
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                return await func()
+            except Exception as e:
+                delay = self._next_delay(e, attempt, started, label)
+                if delay is None:
+                    raise
+            await asyncio.sleep(delay)
+
+
+def get_retry_policy() -> RetryPolicy:
+    """Returns the process-wide retry policy (one retry budget per run)."""
+    global _policy
+    with _lock:
+        if _policy is None:
+            _policy = RetryPolicy()
+        return _policy
@@ -0,0 +1,106 @@
+"""
+Longest-job-first ordering of properties.
+
+Property sizes differ by orders of magnitude. Started in properties.py order,
+one large property near the end of the list keeps a single worker busy long
+after the others have finished. The scheduler instead estimates every
+property's duration from the manifest and starts the longest first, so small
+properties fill the remaining workers at the end of the run (LPT scheduling):
+
+- rows: the pending days' row counts from earlier extractions or probes,
+  with days never seen counted at the property's average,
+- seconds per row: from the property's last SCHEDULER_HISTORY_RUNS runs,
+  or the median rate of all properties for properties without runs.
+
+Properties without any history are started first, since they may be the
+largest. Each property is still extracted as one unit: its days are
+already fetched concurrently within the property's own request limits.
+"""
+
+import statistics
+from datetime import date
+from typing import Dict, List, Optional
+
+from config import SCHEDULER_HISTORY_RUNS, SCHEDULING
+from manifest import Manifest
+
+
+def _format_seconds(seconds: float) -> str:
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    return f"{minutes}m {seconds:02d}s" if minutes else f"{seconds}s"
+
+
+def estimate_rows(manifest: Manifest, property_id: str, report_spec: str, days: List[date]) -> Optional[int]:
+    """Expected rows of a property's pending days, or None if none of its days was ever seen."""
+    known = manifest.day_row_counts(property_id, report_spec)
+    if not known:
+        return None
+    average = sum(known.values()) / len(known)
+    return int(sum(known.get(day, average) for day in days))
+
+
+def schedule_properties(
+    properties: Dict[str, Dict[str, str]],
+    manifest: Manifest,
+    report_spec: str,
+    pending_days: Dict[str, Optional[List[date]]],
+) -> Dict[str, Dict[str, str]]:
+    """
+    Orders properties by estimated extraction time, longest first.
+
+    Args:
+        properties: Properties in configuration order
+        manifest: Extraction manifest with past runs, row counts and probes
+        report_spec: Identifier of the report being extracted
+        pending_days: Days each property still needs (None if unknown)
+
+    Returns:
+        The same properties in start order
+    """
+    if SCHEDULING != 'longest-first' or len(properties) < 2:
+        return properties
+
+    history = manifest.run_history(report_spec, SCHEDULER_HISTORY_RUNS)
+    rates = {}
+    for property_id, runs in history.items():
+        rows = sum(row_count for _, row_count, _ in runs)
+        if rows:
+            rates[property_id] = sum(seconds for _, _, seconds in runs) / rows
+    default_rate = statistics.median(rates.values()) if rates else None
+
+    estimates: Dict[str, Optional[float]] = {}
+    for property_id in properties:
+        days = pending_days.get(property_id)
+        if days is None:
+            estimates[property_id] = None
+            continue
+        rows = estimate_rows(manifest, property_id, report_spec, days) if days else 0
+        runs = history.get(property_id)
+        rate = rates.get(property_id, default_rate)
+        if rows is not None and rate is not None:
+            estimates[property_id] = rows * rate
+        elif runs:
+            # Only empty runs so far: assume the same time per day
+            seconds_per_day = sum(s for _, _, s in runs) / max(1, sum(d for d, _, _ in runs))
+            estimates[property_id] = seconds_per_day * len(days)
+        else:
+            estimates[property_id] = None
+
+    unknown = [property_id for property_id, seconds in estimates.items() if seconds is None]
+    known = sorted(
+        (property_id for property_id, seconds in estimates.items() if seconds is not None),
+        key=lambda property_id: estimates[property_id],
+        reverse=True,
+    )
+    if not any(estimates[property_id] for property_id in known):
+        # Nothing pending anywhere (or no usable history): keep configuration order
+        return properties
+
+    print(f"Schedule: longest first ({len(known)} estimated from past runs, "
+          f"{len(unknown)} without history started first)")
+    for property_id in known[:5]:
+        print(f"   {properties[property_id]['name']}: ~{_format_seconds(estimates[property_id])}")
+    if len(known) > 5:
+        print(f"   ... and {len(known) - 5} more")
+    print()
+    return {property_id: properties[property_id] for property_id in unknown + known}
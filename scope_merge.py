@@ -0,0 +1,97 @@
+"""
+Merging of the scope-separated GA4 queries.
+
+Session- and user-scoped metrics (Sessions, Active users, ...) are only
+correct at session grain: adding eventName or fullPageUrl to the query
+repeats a session's counts on every event row. Each property is therefore
+extracted with two queries over the same request windows:
+
+- a session-grain query (session dimensions, session/user metrics), which is
+  much smaller, and
+- an event-grain query (all dimensions, event metrics such as Views and
+  Total revenue).
+
+The session-grain rows are indexed by their key columns once; event-grain
+chunks are then streamed through the index. A session key's metrics are put
+on the first event-grain row with that key (zero on the others), so column
+totals equal the session-grain totals. Session keys with no event-grain row
+are emitted at the end with empty event dimensions.
+
+Lookups are hash-based (pandas MultiIndex over the categorical key columns),
+so merge time is linear in the number of rows.
+"""
+
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+
+class SessionGrainIndex:
+    """Session-grain rows of one property, indexed by their key columns."""
+
+    def __init__(self, sessions: pd.DataFrame, key_columns: List[str], metric_columns: List[str]):
+        """
+        Args:
+            sessions: Decoded session-grain rows with the final output columns
+            key_columns: Output columns identifying a session-grain row
+            metric_columns: Session-scoped metric columns to carry over
+        """
+        self.key_columns = list(key_columns)
+        self.metric_columns = list(metric_columns)
+        if not sessions.empty:
+            sessions = self._unique_keys(sessions)
+        self._sessions = sessions.reset_index(drop=True)
+        self._keys = pd.MultiIndex.from_frame(self._sessions[self.key_columns]) if not sessions.empty else None
+        self._metrics: Dict[str, np.ndarray] = {
+            col: self._sessions[col].to_numpy() for col in self.metric_columns if col in self._sessions
+        }
+        self._matched = np.zeros(len(self._sessions), dtype=bool)
+
+    def _unique_keys(self, sessions: pd.DataFrame) -> pd.DataFrame:
+        """Sums the metrics of repeated keys (GA4 returns each key once, so this is a safeguard)."""
+        if not sessions.duplicated(self.key_columns).any():
+            return sessions
+        aggregations = {
+            col: 'sum' if col in self.metric_columns else 'first'
+            for col in sessions.columns if col not in self.key_columns
+        }
+        merged = sessions.groupby(self.key_columns, observed=True, sort=False, as_index=False).agg(aggregations)
+        return merged[sessions.columns]
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def merge(self, chunk: pd.DataFrame) -> pd.DataFrame:
+        """
+        Puts session metrics on an event-grain chunk, in place.
+
+        Each session key's metrics go to its first event-grain row across all
+        chunks merged so far; every other row gets zero.
+
+        Returns:
+            The chunk with its session metric columns filled
+        """
+        if chunk.empty:
+            return chunk
+        if self._keys is None:
+            positions = np.full(len(chunk), -1, dtype=np.intp)
+        else:
+            positions = self._keys.get_indexer(pd.MultiIndex.from_frame(chunk[self.key_columns]))
+
+        # First row of each key in this chunk whose key was not matched by an earlier chunk
+        first = (positions >= 0) & ~pd.Series(positions).duplicated().to_numpy()
+        rows = np.flatnonzero(first)
+        rows = rows[~self._matched[positions[rows]]]
+        sources = positions[rows]
+        self._matched[sources] = True
+
+        for col, values in self._metrics.items():
+            merged = np.zeros(len(chunk), dtype=values.dtype)
+            merged[rows] = values[sources]
+            chunk[col] = merged
+        return chunk
+
+    def unmatched(self) -> pd.DataFrame:
+        """Session-grain rows whose key no event-grain row had, in output format."""
+        return self._sessions[~self._matched].reset_index(drop=True)
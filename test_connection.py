@@ -7,12 +7,12 @@ and that you have access to the configured GA4 properties.
 
 import sys
 import os
-from google.analytics.data_v1beta import BetaAnalyticsDataClient
 from google.analytics.data_v1beta.types import DateRange, RunReportRequest
 from google.auth.exceptions import DefaultCredentialsError
 from google.api_core import exceptions
 
 from config import KEY_FILE_PATH, DATE_RANGES
+from ga4_client import get_client
 from properties import GA4_PROPERTIES
 
 
@@ -24,7 +24,7 @@ def test_authentication():
             print(f"   ❌ Service account key file not found: {KEY_FILE_PATH}")
             return False
         
-        client = BetaAnalyticsDataClient.from_service_account_json(KEY_FILE_PATH)
+        client = get_client()
         print(f"   ✅ Authentication successful")
         print(f"   ✅ Using key file: {KEY_FILE_PATH}")
         return True
@@ -69,7 +69,7 @@ def test_all_properties():
         return False
     
     try:
-        client = BetaAnalyticsDataClient.from_service_account_json(KEY_FILE_PATH)
+        client = get_client()
     except Exception as e:
         print(f"   ❌ Cannot create API client: {str(e)}")
         return False
@@ -111,7 +111,7 @@ def test_api_quota():
         return False
     
     try:
-        client = BetaAnalyticsDataClient.from_service_account_json(KEY_FILE_PATH)
+        client = get_client()
         
         # Get first property for testing
         first_property_id = list(GA4_PROPERTIES.keys())[0]